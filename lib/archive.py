@@ -0,0 +1,290 @@
+# lib/archive.py
+
+import os
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from constants import MEASURES_PATH
+from model.measurement_set import ChannelCurve, MeasurementSet
+
+ARCHIVE_VERSION = 1
+ARCHIVE_CHANNELS = ['V', 'R', 'G', 'B', 'C', 'M', 'Y']
+NUM_STEPS = 21
+DOCUMENT_FIELDS = ("name", "color", "date", "values")
+
+HEADER_FILE = "header.json"
+CUBE_FILE = "cube.f32"
+MTIME_FILE = "mtime.i8"
+META_FILE = "meta.jsonl"
+
+
+def _to_float32(values: list, where: str) -> np.ndarray:
+    """
+    Convert density values to float32, refusing values that would not read back identically.
+    """
+    if not isinstance(values, list) or len(values) != NUM_STEPS:
+        raise ValueError(f"{where}: expected {NUM_STEPS} values")
+    array = np.asarray(values, dtype=np.float32)
+    for v, stored in zip(values, array):
+        if float(str(stored)) != v:
+            raise ValueError(f"{where}: {v!r} can not be stored losslessly as float32")
+    return array
+
+
+def _from_float32(array: np.ndarray) -> List[float]:
+    """
+    Shortest decimal representation of stored float32 values, as written in the json file
+    """
+    return [float(str(v)) for v in array]
+
+
+class MeasurementArchive:
+    """
+    Append-only columnar archive of measurement files.
+    Layout of the archive folder:
+        header.json : version, channels, steps and committed row count
+        cube.f32    : float32 (N, channels, 21) density cube, NaN for missing channels
+        mtime.i8    : int64 (N,) file modification time in ns
+        meta.jsonl  : one json line per row (path, name, color, date, value keys)
+    Data files are memory-mapped; rows written after the header count are ignored,
+    so an interrupted append never corrupts the archive.
+    Args:
+        directory (str): archive folder
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, HEADER_FILE), "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("version") != ARCHIVE_VERSION:
+            raise ValueError(f"unsupported archive version: {header.get('version')}")
+        self.channels: List[str] = header["channels"]
+        self.steps: int = header["steps"]
+        self.count: int = header["count"]
+        self._meta_size: int = header["meta_size"]
+        self._load()
+
+
+    @classmethod
+    def create(cls, directory: str) -> "MeasurementArchive":
+        """
+        Create an empty archive folder
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in (CUBE_FILE, MTIME_FILE, META_FILE):
+            open(os.path.join(directory, name), "wb").close()
+        cls._write_header(directory, 0, 0)
+        return cls(directory)
+
+
+    @staticmethod
+    def _write_header(directory: str, count: int, meta_size: int):
+        header = {
+            "version": ARCHIVE_VERSION,
+            "channels": ARCHIVE_CHANNELS,
+            "steps": NUM_STEPS,
+            "count": count,
+            "meta_size": meta_size,
+        }
+        tmp_path = os.path.join(directory, HEADER_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+        os.replace(tmp_path, os.path.join(directory, HEADER_FILE))
+
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+
+    def _load(self):
+        shape = (self.count, len(self.channels), self.steps)
+        if self.count:
+            self.cube = np.memmap(self._path(CUBE_FILE), dtype="<f4", mode="r", shape=shape)
+            self.mtime_ns = np.memmap(self._path(MTIME_FILE), dtype="<i8", mode="r", shape=(self.count,))
+        else:
+            self.cube = np.empty(shape, dtype="<f4")
+            self.mtime_ns = np.empty((0,), dtype="<i8")
+
+        self.paths: List[str] = []
+        self.names: List[Optional[str]] = []
+        self.colors: List[Optional[str]] = []
+        self.json_dates: List[Optional[str]] = []
+        self.keys: List[List[str]] = []
+        self.fields: List[List[str]] = []
+        with open(self._path(META_FILE), "rb") as f:
+            for line in f.read(self._meta_size).splitlines():
+                meta = json.loads(line)
+                self.paths.append(meta["path"])
+                self.names.append(meta["name"])
+                self.colors.append(meta["color"])
+                self.json_dates.append(meta["date"])
+                self.keys.append(meta["keys"])
+                self.fields.append(meta["fields"])
+
+
+    def __len__(self):
+        return self.count
+
+
+    @property
+    def dates(self) -> List[datetime]:
+        return [datetime.fromtimestamp(int(ns) / 1e9) for ns in self.mtime_ns]
+
+
+    def append(self, documents: Iterable[tuple[str, dict, int]]):
+        """
+        Append measurement documents to the archive.
+        Args:
+            documents: (relative path, json document, mtime in ns) tuples
+        Raises:
+            ValueError: if a document can not be stored losslessly
+        """
+        cube_rows, mtimes, metas = [], [], []
+        for rel_path, doc, mtime_ns in documents:
+            fields = list(doc.keys())
+            unknown = [k for k in fields if k not in DOCUMENT_FIELDS]
+            if unknown:
+                raise ValueError(f"{rel_path}: unsupported fields {unknown}")
+
+            row = np.full((len(self.channels), self.steps), np.nan, dtype=np.float32)
+            values = doc.get("values", {})
+            for key, vals in values.items():
+                channel = key.upper()
+                if channel not in self.channels:
+                    raise ValueError(f"{rel_path}: unsupported channel {key!r}")
+                index = self.channels.index(channel)
+                if not np.isnan(row[index]).all():
+                    raise ValueError(f"{rel_path}: duplicated channel {key!r}")
+                row[index] = _to_float32(vals, f"{rel_path}[{key}]")
+
+            cube_rows.append(row)
+            mtimes.append(mtime_ns)
+            metas.append({
+                "path": rel_path,
+                "name": doc.get("name"),
+                "color": doc.get("color"),
+                "date": doc.get("date"),
+                "keys": list(values.keys()),
+                "fields": fields,
+            })
+
+        if not metas:
+            return
+
+        meta_bytes = "".join(json.dumps(meta) + "\n" for meta in metas).encode("utf-8")
+        try:
+            # drop rows left by an interrupted append, then commit by rewriting the header
+            self._truncate()
+            with open(self._path(CUBE_FILE), "ab") as f:
+                f.write(np.stack(cube_rows).astype("<f4").tobytes())
+            with open(self._path(MTIME_FILE), "ab") as f:
+                f.write(np.asarray(mtimes, dtype="<i8").tobytes())
+            with open(self._path(META_FILE), "ab") as f:
+                f.write(meta_bytes)
+            self._write_header(self.directory, self.count + len(metas), self._meta_size + len(meta_bytes))
+            self.count += len(metas)
+            self._meta_size += len(meta_bytes)
+        finally:
+            self._load()
+
+
+    def _truncate(self):
+        row_size = len(self.channels) * self.steps * 4
+        # release the current maps before resizing their files
+        self.cube = self.mtime_ns = None
+        sizes = ((CUBE_FILE, self.count * row_size), (MTIME_FILE, self.count * 8), (META_FILE, self._meta_size))
+        for name, size in sizes:
+            if os.path.getsize(self._path(name)) != size:
+                with open(self._path(name), "r+b") as f:
+                    f.truncate(size)
+
+
+    def measurement_set(self, row: int, root: str = MEASURES_PATH) -> MeasurementSet:
+        """
+        MeasurementSet of a row. Curve values are views into the mapped cube (no copy).
+        """
+        curves = {}
+        for key in self.keys[row]:
+            channel = key.upper()
+            curves[channel] = ChannelCurve(channel=channel, values=self.cube[row, self.channels.index(channel)])
+        return MeasurementSet(
+            path=Path(root, self.paths[row]),
+            date=datetime.fromtimestamp(int(self.mtime_ns[row]) / 1e9),
+            curves=curves,
+            name=self.names[row],
+            color=self.colors[row],
+            json_date=self.json_dates[row],
+        )
+
+
+    def measurement_sets(self, rows: Optional[Iterable[int]] = None, root: str = MEASURES_PATH) -> List[MeasurementSet]:
+        rows = range(self.count) if rows is None else rows
+        return [self.measurement_set(row, root) for row in rows]
+
+
+    def document(self, row: int) -> dict:
+        """
+        Rebuild the json document of a row, identical to the archived file content
+        """
+        doc = {
+            "name": self.names[row],
+            "color": self.colors[row],
+            "date": self.json_dates[row],
+            "values": {
+                key: _from_float32(self.cube[row, self.channels.index(key.upper())])
+                for key in self.keys[row]
+            },
+        }
+        return {field: doc[field] for field in self.fields[row]}
+
+
+def json_to_archive(paths: Iterable[str], directory: str, root: str = MEASURES_PATH) -> MeasurementArchive:
+    """
+    Convert measurement json files to an archive, appending to it when it already exists.
+    Args:
+        paths: json files to convert
+        directory (str): archive folder
+        root (str): folder the archived paths are relative to
+    Returns:
+        MeasurementArchive: the updated archive
+    """
+    if os.path.exists(os.path.join(directory, HEADER_FILE)):
+        archive = MeasurementArchive(directory)
+    else:
+        archive = MeasurementArchive.create(directory)
+
+    documents = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            doc = json.load(f)
+        rel_path = os.path.relpath(path, root)
+        if rel_path.startswith(os.pardir):
+            rel_path = os.path.basename(path)
+        documents.append((rel_path, doc, os.stat(path).st_mtime_ns))
+    archive.append(documents)
+    return archive
+
+
+def archive_to_json(directory: str, output_dir: str) -> List[str]:
+    """
+    Write every archived measurement back to json files, restoring their modification time.
+    Args:
+        directory (str): archive folder
+        output_dir (str): folder to write the files in, keeping their relative paths
+    Returns:
+        list[str]: written files
+    """
+    archive = MeasurementArchive(directory)
+    written = []
+    for row in range(len(archive)):
+        path = os.path.join(output_dir, archive.paths[row])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(archive.document(row), f, indent=2)
+        mtime_ns = int(archive.mtime_ns[row])
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+        written.append(path)
+    return written
@@ -0,0 +1,511 @@
+# lib/catalog.py
+
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from constants import MEASURES_PATH
+from lib.gamma import GammaReading, Range
+from lib.summaries import SummaryParams, summarize_curves
+from model.measurement_set import ChannelCurve, MeasurementSet
+from utils.parallel import make_executor, parallel_map
+
+CATALOG_FILENAME = ".catalog.sqlite3"
+SCHEMA_VERSION = 3
+NUM_VALUES = 21
+REFRESH_CHUNK = 500
+
+
+class FileStat(NamedTuple):
+    """
+    Stat of a measurement file on disk
+    """
+    folder: str
+    mtime_ns: int
+    size: int
+
+
+class CatalogChanges(NamedTuple):
+    """
+    Relative paths touched by a catalog refresh
+    """
+    added: List[str]
+    updated: List[str]
+    removed: List[str]
+
+    def __bool__(self):
+        return bool(self.added or self.updated or self.removed)
+
+
+@dataclass
+class CatalogEntry:
+    """
+    Indexed content of a single measurement file
+    """
+    root: str
+    rel_path: str                    # path relative to the catalog root
+    folder: str                      # relative folder ("." for the root)
+    mtime_ns: int
+    size: int
+    name: Optional[str] = None       # json "name"
+    color: Optional[str] = None      # json "color" (vrgb, vcmy)
+    json_date: Optional[str] = None  # json "date"
+    channels: List[str] = field(default_factory=list)        # keys of json "values", file order
+    curve_channels: List[str] = field(default_factory=list)  # upper case channels holding 21 values
+    values: Dict[str, List[float]] = field(default_factory=dict)
+    error: Optional[str] = None
+    content_hash: Optional[str] = None  # sha1 of the file content
+    # params key -> channel -> reading, filled when the file is parsed
+    summaries: Dict[str, Dict[str, GammaReading]] = field(default_factory=dict)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.root, self.rel_path)
+
+    @property
+    def date(self) -> datetime:
+        return datetime.fromtimestamp(self.mtime_ns / 1e9)
+
+    def to_measurement_set(self) -> Optional[MeasurementSet]:
+        """
+        Build a MeasurementSet, mirroring load_measurement_file.
+        Entries must have been fetched with values.
+        """
+        curves = {}
+        for channel in self.channels:
+            values = self.values.get(channel)
+            if values is not None and len(values) == NUM_VALUES:
+                curves[channel.upper()] = ChannelCurve(channel=channel.upper(), values=values)
+        if self.error or not curves:
+            return None
+        return MeasurementSet(
+            path=Path(self.path),
+            name=self.name,
+            color=self.color,
+            json_date=self.json_date,
+            date=self.date,
+            curves=curves
+        )
+
+
+def entry_sort_key(entry: CatalogEntry) -> tuple:
+    """
+    Catalog order: root folder first, then by folder and file name
+    """
+    return entry.folder != ".", entry.folder.lower(), os.path.basename(entry.rel_path)
+
+
+def _read_entry(root: str, rel_path: str, stat: FileStat) -> CatalogEntry:
+    """
+    Parse a measurement file into a catalog entry, with the analysis summaries of its curves.
+    Parsing errors are kept in entry.error so broken files are not parsed again until they change.
+    """
+    entry = CatalogEntry(root=root, rel_path=rel_path, folder=stat.folder, mtime_ns=stat.mtime_ns, size=stat.size)
+    try:
+        with open(os.path.join(root, rel_path), "rb") as f:
+            content = f.read()
+        entry.content_hash = hashlib.sha1(content).hexdigest()
+        data = json.loads(content.decode("utf-8"))
+        if not isinstance(data, dict):
+            raise ValueError("not a measurement document")
+
+        entry.name = data.get("name")
+        entry.color = data.get("color")
+        entry.json_date = data.get("date")
+
+        values_dict = data.get("values", {})
+        entry.channels = list(values_dict.keys())
+        for channel, values in values_dict.items():
+            if not isinstance(values, list):
+                continue
+            try:
+                entry.values[channel] = [float(v) for v in values]
+            except (TypeError, ValueError):
+                continue
+            if len(values) == NUM_VALUES:
+                entry.curve_channels.append(channel.upper())
+
+        entry.summaries = summarize_curves({
+            channel.upper(): entry.values[channel]
+            for channel in entry.channels
+            if channel.upper() in entry.curve_channels and channel in entry.values
+        })
+    except (json.JSONDecodeError, OSError, ValueError, AttributeError) as e:
+        print(f"Reading error {rel_path} : {e}")
+        entry.error = str(e) or type(e).__name__
+    return entry
+
+
+class MeasurementCatalog:
+    """
+    Persistent SQLite index of the measures tree.
+    Files are identified by their path relative to the root and validated with mtime/size,
+    so a refresh only parses new or modified files. Curve summaries (gamma, Dmin, Dmax) are
+    stored by content hash and analysis parameters.
+    Args:
+        root (str): measures folder to index
+        db_path (str, optional): sqlite file. Defaults to <root>/.catalog.sqlite3
+    """
+    def __init__(self, root: str = MEASURES_PATH, db_path: Optional[str] = None):
+        self.root = os.path.normpath(root)
+        self.db_path = db_path or os.path.join(self.root, CATALOG_FILENAME)
+        self._lock = threading.RLock()
+        self._conn = self._connect()
+
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open the database, rebuilding it when unreadable.
+        Falls back to an in-memory index when the folder is not writable.
+        """
+        try:
+            return self._open(self.db_path)
+        except sqlite3.DatabaseError as e:
+            print(f"Catalog unavailable ({self.db_path}) : {e}")
+        try:
+            if os.path.exists(self.db_path):
+                os.remove(self.db_path)
+            return self._open(self.db_path)
+        except (OSError, sqlite3.Error):
+            return self._open(":memory:")
+
+
+    def _open(self, db_path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        try:
+            self._init_schema(conn)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+
+    def _init_schema(self, conn: sqlite3.Connection):
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            conn.executescript("""
+                DROP TABLE IF EXISTS summaries;
+                DROP TABLE IF EXISTS curves;
+                DROP TABLE IF EXISTS files;
+            """)
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                folder TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                name TEXT,
+                color TEXT,
+                json_date TEXT,
+                channels TEXT NOT NULL DEFAULT '',
+                curve_channels TEXT NOT NULL DEFAULT '',
+                error TEXT,
+                hash TEXT
+            );
+            CREATE INDEX IF NOT EXISTS files_hash ON files (hash);
+            CREATE TABLE IF NOT EXISTS curves (
+                path TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                vals BLOB NOT NULL,
+                PRIMARY KEY (path, channel)
+            );
+            CREATE TABLE IF NOT EXISTS summaries (
+                hash TEXT NOT NULL,
+                params TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                gamma REAL NOT NULL,
+                step_value REAL NOT NULL,
+                d_min REAL NOT NULL,
+                d_max REAL NOT NULL,
+                search_start INTEGER NOT NULL,
+                search_end INTEGER NOT NULL,
+                gamma_start INTEGER NOT NULL,
+                gamma_end INTEGER NOT NULL,
+                PRIMARY KEY (hash, params, channel)
+            );
+            PRAGMA user_version = {SCHEMA_VERSION};
+        """)
+        conn.commit()
+
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+    def scan(self, folder: Optional[str] = None, recursive: bool = True) -> Dict[str, FileStat]:
+        """
+        Stat json files under the root, without reading them.
+        Args:
+            folder (str, optional): relative folder to scan. Defaults to the root
+            recursive (bool): also scan sub folders
+        Returns:
+            dict[str, FileStat]: stat per relative path
+        """
+        found: Dict[str, FileStat] = {}
+        pending = [os.path.normpath(os.path.join(self.root, folder or "."))]
+        while pending:
+            directory = pending.pop()
+            rel_folder = os.path.relpath(directory, self.root)
+            try:
+                with os.scandir(directory) as it:
+                    for item in it:
+                        if item.is_dir():
+                            if recursive:
+                                pending.append(item.path)
+                        elif item.name.endswith(".json"):
+                            st = item.stat()
+                            rel_path = os.path.relpath(item.path, self.root)
+                            found[rel_path] = FileStat(rel_folder, st.st_mtime_ns, st.st_size)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                print(f"Scan error {directory} : {e}")
+        return found
+
+
+    def refresh(
+        self,
+        folder: Optional[str] = None,
+        recursive: bool = True,
+        on_chunk: Optional[Callable[[CatalogChanges, int, int], None]] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+    ) -> CatalogChanges:
+        """
+        Synchronise the index with the measures tree, or with a single folder of it.
+        Files are parsed and stored by chunks, so an interrupted refresh keeps its progress.
+        Args:
+            folder (str, optional): relative folder to synchronise. Defaults to the whole tree
+            recursive (bool): include sub folders of folder
+            on_chunk (callable, optional): called with (chunk changes, parsed count, total to parse)
+                after each stored chunk
+            is_cancelled (callable, optional): stop before the next chunk when it returns True
+        Returns:
+            CatalogChanges: added, updated and removed relative paths actually stored
+        """
+        on_disk = self.scan(folder, recursive)
+
+        query = "SELECT path, mtime_ns, size FROM files"
+        params: tuple = ()
+        if folder not in (None, "."):
+            folder = os.path.normpath(folder)  # type: ignore
+            prefix = folder + os.sep
+            query += " WHERE folder = ?" + (" OR substr(folder, 1, ?) = ?" if recursive else "")
+            params = (folder, len(prefix), prefix) if recursive else (folder,)
+        elif not recursive:
+            query += " WHERE folder = '.'"
+        with self._lock:
+            known = {path: (mtime_ns, size) for path, mtime_ns, size in self._conn.execute(query, params)}
+
+        added = [p for p in on_disk if p not in known]
+        updated = [p for p, st in on_disk.items() if p in known and known[p] != (st.mtime_ns, st.size)]
+        removed = [p for p in known if p not in on_disk]
+
+        self._store([], removed)
+        done = CatalogChanges([], [], removed)
+        if on_chunk and removed:
+            on_chunk(CatalogChanges([], [], removed), 0, len(added) + len(updated))
+
+        to_parse = added + updated
+        is_new = set(added)
+        executor = make_executor(len(to_parse))
+        try:
+            for start in range(0, len(to_parse), REFRESH_CHUNK):
+                if is_cancelled and is_cancelled():
+                    break
+                chunk = to_parse[start:start + REFRESH_CHUNK]
+                entries = parallel_map(
+                    _read_entry, [self.root] * len(chunk), chunk, [on_disk[p] for p in chunk], executor=executor
+                )
+                self._store(entries, [])
+                changes = CatalogChanges(
+                    [p for p in chunk if p in is_new], [p for p in chunk if p not in is_new], []
+                )
+                done.added.extend(changes.added)
+                done.updated.extend(changes.updated)
+                if on_chunk:
+                    on_chunk(changes, start + len(chunk), len(to_parse))
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        return done
+
+
+    def _store(self, entries: List[CatalogEntry], removed: List[str]):
+        """
+        Write parsed entries and drop removed paths in a single transaction
+        """
+        if not entries and not removed:
+            return
+        with self._lock, self._conn:
+            stale = [(p,) for p in removed] + [(e.rel_path,) for e in entries]
+            self._conn.executemany("DELETE FROM files WHERE path = ?", stale)
+            self._conn.executemany("DELETE FROM curves WHERE path = ?", stale)
+            self._conn.executemany(
+                "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        e.rel_path, e.folder, e.mtime_ns, e.size, e.name, e.color, e.json_date,
+                        ",".join(e.channels), ",".join(e.curve_channels), e.error, e.content_hash
+                    )
+                    for e in entries
+                ]
+            )
+            self._conn.executemany(
+                "INSERT INTO curves VALUES (?, ?, ?)",
+                [
+                    (e.rel_path, channel, array("d", values).tobytes())
+                    for e in entries
+                    for channel, values in e.values.items()
+                ]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        e.content_hash, params_key, channel, r.gamma, r.step_value, r.d_min, r.d_max,
+                        r.search_range.start, r.search_range.end, r.gamma_range.start, r.gamma_range.end
+                    )
+                    for e in entries
+                    for params_key, readings in e.summaries.items()
+                    for channel, r in readings.items()
+                ]
+            )
+            # summaries no longer referenced by a file
+            self._conn.execute("DELETE FROM summaries WHERE hash NOT IN (SELECT hash FROM files WHERE hash IS NOT NULL)")
+
+
+    def entries(self, with_values: bool = False, folder: Optional[str] = None) -> List[CatalogEntry]:
+        """
+        Indexed entries, root folder first then by folder and file name.
+        Args:
+            with_values (bool): also load the density values
+            folder (str, optional): restrict to a relative folder
+        Returns:
+            list[CatalogEntry]
+        """
+        if folder is None:
+            entries = self._query("", (), with_values)
+        else:
+            entries = self._query("WHERE folder = ?", (folder,), with_values)
+        entries.sort(key=entry_sort_key)
+        return entries
+
+
+    def get(self, path: str, with_values: bool = True) -> Optional[CatalogEntry]:
+        """
+        Indexed entry for a path (absolute or relative to the root)
+        """
+        rel_path = os.path.relpath(path, self.root) if os.path.isabs(path) else os.path.normpath(path)
+        entries = self._query("WHERE path = ?", (rel_path,), with_values)
+        return entries[0] if entries else None
+
+
+    def get_many(self, rel_paths: List[str], with_values: bool = False) -> List[CatalogEntry]:
+        """
+        Indexed entries for relative paths, in catalog order. Unknown paths are skipped.
+        """
+        entries: List[CatalogEntry] = []
+        rel_paths = [os.path.normpath(p) for p in rel_paths]
+        # stay below the sqlite host parameters limit
+        for start in range(0, len(rel_paths), 500):
+            chunk = rel_paths[start:start + 500]
+            where = f"WHERE path IN ({', '.join('?' * len(chunk))})"
+            entries.extend(self._query(where, tuple(chunk), with_values))
+        entries.sort(key=entry_sort_key)
+        return entries
+
+
+    def get_summaries(self, paths: List[str], params: SummaryParams = SummaryParams()) -> Dict[str, Dict[str, GammaReading]]:
+        """
+        Stored curve summaries of files (absolute or relative paths). Files modified since they
+        were indexed, or never summarized with params, are left out.
+        Args:
+            paths (list[str]): measurement files
+            params (SummaryParams): analysis parameters
+        Returns:
+            dict[str, dict[str, GammaReading]]: readings per absolute path, then per channel
+        """
+        rel_paths = [os.path.relpath(p, self.root) if os.path.isabs(p) else os.path.normpath(p) for p in paths]
+        rows = []
+        with self._lock:
+            for start in range(0, len(rel_paths), 500):
+                chunk = rel_paths[start:start + 500]
+                rows.extend(self._conn.execute(
+                    f"""
+                    SELECT f.path, f.mtime_ns, f.size, s.channel, s.gamma, s.step_value, s.d_min, s.d_max,
+                           s.search_start, s.search_end, s.gamma_start, s.gamma_end
+                    FROM files f JOIN summaries s ON s.hash = f.hash
+                    WHERE s.params = ? AND f.path IN ({', '.join('?' * len(chunk))})
+                    """,
+                    (params.key, *chunk)
+                ))
+
+        summaries: Dict[str, Dict[str, GammaReading]] = {}
+        valid: Dict[str, bool] = {}
+        for path, mtime_ns, size, channel, gamma, step_value, d_min, d_max, ss, se, gs, ge in rows:
+            abs_path = os.path.join(self.root, path)
+            if path not in valid:
+                try:
+                    st = os.stat(abs_path)
+                    valid[path] = (st.st_mtime_ns, st.st_size) == (mtime_ns, size)
+                except OSError:
+                    valid[path] = False
+            if valid[path]:
+                summaries.setdefault(abs_path, {})[channel] = GammaReading(
+                    gamma=gamma, step_value=step_value, d_min=d_min, d_max=d_max,
+                    search_range=Range(ss, se), gamma_range=Range(gs, ge)
+                )
+        return summaries
+
+
+    def _query(self, where: str, params: tuple, with_values: bool) -> List[CatalogEntry]:
+        columns = "path, folder, mtime_ns, size, name, color, json_date, channels, curve_channels, error, hash"
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {columns} FROM files {where}", params).fetchall()
+            values_by_path: Dict[str, Dict[str, List[float]]] = {}
+            if with_values:
+                curves = self._conn.execute(
+                    f"SELECT path, channel, vals FROM curves WHERE path IN (SELECT path FROM files {where})", params
+                )
+                for path, channel, blob in curves:
+                    values_by_path.setdefault(path, {})[channel] = array("d", blob).tolist()
+
+        return [
+            CatalogEntry(
+                root=self.root,
+                rel_path=path,
+                folder=folder,
+                mtime_ns=mtime_ns,
+                size=size,
+                name=name,
+                color=color,
+                json_date=json_date,
+                channels=channels.split(",") if channels else [],
+                curve_channels=curve_channels.split(",") if curve_channels else [],
+                values=values_by_path.get(path, {}),
+                error=error,
+                content_hash=content_hash,
+            )
+            for path, folder, mtime_ns, size, name, color, json_date, channels, curve_channels, error, content_hash in rows
+        ]
+
+
+_catalogs: Dict[str, MeasurementCatalog] = {}
+
+
+def get_catalog(root: str = MEASURES_PATH) -> MeasurementCatalog:
+    """
+    Shared catalog instance for a measures folder
+    """
+    root = os.path.normpath(root)
+    if root not in _catalogs:
+        _catalogs[root] = MeasurementCatalog(root)
+    return _catalogs[root]
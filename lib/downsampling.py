@@ -0,0 +1,153 @@
+# lib/downsampling.py
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+GRANULARITIES = ("day", "week", "month")
+
+
+@dataclass
+class Downsampled:
+    """
+    Points of a downsampled series. Bucketed series also hold the min/max band
+    and the number of measurements of each bucket.
+    """
+    dates: List[datetime]
+    values: List[float]
+    low: Optional[List[float]] = None
+    high: Optional[List[float]] = None
+    counts: Optional[List[int]] = None
+
+    def __len__(self):
+        return len(self.dates)
+
+
+def _bucket_key(day: date, granularity: str) -> int:
+    if granularity == "day":
+        return day.toordinal()
+    if granularity == "week":
+        return day.toordinal() - day.weekday()  # monday
+    if granularity == "month":
+        return day.year * 12 + day.month - 1
+    raise ValueError(f"unknown granularity: {granularity}")
+
+
+def _bucket_start(key: int, granularity: str) -> datetime:
+    if granularity == "month":
+        return datetime(key // 12, key % 12 + 1, 1)
+    return datetime.combine(date.fromordinal(key), datetime.min.time())
+
+
+def _present(dates: Sequence[datetime], values: Sequence[Optional[float]]):
+    """ dates and values as arrays, without the missing (None) values """
+    y = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    keep = np.flatnonzero(~np.isnan(y))
+    return [dates[i] for i in keep.tolist()], y[keep]
+
+
+def bucket_series(dates: Sequence[datetime], values: Sequence[Optional[float]], granularity: str) -> Downsampled:
+    """
+    Mean, min and max of the values of each day, week or month
+    Args:
+        dates (list[datetime]): measurement dates
+        values (list[float]): values, None where missing
+        granularity (str): "day", "week" or "month"
+    Returns:
+        Downsampled: one point per non empty bucket, dated at the bucket start
+    """
+    dates, y = _present(dates, values)
+    if not dates:
+        return Downsampled([], [], [], [], [])
+    keys = np.array([_bucket_key(d, granularity) for d in dates], dtype=np.int64)
+    order = np.argsort(keys, kind="stable")
+    keys, y = keys[order], y[order]
+
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+    return Downsampled(
+        dates=[_bucket_start(k, granularity) for k in keys[starts].tolist()],
+        values=(np.add.reduceat(y, starts) / counts).tolist(),
+        low=np.minimum.reduceat(y, starts).tolist(),
+        high=np.maximum.reduceat(y, starts).tolist(),
+        counts=counts.tolist(),
+    )
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets decimation: keeps the first and last points and,
+    in each bucket, the point forming the largest triangle with the previous kept point
+    and the average of the next bucket. Peaks and trends survive the decimation.
+    Args:
+        x (np.ndarray): increasing abscissas
+        y (np.ndarray): values
+        threshold (int): number of points to keep
+    Returns:
+        np.ndarray: indices of the kept points
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def _decimate(series: Downsampled, max_points: int) -> Downsampled:
+    if len(series) <= max_points:
+        return series
+    x = np.array([d.timestamp() for d in series.dates])
+    kept = lttb(x, np.asarray(series.values), max_points).tolist()
+    pick = lambda values: [values[i] for i in kept] if values is not None else None
+    return Downsampled(pick(series.dates), pick(series.values), pick(series.low), pick(series.high), pick(series.counts))
+
+
+def choose_granularity(dates: Sequence[datetime], max_points: int) -> str:
+    """
+    Finest granularity giving at most max_points points: "measure" if the dates fit,
+    else "day", "week" or "month" (the coarsest, even if it does not fit)
+    """
+    if len(dates) <= max_points:
+        return "measure"
+    for granularity in GRANULARITIES:
+        if len({_bucket_key(d, granularity) for d in dates}) <= max_points:
+            return granularity
+    return GRANULARITIES[-1]
+
+
+def downsample(dates: Sequence[datetime], values: Sequence[Optional[float]],
+               max_points: int, granularity: Optional[str] = None) -> Downsampled:
+    """
+    Bound the number of points of a dated series, e.g. to the pixel width of a plot
+    Args:
+        dates (list[datetime]): measurement dates
+        values (list[float]): values, None where missing
+        max_points (int): maximum number of points
+        granularity (str, optional): "day", "week" or "month" buckets, "measure" to keep the
+            measurements. Defaults to choose_granularity
+    Returns:
+        Downsampled: series of at most max_points points, LTTB decimated if still too long
+    """
+    if granularity is None:
+        granularity = choose_granularity(_present(dates, values)[0], max_points)
+    if granularity == "measure":
+        dates, y = _present(dates, values)
+        return _decimate(Downsampled(list(dates), y.tolist()), max_points)
+    return _decimate(bucket_series(dates, values, granularity), max_points)
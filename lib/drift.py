@@ -0,0 +1,306 @@
+# lib/drift.py
+
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+from PySide6.QtCore import QObject, Signal
+
+from constants import MEASURES_PATH
+from lib.gamma import GammaAnalyzer
+from lib.summaries import SummaryParams
+from model.measurement_set import MeasurementSet, get_measurement
+
+ALERT_LOG_FILENAME = ".drift_alerts.log"
+NUM_VALUES = 21
+
+
+class DriftTolerances(NamedTuple):
+    """
+    Accepted deviations from the reference. Step tolerances may be one value or 21 (one per step),
+    the band of a step is the largest of its absolute and relative tolerances.
+    """
+    step_abs: Union[float, Sequence[float]] = 0.05
+    step_rel: Union[float, Sequence[float]] = 0.05
+    gamma_abs: float = 0.05
+
+
+@dataclass
+class DriftResult:
+    """
+    Check of one channel curve against the reference
+    """
+    channel: str
+    steps_out: List[int] = field(default_factory=list)  # out of band steps, 1-based
+    max_deviation: float = 0.0                          # largest step deviation from the reference
+    gamma: Optional[float] = None
+    gamma_ref: Optional[float] = None
+    gamma_out: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return not self.steps_out and not self.gamma_out
+
+
+@dataclass
+class DriftAlert:
+    date: datetime
+    source: str          # measurement file or "serial"
+    reference: str
+    result: DriftResult
+
+    def __str__(self):
+        r = self.result
+        parts = []
+        if r.steps_out:
+            parts.append(f"paliers {','.join(map(str, r.steps_out))} hors tolérance (écart max {r.max_deviation:+.3f})")
+        if r.gamma_out:
+            parts.append(f"gamma {r.gamma:.3f} (réf {r.gamma_ref:.3f})")
+        return (f"{self.date:%Y-%m-%d %H:%M:%S} {os.path.basename(self.source)} {r.channel} : "
+                f"{' ; '.join(parts)} [réf {os.path.basename(self.reference)}]")
+
+
+class ReferenceProfile:
+    """
+    Tolerance bands of a reference, precomputed so that checking a reading
+    is a few array comparisons.
+    Args:
+        reference (MeasurementSet): reference measurement
+        tolerances (DriftTolerances): accepted deviations
+        params (SummaryParams): gamma analysis parameters
+    """
+    def __init__(self, reference: MeasurementSet, tolerances: DriftTolerances = DriftTolerances(),
+                 params: SummaryParams = SummaryParams()):
+        self.reference = reference
+        self.tolerances = tolerances
+        self.params = params
+        self.analyzer = GammaAnalyzer()
+
+        self.channels = list(reference.curves)
+        self.index = {ch: i for i, ch in enumerate(self.channels)}
+        self.values = np.array([reference.curves[ch].values for ch in self.channels], dtype=np.float64).reshape(-1, NUM_VALUES)
+        tolerance = np.maximum(np.asarray(tolerances.step_abs), np.asarray(tolerances.step_rel) * np.abs(self.values))
+        self.low = self.values - tolerance
+        self.high = self.values + tolerance
+
+        self.gamma = self._gammas(self.values)
+        self.gamma_low = self.gamma - tolerances.gamma_abs
+        self.gamma_high = self.gamma + tolerances.gamma_abs
+
+    def _gammas(self, values: np.ndarray) -> np.ndarray:
+        """ gamma of each curve, NaN where it can not be computed """
+        if not len(values):
+            return np.empty(0)
+        p = self.params
+        return self.analyzer.get_gamma_batch(
+            values, step_value=p.step_value, low_pct=p.low_pct, high_pct=p.high_pct,
+            min_diff=p.min_diff, num_steps=p.num_steps
+        ).gamma
+
+    def check_curves(self, curves: Dict[str, Sequence[float]]) -> List[DriftResult]:
+        """
+        Check complete curves (21 values) of the reference channels
+        Returns:
+            list[DriftResult]: one result per checked channel
+        """
+        channels = [ch for ch in curves if ch in self.index]
+        if not channels:
+            return []
+        rows = [self.index[ch] for ch in channels]
+        values = np.array([curves[ch] for ch in channels], dtype=np.float64)
+        out = (values < self.low[rows]) | (values > self.high[rows])
+        deviation = values - self.values[rows]
+        gamma = self._gammas(values)
+        gamma_out = (gamma < self.gamma_low[rows]) | (gamma > self.gamma_high[rows])
+
+        results = []
+        for k, channel in enumerate(channels):
+            worst = int(np.abs(deviation[k]).argmax())
+            results.append(DriftResult(
+                channel=channel,
+                steps_out=(np.flatnonzero(out[k]) + 1).tolist(),
+                max_deviation=float(deviation[k, worst]),
+                gamma=None if np.isnan(gamma[k]) else float(gamma[k]),
+                gamma_ref=None if np.isnan(self.gamma[rows[k]]) else float(self.gamma[rows[k]]),
+                gamma_out=bool(gamma_out[k]),
+            ))
+        return results
+
+    def check_step(self, channel: str, step: int, value: float) -> Optional[DriftResult]:
+        """
+        Check one step (0-based) of a curve being measured
+        Returns:
+            DriftResult, None if the reference has no such channel
+        """
+        c = self.index.get(channel)
+        if c is None:
+            return None
+        result = DriftResult(channel, max_deviation=value - self.values[c, step])
+        if not self.low[c, step] <= value <= self.high[c, step]:
+            result.steps_out.append(step + 1)
+        return result
+
+
+class DriftDetector(QObject):
+    """
+    Compare new measurements, saved files or steps of the serial stream, to the selected
+    reference, emit drift_detected and append the alerts to a log file.
+    Args:
+        tolerances (DriftTolerances): accepted deviations
+        log_path (str, optional): alert log. Defaults to <measures>/.drift_alerts.log
+        watcher (MeasuresWatcher, optional): checks the files it reports as added or modified.
+            During a scan, only the files written after the scan started are checked
+    """
+    drift_detected = Signal(object)          # DriftAlert
+    measurement_checked = Signal(str, bool)  # source, within tolerances
+
+    def __init__(self, tolerances: DriftTolerances = DriftTolerances(), log_path: Optional[str] = None,
+                 root: str = MEASURES_PATH, watcher=None, parent=None):
+        super().__init__(parent)
+        self.tolerances = tolerances
+        self.root = root
+        self.log_path = log_path or os.path.join(root, ALERT_LOG_FILENAME)
+        self.profile: Optional[ReferenceProfile] = None
+        self.reference_path: Optional[str] = None
+        # serial stream: the curve being measured, NaN until received
+        self._live: Dict[str, np.ndarray] = {}
+        # alerts already raised for the curve being measured: (channel, step) and (channel, "gamma")
+        self._alerted: Set[Tuple[str, Union[int, str]]] = set()
+
+        self.watcher = watcher
+        self._scan_started_ns = 0
+        if watcher is not None:
+            watcher.scan_started.connect(self._on_scan_started)
+            watcher.files_added.connect(self.check_files)
+            watcher.files_modified.connect(self.on_files_modified)
+
+    def _on_scan_started(self):
+        self._scan_started_ns = time.time_ns()
+
+    def _written_since_scan(self, rel_paths: List[str]) -> List[str]:
+        """
+        Files written after the current scan started. A scan reports the whole archive
+        (first launch, catalog rebuild): the older files are history, not new measurements.
+        """
+        recent = []
+        for rel_path in rel_paths:
+            try:
+                if os.stat(os.path.join(self.root, rel_path)).st_mtime_ns >= self._scan_started_ns:
+                    recent.append(rel_path)
+            except OSError:
+                continue
+        return recent
+
+    def set_reference(self, path: Optional[str]):
+        """
+        Select the reference and precompute its tolerance bands
+        """
+        self.reference_path = path
+        self.profile = None
+        self._alerted.clear()
+        reference = get_measurement(path) if path else None
+        if reference is not None:
+            self.profile = ReferenceProfile(reference, self.tolerances)
+
+    def _report(self, source: str, results: List[DriftResult]) -> List[DriftAlert]:
+        now = datetime.now()
+        alerts = [DriftAlert(now, source, self.reference_path, r) for r in results if not r.ok]
+        if alerts:
+            self._log(alerts)
+        for alert in alerts:
+            self.drift_detected.emit(alert)
+        return alerts
+
+    def _log(self, alerts: List[DriftAlert]):
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.writelines(f"{alert}\n" for alert in alerts)
+        except OSError as e:
+            print(f"Drift log error ({self.log_path}) : {e}")
+        for alert in alerts:
+            print(f"Dérive : {alert}")
+
+    def check_measurement(self, measurement: MeasurementSet) -> List[DriftAlert]:
+        """
+        Check every channel of a measurement against the reference
+        Returns:
+            list[DriftAlert]: alerts raised
+        """
+        if self.profile is None:
+            return []
+        source = str(measurement.path)
+        results = self.profile.check_curves({ch: c.values for ch, c in measurement.curves.items()})
+        alerts = self._report(source, results)
+        self.measurement_checked.emit(source, not alerts)
+        return alerts
+
+    def check_files(self, rel_paths: List[str]):
+        """
+        Check measurement files added or modified in the measures folder (references excluded)
+        """
+        if self.profile is None:
+            return
+        if self.watcher is not None and self.watcher.is_scanning():
+            rel_paths = self._written_since_scan(rel_paths)
+        for rel_path in rel_paths:
+            if os.path.dirname(rel_path) == "ref":
+                continue
+            measurement = get_measurement(os.path.join(self.root, rel_path))
+            if measurement is not None:
+                self.check_measurement(measurement)
+
+    def on_files_modified(self, rel_paths: List[str]):
+        """
+        Reload the reference when its file changes, then check the modified measurements
+        """
+        # the watcher has already dropped the modified files from the measurement cache
+        if self.reference_path and any(os.path.join(self.root, p) == self.reference_path for p in rel_paths):
+            self.set_reference(self.reference_path)
+        self.check_files(rel_paths)
+
+    def check_step(self, values: Dict[str, float], step: int) -> List[DriftAlert]:
+        """
+        Check a step received from the densitometer. The curve is also checked
+        as a whole, gamma included, once all its steps are known. A step or gamma
+        out of tolerance is reported once per curve, even if measured again.
+        Args:
+            values (dict[str, float]): density per channel
+            step (int): step index (0-20)
+        """
+        if self.profile is None or not 0 <= step < NUM_VALUES:
+            return []
+        if step == 0:
+            self._live.clear()
+            self._alerted.clear()
+
+        results = []
+        for channel, value in values.items():
+            channel = channel.upper()
+            result = self.profile.check_step(channel, step, value)
+            if result is None:
+                continue
+            results.append(result)
+            self._live.setdefault(channel, np.full(NUM_VALUES, np.nan))[step] = value
+
+        complete = {ch: v for ch, v in self._live.items() if not np.isnan(v).any()}
+        if step == NUM_VALUES - 1 and complete:
+            # whole curves: the step results are part of the curve check
+            done = set(complete)
+            results = [r for r in results if r.channel not in done] + self.profile.check_curves(complete)
+        return self._report("serial", [self._new_alerts(r) for r in results])
+
+    def _new_alerts(self, result: DriftResult) -> DriftResult:
+        """
+        Result without the steps and gamma already reported for the curve being measured
+        """
+        steps = [s for s in result.steps_out if (result.channel, s) not in self._alerted]
+        gamma_out = result.gamma_out and (result.channel, "gamma") not in self._alerted
+        self._alerted.update((result.channel, s) for s in steps)
+        if gamma_out:
+            self._alerted.add((result.channel, "gamma"))
+        result.steps_out = steps
+        result.gamma_out = gamma_out
+        return result
@@ -1,7 +1,13 @@
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import List, NamedTuple, Union, Optional
 from statistics import mean
 
+import numpy as np
+
+from utils.cache import CacheInfo
+
 STEP_VALUE = 0.15
 HIGH_PCT = 0.2
 LOW_PCT=0.20
@@ -40,7 +46,88 @@ class GammaReading:
 		)
 
 
+@dataclass
+class GammaBatch:
+	"""
+	Gamma readings of N curves, as arrays. Ranges are 1-based like GammaReading.
+	"""
+	gamma: np.ndarray
+	step_value: float
+	d_min: np.ndarray
+	d_max: np.ndarray
+	search_start: np.ndarray
+	search_end: np.ndarray
+	gamma_start: np.ndarray
+	gamma_end: np.ndarray
+
+	def __len__(self):
+		return len(self.gamma)
+
+	def reading(self, i: int) -> GammaReading:
+		""" GammaReading of the i-th curve """
+		return GammaReading(
+			gamma=float(self.gamma[i]),
+			step_value=self.step_value,
+			d_min=float(self.d_min[i]),
+			d_max=float(self.d_max[i]),
+			search_range=Range(int(self.search_start[i]), int(self.search_end[i])),
+			gamma_range=Range(int(self.gamma_start[i]), int(self.gamma_end[i]))
+		)
+
+
+class GammaCache:
+	"""
+	Bounded LRU memo of gamma readings, keyed by curve values and analysis parameters.
+	Readings are shared: callers must not modify them.
+	Args:
+		maxsize (int): maximum number of cached readings
+	"""
+	def __init__(self, maxsize: int = 4096):
+		self.maxsize = maxsize
+		self.hits = 0
+		self.misses = 0
+		self._items: "OrderedDict[tuple, GammaReading]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, key: tuple) -> Optional[GammaReading]:
+		with self._lock:
+			reading = self._items.get(key)
+			if reading is None:
+				self.misses += 1
+				return None
+			self._items.move_to_end(key)
+			self.hits += 1
+			return reading
+
+	def put(self, key: tuple, reading: GammaReading):
+		with self._lock:
+			self._items[key] = reading
+			self._items.move_to_end(key)
+			while len(self._items) > self.maxsize:
+				self._items.popitem(last=False)
+
+	def clear(self):
+		with self._lock:
+			self._items.clear()
+
+	def cache_info(self) -> CacheInfo:
+		with self._lock:
+			return CacheInfo(self.hits, self.misses, self.maxsize, len(self._items))
+
+
+# shared between the curve tabs and the History tab
+GAMMA_CACHE = GammaCache()
+
+
 class GammaAnalyzer:
+	"""
+	Gamma analysis of density curves.
+	Args:
+		cache (GammaCache, optional): memo for get_gamma_from_values, e.g. GAMMA_CACHE
+	"""
+	def __init__(self, cache: Optional[GammaCache] = None):
+		self.cache = cache
+
 
 	def get_search_range(self, values: List[float], low_pct=LOW_PCT, high_pct=HIGH_PCT) -> Range:
 		""" Calculates the index range to search for gamma analysis.
@@ -122,7 +209,7 @@ class GammaAnalyzer:
 		return gamma
 
 
-	def get_gamma_from_values(self, values: List[float], step_value: float = STEP_VALUE, low_pct=LOW_PCT, high_pct=HIGH_PCT, min_diff= MIN_DIFF) -> GammaReading:
+	def get_gamma_from_values(self, values: List[float], step_value: float = STEP_VALUE, low_pct=LOW_PCT, high_pct=HIGH_PCT, min_diff= MIN_DIFF, num_steps=NUM_STEPS) -> GammaReading:
 		""" Computes a detailed gamma reading from a list of values.
 		Args:
 			values (List[float]): List of density values.
@@ -130,16 +217,29 @@ class GammaAnalyzer:
 			low_pct (float, optional): Lower percentage the search range. Defaults to 0.20.
 			high_pct (float, optional): Upper percentage for the search range. Defaults to 0.20.
 			min_diff (float, optional):  Minimum difference threshold to ignore flat segments. Defaults to 0.03.
+			num_steps (int, optional): Number of steps of the gamma range. Defaults to NUM_STEPS.
 		Returns:
 			GammaReading: Object including gamma data, ranges, and delta.
 		Raises:
 			ValueError: If fewer than 4 values are provided.
 		"""
+		if self.cache is None:
+			return self._compute_gamma_reading(values, step_value, low_pct, high_pct, min_diff, num_steps)
+
+		key = (tuple(values), step_value, low_pct, high_pct, min_diff, num_steps)
+		reading = self.cache.get(key)
+		if reading is None:
+			reading = self._compute_gamma_reading(values, step_value, low_pct, high_pct, min_diff, num_steps)
+			self.cache.put(key, reading)
+		return reading
+
+
+	def _compute_gamma_reading(self, values, step_value, low_pct, high_pct, min_diff, num_steps) -> GammaReading:
 		if len(values) < 4:
 			raise ValueError("At least 4 values are needed")
 
 		search_range = self.get_search_range(values, low_pct, high_pct)
-		gamma_range = self.get_gamma_range(values, search_range)
+		gamma_range = self.get_gamma_range(values, search_range, num_steps)
 
 		gamma = self.get_gamma(gamma_range, values, step_value)
 
@@ -154,12 +254,93 @@ class GammaAnalyzer:
 		)
 
 
-	def get_gamma_from_curve_data(self, data: dict[str, list[Optional[float]]], visible_channels: list[str], step_value: float = STEP_VALUE) -> dict[str, GammaReading]:
+	def get_gamma_batch(self, values, step_value: float = STEP_VALUE, low_pct=LOW_PCT, high_pct=HIGH_PCT, min_diff= MIN_DIFF, num_steps=NUM_STEPS) -> GammaBatch:
+		""" Computes gamma readings of many curves at once.
+		Each curve gives exactly the result of get_gamma_from_values on the same values as floats:
+		operations are done in float64 in the same order, and ties pick the first window.
+		Args:
+			values (array-like): (N, steps) density values, steps >= 4
+			step_value (float, optional): Step size used for gamma calculation. Defaults to STEP_VALUE.
+			low_pct (float, optional): Lower percentage the search range. Defaults to 0.20.
+			high_pct (float, optional): Upper percentage for the search range. Defaults to 0.20.
+			min_diff (float, optional): Minimum difference threshold, unused as in get_gamma_from_values.
+			num_steps (int, optional): Number of steps of the gamma range. Defaults to NUM_STEPS.
+		Returns:
+			GammaBatch: arrays of N readings, gamma is NaN where the gamma range overflows the curve
+		Raises:
+			ValueError: If fewer than 4 values per curve are provided.
+		"""
+		values = np.asarray(values, dtype=np.float64)
+		if values.ndim != 2 or values.shape[1] < 4:
+			raise ValueError("At least 4 values are needed")
+		count, n = values.shape
+		# steps first: every operation below runs on contiguous rows of N curves
+		steps = np.ascontiguousarray(values.T)
+
+		# search range
+		d_min = steps.min(axis=0)
+		d_max = steps.max(axis=0)
+		min_threshold = d_min + low_pct * (d_max - d_min)
+		max_threshold = d_max - high_pct * (d_max - d_min)
+
+		above_min = steps > min_threshold
+		start = np.where(above_min.any(axis=0), above_min.argmax(axis=0), 0)
+		above_max = steps > max_threshold
+		end = np.where(above_max.any(axis=0), above_max.argmax(axis=0), n) - 1
+		start = np.maximum(1, start)
+		end = np.minimum(n - 1, end)
+
+		# gamma range: window of num_steps accelerations with the smallest sum of abs
+		speeds = self._get_derivatives_batch(steps)
+		accelerations = np.abs(self._get_derivatives_batch(speeds))
+		windows = max(0, n - num_steps + 1)
+		sums = np.zeros((windows, count))
+		for k in range(num_steps):
+			# left to right, as sum()
+			sums += accelerations[k:k + windows]
+
+		first = np.arange(windows)[:, None]
+		valid = (first >= start) & (first < end - num_steps + 1) & (sums < np.inf)
+		sums[~valid] = np.inf
+		best = sums.argmin(axis=0) if windows else np.zeros(count, dtype=int)
+		gamma_start = np.where(valid.any(axis=0), best, start)
+		gamma_end = gamma_start + num_steps
+
+		# get_gamma_from_values raises IndexError when the range overflows the curve
+		overflow = gamma_end > n - 1
+		columns = np.arange(count)
+		delta_y = steps[np.minimum(gamma_end, n - 1), columns] - steps[gamma_start, columns]
+		delta_x = (gamma_end - gamma_start) * step_value
+		gamma = np.where(overflow, np.nan, delta_y / delta_x)
+
+		return GammaBatch(
+			gamma=gamma,
+			step_value=step_value,
+			d_min=d_min,
+			d_max=d_max,
+			search_start=start + 1,
+			search_end=end + 1,
+			gamma_start=gamma_start + 1,
+			gamma_end=gamma_end + 1
+		)
+
+
+	def _get_derivatives_batch(self, steps: np.ndarray) -> np.ndarray:
+		""" get_derivatives over a (steps, N) array of N curves """
+		derivatives = np.zeros_like(steps)
+		np.subtract(steps[2:], steps[:-2], out=derivatives[1:-1])
+		derivatives[-1] = derivatives[-2]
+		return derivatives
+
+
+	def get_gamma_from_curve_data(self, data: dict[str, list[Optional[float]]], visible_channels: list[str], step_value: float = STEP_VALUE, states: Optional[dict[str, "IncrementalGamma"]] = None) -> dict[str, GammaReading]:
 		"""Computes gamma readings from curve data for each visible channel and combined channels.
 		Args:
 			data (dict[str, list[Optional[float]]]): Curve data with keys like 'meas_a', 'ref_a'.
 			visible_channels (list[str]): Channels to include in the analysis.
 			step_value (float, optional): Step size used for gamma calculation. Defaults to STEP_VALUE.
+			states (dict[str, IncrementalGamma], optional): Incremental states of the measured channels,
+				updated with data instead of analyzing the curves from scratch.
 		Returns:
 			dict[str, GammaReading]: Gamma results per channel, and for 'all' and 'ref' if applicable.
 		"""
@@ -172,12 +353,17 @@ class GammaAnalyzer:
 		for ch in visible_channels:
 			meas_key = f"meas_{ch}"
 			ref_key = f"ref_{ch}"
-			meas_vals: list[float] = [v for v in data.get(meas_key, []) if isinstance(v, (int, float))]
 			ref_vals: list[float]  = [v for v in data.get(ref_key, []) if isinstance(v, (int, float))]
 
-			if len(meas_vals) >= 4:
-				reading = self.get_gamma_from_values(meas_vals, step_value=step_value)
-				results[ch] = reading
+			if states is not None and ch in states:
+				reading = states[ch].update(data.get(meas_key, []), step_value=step_value)
+				if reading is not None:
+					results[ch] = reading
+			else:
+				meas_vals: list[float] = [v for v in data.get(meas_key, []) if isinstance(v, (int, float))]
+				if len(meas_vals) >= 4:
+					reading = self.get_gamma_from_values(meas_vals, step_value=step_value)
+					results[ch] = reading
 			if len(ref_vals) >= 4:
 				reading = self.get_gamma_from_values(ref_vals, step_value=step_value)
 				results_ref[ch] = reading
@@ -185,37 +371,13 @@ class GammaAnalyzer:
 		# assign computed values to a GammaReading object for current measurments and ref
 		# current measurments
 		if results:
-			visible_results = [gr for ch, gr in results.items() if ch in visible_channels]
-			results["all"] = GammaReading(
-				gamma=mean(gr.gamma for gr in visible_results),
-				step_value=step_value,
-				d_min=mean(gr.d_min for gr in visible_results),
-				d_max=mean(gr.d_max for gr in visible_results),
-				search_range=Range(
-					round(mean(gr.search_range.start for gr in visible_results)),
-					round(mean(gr.search_range.end for gr in visible_results))
-				),
-				gamma_range=Range(
-					round(mean(gr.gamma_range.start for gr in visible_results)),
-					round(mean(gr.gamma_range.end for gr in visible_results))
-				)
+			results["all"] = self._mean_reading(
+				[gr for ch, gr in results.items() if ch in visible_channels], step_value
 			)
 		# ref
 		if results_ref:
-			visible_results = [gr for ch, gr in results_ref.items() if ch in visible_channels]
-			results["ref"] = GammaReading(
-				gamma=mean(gr.gamma for gr in visible_results),
-				step_value=step_value,
-				d_min=mean(gr.d_min for gr in visible_results),
-				d_max=mean(gr.d_max for gr in visible_results),
-				search_range=Range(
-					round(mean(gr.search_range.start for gr in visible_results)),
-					round(mean(gr.search_range.end for gr in visible_results))
-				),
-				gamma_range=Range(
-					round(mean(gr.gamma_range.start for gr in visible_results)),
-					round(mean(gr.gamma_range.end for gr in visible_results))
-				)
+			results["ref"] = self._mean_reading(
+				[gr for ch, gr in results_ref.items() if ch in visible_channels], step_value
 			)
 
 		# merge resuts with results_ref
@@ -223,3 +385,151 @@ class GammaAnalyzer:
 			results[f"ref_{k}"] = v
 
 		return results
+
+
+	def _mean_reading(self, readings: List[GammaReading], step_value: float) -> GammaReading:
+		""" Average of several channel readings """
+		return GammaReading(
+			gamma=mean(gr.gamma for gr in readings),
+			step_value=step_value,
+			d_min=mean(gr.d_min for gr in readings),
+			d_max=mean(gr.d_max for gr in readings),
+			search_range=Range(
+				round(mean(gr.search_range.start for gr in readings)),
+				round(mean(gr.search_range.end for gr in readings))
+			),
+			gamma_range=Range(
+				round(mean(gr.gamma_range.start for gr in readings)),
+				round(mean(gr.gamma_range.end for gr in readings))
+			)
+		)
+
+
+class IncrementalGamma:
+	"""
+	Gamma analysis state of a curve filled or edited one value at a time (live acquisition).
+	Derivatives, absolute accelerations and window sums are kept, and a change only recomputes
+	the entries depending on the changed values. Readings are identical to get_gamma_from_values
+	on the numeric values of the curve.
+	Args:
+		low_pct (float, optional): Lower percentage the search range. Defaults to 0.20.
+		high_pct (float, optional): Upper percentage for the search range. Defaults to 0.20.
+		num_steps (int, optional): Number of steps of the gamma range. Defaults to NUM_STEPS.
+	"""
+	def __init__(self, low_pct=LOW_PCT, high_pct=HIGH_PCT, num_steps=NUM_STEPS):
+		self.low_pct = low_pct
+		self.high_pct = high_pct
+		self.num_steps = num_steps
+		self.analyzer = GammaAnalyzer()
+		self.values: List[float] = []
+		self.speeds: List[float] = []
+		self.accelerations: List[float] = []  # absolute values
+		self.sums: List[float] = []           # sum of num_steps accelerations from each index
+		self.full_updates = 0
+		self.partial_updates = 0
+		self._reading: Optional[GammaReading] = None  # last reading, until values change
+
+
+	def update(self, values: List[Optional[float]], step_value: float = STEP_VALUE) -> Optional[GammaReading]:
+		""" Synchronise the state with a curve and return its reading.
+		Args:
+			values (List[Optional[float]]): curve values, None for missing steps
+			step_value (float, optional): Step size used for gamma calculation. Defaults to STEP_VALUE.
+		Returns:
+			GammaReading, or None if fewer than 4 values are set
+		"""
+		self.set_values([v for v in values if isinstance(v, (int, float))])
+		return self.reading(step_value)
+
+
+	def set_values(self, values: List[float]):
+		""" Apply the differences between values and the current state """
+		old = self.values
+		if values == old:
+			return
+		self._reading = None
+		if len(values) < 4:
+			self.values = list(values)
+			self.speeds, self.accelerations, self.sums = [], [], []
+			return
+		if len(old) < 4 or len(values) not in (len(old), len(old) + 1):
+			# steps inserted or removed: positions moved
+			self._rebuild(values)
+			return
+
+		changed = [i for i in range(len(old)) if old[i] != values[i]]
+		if len(values) > len(old):
+			changed.append(len(old))
+			for data in (self.values, self.speeds, self.accelerations):
+				data.append(0.0)
+			self.sums.append(0.0)
+		if changed:
+			self.values[changed[0]:changed[-1] + 1] = values[changed[0]:changed[-1] + 1]
+			self._refresh(changed[0], changed[-1])
+
+
+	def _rebuild(self, values: List[float]):
+		self.full_updates += 1
+		self.values = list(values)
+		self.speeds = self.analyzer.get_derivatives(self.values)
+		self.accelerations = [abs(a) for a in self.analyzer.get_derivatives(self.speeds)]
+		self.sums = [
+			sum(self.accelerations[i:i + self.num_steps])
+			for i in range(max(0, len(values) - self.num_steps + 1))
+		]
+
+
+	def _refresh(self, low: int, high: int):
+		""" Recompute what depends on values[low:high + 1] """
+		self.partial_updates += 1
+		n = len(self.values)
+		values, speeds, accelerations = self.values, self.speeds, self.accelerations
+
+		# speeds[i] = values[i + 1] - values[i - 1], the last one repeats the one before
+		low = max(1, low - 1)
+		high = min(n - 2, high + 1)
+		for i in range(low, high + 1):
+			speeds[i] = values[i + 1] - values[i - 1]
+		if high >= n - 2:
+			speeds[n - 1] = speeds[n - 2]
+			high = n - 1
+
+		low = max(1, low - 1)
+		high = min(n - 2, high + 1)
+		for i in range(low, high + 1):
+			accelerations[i] = abs(speeds[i + 1] - speeds[i - 1])
+		if high >= n - 2:
+			accelerations[n - 1] = accelerations[n - 2]
+			high = n - 1
+
+		del self.sums[max(0, n - self.num_steps + 1):]
+		for i in range(max(0, low - self.num_steps + 1), min(high, n - self.num_steps) + 1):
+			self.sums[i] = sum(accelerations[i:i + self.num_steps])
+
+
+	def reading(self, step_value: float = STEP_VALUE) -> Optional[GammaReading]:
+		""" Reading of the current values, None if fewer than 4 values are set """
+		if len(self.values) < 4:
+			return None
+		if self._reading is not None and self._reading.step_value == step_value:
+			return self._reading
+		search_range = self.analyzer.get_search_range(self.values, self.low_pct, self.high_pct)
+
+		# same scan as GammaAnalyzer.get_gamma_range, on the stored window sums
+		best_start = search_range.start
+		min_acc_sum = float("inf")
+		for i in range(search_range.start, search_range.end - self.num_steps + 1):
+			if self.sums[i] < min_acc_sum:
+				min_acc_sum = self.sums[i]
+				best_start = i
+		gamma_range = Range(best_start, best_start + self.num_steps)
+
+		self._reading = GammaReading(
+			gamma=self.analyzer.get_gamma(gamma_range, self.values, step_value),
+			step_value=step_value,
+			d_min=min(self.values),
+			d_max=max(self.values),
+			search_range=Range(search_range.start + 1, search_range.end + 1),
+			gamma_range=Range(gamma_range.start + 1, gamma_range.end + 1)
+		)
+		return self._reading
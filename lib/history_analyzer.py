@@ -1,51 +1,333 @@
-from typing import List, Dict
-from statistics import mean
+import os
+from bisect import bisect
+from typing import Iterable, List, Dict, Optional
 from datetime import datetime
-from model.measurement_set import MeasurementSet
-from lib.gamma import GammaAnalyzer
+
+import numpy as np
+
+from model.measurement_set import MeasurementSet, measurement_cube
+from lib.gamma import GAMMA_CACHE, GammaAnalyzer, GammaReading
+from lib.archive import MeasurementArchive
+from lib.catalog import MeasurementCatalog
+from lib.summaries import SummaryParams, summarize_curve
+
+CHANNEL_ORDER = ("V", "R", "G", "B", "C", "M", "Y")
+NUM_VALUES = 21
+MIN_CAPACITY = 16
+
+
+def _channel_sort_key(channel: str):
+    return (CHANNEL_ORDER.index(channel), "") if channel in CHANNEL_ORDER else (len(CHANNEL_ORDER), channel)
+
+
+def _optional_list(values: np.ndarray) -> List[Optional[float]]:
+    """ values as floats, None where NaN """
+    return [None if v != v else v for v in values.tolist()]
 
 
 class HistoryAnalyzer:
-    def __init__(self, reference: MeasurementSet, measurements: List[MeasurementSet]):
+    """
+    Statistics over a set of measurements compared to a reference.
+    Curves are copied into a (measurements, channels, steps) cube, NaN for missing channels
+    (from_archive uses the archive cube instead), so every statistic is computed along the time axis for all the channels the files hold.
+    New measurements can be appended: running sums, min/max and cached readings are updated
+    in O(1) and queries return the current state without rescanning the history.
+    Args:
+        reference (MeasurementSet): reference measurement
+        measurements (list[MeasurementSet]): measurements to analyze
+        catalog (MeasurementCatalog, optional): source of precomputed curve summaries.
+            Curves without a stored summary are analyzed on the fly
+        params (SummaryParams): gamma analysis parameters
+    """
+    def __init__(self, reference: MeasurementSet, measurements: List[MeasurementSet],
+                 catalog: Optional[MeasurementCatalog] = None, params: SummaryParams = SummaryParams()):
         self.reference = reference
-        self.measurements = sorted(measurements, key=lambda m: m.date)
+        self.catalog = catalog
+        self.params = params
+        self._load(sorted(measurements, key=lambda m: m.date))
+
+    def _load(self, measurements: List[MeasurementSet], cube: Optional[np.ndarray] = None,
+              channels: Optional[List[str]] = None):
+        """
+        (Re)build the cube and the aggregates of date sorted measurements
+        Args:
+            cube (np.ndarray, optional): existing (measurements, channels, steps) cube of the
+                measurements, NaN for missing channels. Defaults to a float64 copy of their curves
+            channels (list[str], optional): channels of the cube columns
+        """
+        self.measurements = measurements
+        self._dates = [m.date for m in measurements]
+        self._summaries: Optional[Dict[str, Dict[str, GammaReading]]] = None
+        self._readings: Dict[str, List[Optional[GammaReading]]] = {}
+        self._gammas: Dict[str, List[Optional[float]]] = {}
+
+        if cube is None:
+            channels = sorted({ch for m in measurements for ch in m.curves}, key=_channel_sort_key)
+            cube, channels = measurement_cube(measurements, channels)
+        self._cube, self.channels = cube, list(channels)
+        self._present = ~np.isnan(self._cube[:, :, 0])  # (measurements, channels)
+        self._channel_index = {ch: i for i, ch in enumerate(self.channels)}
+
+        # running aggregates per (channel, step), in float64 whatever the cube dtype
+        mask = self._present[:, :, None]
+        values = np.where(mask, self._cube, 0.0)
+        self._count = self._present.sum(axis=0)
+        self._sum = values.sum(axis=0, dtype=np.float64)
+        self._sum_sq = np.einsum("nck,nck->ck", values, values, dtype=np.float64)
+        self._min = np.min(self._cube, axis=0, where=mask, initial=np.inf).astype(np.float64)
+        self._max = np.max(self._cube, axis=0, where=mask, initial=-np.inf).astype(np.float64)
+
+        d_min, d_max = self._cube.min(axis=2), self._cube.max(axis=2)  # NaN for missing channels
+        self._d_min = {ch: _optional_list(d_min[:, c]) for c, ch in enumerate(self.channels)}
+        self._d_max = {ch: _optional_list(d_max[:, c]) for c, ch in enumerate(self.channels)}
+
+    @property
+    def cube(self) -> np.ndarray:
+        """ (measurements, channels, steps) values, NaN for missing channels """
+        return self._cube[:len(self.measurements)]
+
+    @property
+    def present(self) -> np.ndarray:
+        """ (measurements, channels) mask of the channels each measurement holds """
+        return self._present[:len(self.measurements)]
+
+    @classmethod
+    def from_archive(cls, reference: MeasurementSet, archive: MeasurementArchive, rows: Optional[Iterable[int]] = None) -> "HistoryAnalyzer":
+        """
+        Analyzer over archived measurements. The analysis runs on the float32 archive cube:
+        a view of the mapped file when the rows are contiguous and in date order, else a copy
+        of the selected rows only. Curve values are views into the archive cube.
+        """
+        rows = np.arange(len(archive)) if rows is None else np.asarray(list(rows), dtype=np.int64)
+        rows = rows[np.argsort(archive.mtime_ns[rows], kind="stable")]
+        if len(rows) and np.array_equal(rows, np.arange(rows[0], rows[0] + len(rows))):
+            cube = archive.cube[rows[0]:rows[0] + len(rows)]
+        else:
+            cube = archive.cube[rows]
+        # columns from the first to the last channel the rows hold (still a view)
+        held = np.flatnonzero((~np.isnan(cube[:, :, 0])).any(axis=0))
+        first, last = (int(held[0]), int(held[-1]) + 1) if len(held) else (0, 0)
+        analyzer = cls.__new__(cls)  # the cube is given, skip the copy made by __init__
+        analyzer.reference = reference
+        analyzer.catalog = None
+        analyzer.params = SummaryParams()
+        analyzer._load(archive.measurement_sets(rows.tolist()), cube[:, first:last], archive.channels[first:last])
+        return analyzer
+
+    def _add_channel(self, channel: str):
+        """
+        Insert a channel seen for the first time, keeping the channel order
+        """
+        c = bisect([_channel_sort_key(ch) for ch in self.channels], _channel_sort_key(channel))
+        self.channels.insert(c, channel)
+        self._channel_index = {ch: i for i, ch in enumerate(self.channels)}
+        self._cube = np.insert(self._cube, c, np.nan, axis=1)
+        self._present = np.insert(self._present, c, False, axis=1)
+        self._count = np.insert(self._count, c, 0)
+        self._sum = np.insert(self._sum, c, 0.0, axis=0)
+        self._sum_sq = np.insert(self._sum_sq, c, 0.0, axis=0)
+        self._min = np.insert(self._min, c, np.inf, axis=0)
+        self._max = np.insert(self._max, c, -np.inf, axis=0)
+        n = len(self.measurements)
+        self._d_min[channel] = [None] * n
+        self._d_max[channel] = [None] * n
+
+    def append(self, measurement: MeasurementSet):
+        """
+        Add a measurement to the history in O(1).
+        A measurement older than the last one is inserted at its place, which rebuilds the analysis.
+        """
+        if self._dates and measurement.date < self._dates[-1]:
+            self._load(sorted(self.measurements + [measurement], key=lambda m: m.date))
+            return
+
+        for channel in measurement.curves:
+            if channel not in self._channel_index:
+                self._add_channel(channel)
+
+        # capacity doubles when full, so appending costs O(1) amortized
+        row = len(self.measurements)
+        if row == len(self._cube):
+            capacity = max(MIN_CAPACITY, 2 * row)
+            cube = np.full((capacity,) + self._cube.shape[1:], np.nan)
+            cube[:row] = self._cube[:row]
+            present = np.zeros((capacity, len(self.channels)), dtype=bool)
+            present[:row] = self._present[:row]
+            self._cube, self._present = cube, present
+        self._cube[row] = np.nan
+        self._present[row] = False
+
+        for channel in self.channels:
+            curve = measurement.curves.get(channel)
+            if curve is None:
+                self._d_min[channel].append(None)
+                self._d_max[channel].append(None)
+                continue
+            c = self._channel_index[channel]
+            values = self._cube[row, c]
+            values[:] = curve.values
+            self._present[row, c] = True
+            self._count[c] += 1
+            self._sum[c] += values
+            self._sum_sq[c] += values * values
+            np.minimum(self._min[c], values, out=self._min[c])
+            np.maximum(self._max[c], values, out=self._max[c])
+            self._d_min[channel].append(float(values.min()))
+            self._d_max[channel].append(float(values.max()))
+
+        self.measurements.append(measurement)
+        self._dates.append(measurement.date)
+
+        if self._summaries is not None and measurement.path:
+            self._summaries.update(self.catalog.get_summaries([str(measurement.path)], self.params))
+        for channel, readings in self._readings.items():
+            reading = self._append_reading(measurement, channel)
+            readings.append(reading)
+            self._gammas[channel].append(reading.gamma if reading else None)
+
+    def _append_reading(self, measurement: MeasurementSet, channel: str) -> Optional[GammaReading]:
+        try:
+            return self.get_summary(measurement, channel)
+        except (ValueError, ArithmeticError, IndexError) as e:
+            print(f"error computing gamma for {measurement.path} {channel}: {e}")
+            return None
 
     def get_dates(self) -> List[datetime]:
-        return [m.date for m in self.measurements]
+        return list(self._dates)
 
     def get_average_curve(self, channel: str) -> List[float]:
-        grouped = zip(*[m.curves[channel].values for m in self.measurements if channel in m.curves])
-        return [mean(point_group) for point_group in grouped]
+        c = self._channel_index.get(channel)
+        if c is None or not self._count[c]:
+            return []
+        return (self._sum[c] / self._count[c]).tolist()
+
+    def get_std_curve(self, channel: str, ddof: int = 0) -> List[float]:
+        """
+        Standard deviation of each step (population by default, ddof=1 for the sample one)
+        """
+        c = self._channel_index.get(channel)
+        if c is None or not self._count[c]:
+            return []
+        n = self._count[c]
+        mean = self._sum[c] / n
+        variance = np.maximum(self._sum_sq[c] / n - mean * mean, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.sqrt(variance * n / (n - ddof)).tolist()
+
+    def get_min_curve(self, channel: str) -> List[float]:
+        c = self._channel_index.get(channel)
+        return self._min[c].tolist() if c is not None and self._count[c] else []
+
+    def get_max_curve(self, channel: str) -> List[float]:
+        c = self._channel_index.get(channel)
+        return self._max[c].tolist() if c is not None and self._count[c] else []
+
+    def get_percentile_curve(self, channel: str, q: float) -> List[float]:
+        """
+        q-th percentile (0-100) of each step, linearly interpolated.
+        Percentiles have no running form, they are computed from the cube.
+        """
+        c = self._channel_index.get(channel)
+        if c is None or not self._count[c]:
+            return []
+        return np.percentile(self.cube[self.present[:, c], c], q, axis=0).tolist()
 
     def get_reference_curve(self, channel: str) -> List[float]:
-        return self.reference.curves[channel].values if channel in self.reference.curves else [0.0]*21
-
-    def get_gamma_evolution(self) -> Dict[str, List[float]]:
-        gamma_evolution = {"R": [], "G": [], "B": []}
-        analyzer = GammaAnalyzer()
-
-        for m in self.measurements:
-            for channel in gamma_evolution:
-                curve = m.curves.get(channel)
-                if curve:
-                    reading = analyzer.get_gamma_from_values(curve.values)
-                    gamma_evolution[channel].append(reading.gamma)
-                else:
-                    gamma_evolution[channel].append(None)
-        return gamma_evolution
-
-    def get_dmin_evolution(self) -> Dict[str, List[float]]:
-        result = {"R": [], "G": [], "B": []}
-        for m in self.measurements:
-            for channel in result:
-                curve = m.curves.get(channel)
-                result[channel].append(min(curve.values) if curve else None)
-        return result
-
-    def get_dmax_evolution(self) -> Dict[str, List[float]]:
-        result = {"R": [], "G": [], "B": []}
-        for m in self.measurements:
-            for channel in result:
-                curve = m.curves.get(channel)
-                result[channel].append(max(curve.values) if curve else None)
-        return result
\ No newline at end of file
+        return self.reference.curves[channel].values.tolist() if channel in self.reference.curves else [0.0]*NUM_VALUES
+
+    def _stored_summary(self, measurement: MeasurementSet, channel: str) -> Optional[GammaReading]:
+        """
+        Summary of a curve read from the catalog, None when not stored
+        """
+        if self.catalog is None:
+            return None
+        if self._summaries is None:
+            paths = [str(m.path) for m in self.measurements + [self.reference] if m.path]
+            self._summaries = self.catalog.get_summaries(paths, self.params)
+        return self._summaries.get(os.path.normpath(str(measurement.path)), {}).get(channel)
+
+    def get_summary(self, measurement: MeasurementSet, channel: str) -> Optional[GammaReading]:
+        """
+        Gamma reading of a measurement channel, from the catalog when available
+        Returns:
+            GammaReading, or None if the channel is missing
+        """
+        curve = measurement.curves.get(channel)
+        if curve is None:
+            return None
+        reading = self._stored_summary(measurement, channel)
+        if reading is None:
+            reading = summarize_curve(curve.values.tolist(), self.params, GammaAnalyzer(cache=GAMMA_CACHE))
+        return reading
+
+    def get_reference_gamma(self) -> Dict[str, float]:
+        gamma_ref = {}
+        for channel in self.reference.curves:
+            try:
+                gamma_ref[channel] = self.get_summary(self.reference, channel).gamma
+            except Exception as e:
+                print(f"error computing gamma for ref {channel}: {e}")
+        return gamma_ref
+
+    def get_channel_readings(self, channel: str) -> List[Optional[GammaReading]]:
+        """
+        Gamma readings of a channel for every measurement. Curves without a stored
+        summary are analyzed in a single batch, then kept up to date by append.
+        Returns:
+            list: GammaReading per measurement, None if the channel is missing or can not be analyzed
+        """
+        if channel in self._readings:
+            return list(self._readings[channel])
+
+        readings: List[Optional[GammaReading]] = [None] * len(self.measurements)
+        c = self._channel_index.get(channel)
+        if c is not None:
+            rows = np.flatnonzero(self.present[:, c])
+            missing = []
+            for i in rows.tolist():
+                readings[i] = self._stored_summary(self.measurements[i], channel)
+                if readings[i] is None:
+                    missing.append(i)
+
+            if missing:
+                batch = GammaAnalyzer().get_gamma_batch(
+                    self.cube[missing, c],
+                    step_value=self.params.step_value, low_pct=self.params.low_pct,
+                    high_pct=self.params.high_pct, min_diff=self.params.min_diff, num_steps=self.params.num_steps
+                )
+                for j, i in enumerate(missing):
+                    if np.isnan(batch.gamma[j]):
+                        print(f"error computing gamma for {self.measurements[i].path} {channel}")
+                        continue
+                    readings[i] = batch.reading(j)
+
+        self._readings[channel] = readings
+        self._gammas[channel] = [r.gamma if r else None for r in readings]
+        return list(readings)
+
+    def get_gamma_evolution(self, channels: Optional[List[str]] = None) -> Dict[str, List[Optional[float]]]:
+        """
+        Gamma of every measurement per channel, None where the channel is missing.
+        The lists are copies, the analyzer keeps its own up to date on append.
+        Args:
+            channels (list[str], optional): channels to analyze. Defaults to all the measured channels
+        """
+        evolution = {}
+        for channel in (channels or self.channels):
+            if channel not in self._gammas:
+                self.get_channel_readings(channel)
+            evolution[channel] = list(self._gammas[channel])
+        return evolution
+
+    def get_step_evolution(self, step: int) -> Dict[str, List[Optional[float]]]:
+        """
+        Density of a step (1-based) for every measurement, per channel
+        """
+        values = self.cube[:, :, step - 1]
+        return {channel: _optional_list(values[:, c]) for c, channel in enumerate(self.channels)}
+
+    def get_dmin_evolution(self) -> Dict[str, List[Optional[float]]]:
+        return {channel: list(self._d_min[channel]) for channel in self.channels}
+
+    def get_dmax_evolution(self) -> Dict[str, List[Optional[float]]]:
+        return {channel: list(self._d_max[channel]) for channel in self.channels}
@@ -0,0 +1,147 @@
+# lib/history_index.py
+
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+NGRAM_SIZES = (1, 2, 3)
+
+
+def parse_date(date_str: Optional[str]) -> Optional[date]:
+    """
+    Date of a "yyyy-mm-dd" string, None when invalid
+    """
+    try:
+        return date.fromisoformat(date_str) if date_str else None
+    except ValueError:
+        return None
+
+
+def period_range(period: str, today: Optional[date] = None) -> Optional[Tuple[date, date]]:
+    """
+    Date range of a History period filter
+    Args:
+        period (str): "Aujourd’hui", "Ce mois-ci" or "Cette année"
+        today (date, optional): defaults to the current date
+    Returns:
+        (first, last) dates, or None for no date filtering
+    """
+    today = today or date.today()
+    if period == "Aujourd’hui":
+        return today, today
+    if period == "Ce mois-ci":
+        first = today.replace(day=1)
+        next_month = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+        return first, date.fromordinal(next_month.toordinal() - 1)
+    if period == "Cette année":
+        return date(today.year, 1, 1), date(today.year, 12, 31)
+    return None
+
+
+class DateIndex:
+    """
+    Sorted (date, id) index, answering date range queries by bisection
+    """
+    def __init__(self):
+        self._keys: List[Tuple[int, int]] = []  # (ordinal, id), sorted
+        self._ordinal_of: Dict[int, int] = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, item_id: int, day: Optional[date]):
+        self.remove(item_id)
+        if day is None:
+            return
+        ordinal = day.toordinal()
+        insort(self._keys, (ordinal, item_id))
+        self._ordinal_of[item_id] = ordinal
+
+    def remove(self, item_id: int):
+        ordinal = self._ordinal_of.pop(item_id, None)
+        if ordinal is not None:
+            del self._keys[bisect_left(self._keys, (ordinal, item_id))]
+
+    def clear(self):
+        self._keys.clear()
+        self._ordinal_of.clear()
+
+    def range(self, first: date, last: date) -> List[int]:
+        """
+        Ids dated between first and last, both included
+        """
+        start = bisect_left(self._keys, (first.toordinal(), -1))
+        end = bisect_right(self._keys, (last.toordinal(), float("inf")))
+        return [item_id for _, item_id in self._keys[start:end]]
+
+
+class NgramIndex:
+    """
+    Substring search index over short texts (file labels).
+    Every 1, 2 and 3 character gram of a text points to its id; a query only verifies the
+    ids of its rarest gram, so its cost follows the number of candidates, not of texts.
+    Postings are append-only: removed or changed texts are filtered out by the verification
+    and the index is rebuilt once stale postings outnumber live ones.
+    Args:
+        get_text (callable): current lower case text of an id, None once removed
+    """
+    def __init__(self, get_text: Callable[[int], Optional[str]]):
+        self._get_text = get_text
+        self._postings: Dict[str, array] = {}
+        self._live: Set[int] = set()
+        self._stale = 0
+
+    def add(self, item_id: int, text: str):
+        if item_id in self._live:
+            self._stale += 1
+        self._live.add(item_id)
+        for gram in self._grams(text):
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = array("i")
+            posting.append(item_id)
+
+    def remove(self, item_id: int):
+        if item_id in self._live:
+            self._live.discard(item_id)
+            self._stale += 1
+
+    def clear(self):
+        self._postings.clear()
+        self._live.clear()
+        self._stale = 0
+
+    def rebuild(self, items: Iterable[Tuple[int, str]]):
+        self.clear()
+        for item_id, text in items:
+            self.add(item_id, text)
+
+    @property
+    def needs_rebuild(self) -> bool:
+        return self._stale > max(1000, len(self._live))
+
+    @staticmethod
+    def _grams(text: str) -> Set[str]:
+        return {text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1)}
+
+    def search(self, text: str) -> Set[int]:
+        """
+        Ids whose text contains text (case insensitive)
+        """
+        text = text.lower()
+        if not text:
+            return set(self._live)
+        size = min(len(text), NGRAM_SIZES[-1])
+        grams = {text[i:i + size] for i in range(len(text) - size + 1)}
+        postings = [self._postings.get(gram) for gram in grams]
+        if any(p is None for p in postings):
+            return set()
+        candidates = min(postings, key=len)
+        matches = set()
+        for item_id in candidates:
+            if item_id in self._live:
+                label = self._get_text(item_id)
+                if label is not None and text in label:
+                    matches.add(item_id)
+        return matches
@@ -0,0 +1,279 @@
+# lib/measures_watcher.py
+
+import os
+import threading
+from typing import List, Optional, Set
+
+from PySide6.QtCore import QObject, QFileSystemWatcher, QRunnable, QThreadPool, QTimer, Signal
+
+from constants import MEASURES_PATH
+from lib.catalog import CatalogChanges, MeasurementCatalog, get_catalog
+from model.measurement_set import MEASUREMENT_CACHE
+
+DEBOUNCE_MS = 50
+SCAN_BATCH = 500
+
+
+class CatalogScanSignals(QObject):
+    entries_loaded = Signal(list)    # already indexed CatalogEntry batch
+    chunk_indexed = Signal(object)   # CatalogChanges of a parsed chunk
+    progress = Signal(int, int)      # parsed files, files to parse
+    finished = Signal(bool)          # completed (False when cancelled)
+
+
+class CatalogScanWorker(QRunnable):
+    """
+    Background catalog refresh: streams the already indexed entries, then
+    the changes found on disk chunk by chunk.
+    Args:
+        catalog (MeasurementCatalog): catalog to refresh
+    """
+    def __init__(self, catalog: MeasurementCatalog):
+        super().__init__()
+        self.catalog = catalog
+        self.signals = CatalogScanSignals()
+        self._cancelled = threading.Event()
+        self.started = False
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def run(self):
+        try:
+            entries = self.catalog.entries()
+            for start in range(0, len(entries), SCAN_BATCH):
+                if self.is_cancelled():
+                    break
+                self.signals.entries_loaded.emit(entries[start:start + SCAN_BATCH])
+
+            def on_chunk(changes: CatalogChanges, done: int, total: int):
+                self.signals.chunk_indexed.emit(changes)
+                self.signals.progress.emit(done, total)
+
+            if not self.is_cancelled():
+                self.catalog.refresh(on_chunk=on_chunk, is_cancelled=self.is_cancelled)
+        except Exception as e:
+            print(f"Catalog scan error : {e}")
+        finally:
+            self.signals.finished.emit(not self.is_cancelled())
+
+
+class CatalogFlushSignals(QObject):
+    done = Signal(object, list)      # CatalogChanges, new sub folders to watch
+
+
+class CatalogFlushWorker(QRunnable):
+    """
+    Background refresh of the folders reported as changed by the file system watcher.
+    Args:
+        catalog (MeasurementCatalog): catalog to refresh
+        root (str): measures folder
+        directories (list[str]): changed folders (absolute paths)
+        watched (set[str]): folders already watched
+    """
+    def __init__(self, catalog: MeasurementCatalog, root: str, directories: List[str], watched: Set[str]):
+        super().__init__()
+        self.catalog = catalog
+        self.root = root
+        self.directories = directories
+        self.watched = watched
+        self.signals = CatalogFlushSignals()
+
+    def run(self):
+        added: List[str] = []
+        modified: List[str] = []
+        removed: List[str] = []
+        new_dirs: List[str] = []
+
+        def collect(changes: CatalogChanges):
+            added.extend(changes.added)
+            modified.extend(changes.updated)
+            removed.extend(changes.removed)
+
+        try:
+            for directory in self.directories:
+                rel_folder = os.path.relpath(directory, self.root)
+                if rel_folder.startswith(os.pardir):
+                    continue
+                if not os.path.isdir(directory):
+                    # removed folder: drop everything indexed below it
+                    collect(self.catalog.refresh(rel_folder, recursive=True))
+                    continue
+                collect(self.catalog.refresh(rel_folder, recursive=False))
+                # new sub folders may arrive with their content
+                for name in os.listdir(directory):
+                    sub = os.path.join(directory, name)
+                    if os.path.isdir(sub) and sub not in self.watched:
+                        new_dirs.append(sub)
+                        collect(self.catalog.refresh(os.path.relpath(sub, self.root), recursive=True))
+        except Exception as e:
+            print(f"Catalog refresh error : {e}")
+        finally:
+            self.signals.done.emit(CatalogChanges(added, modified, removed), new_dirs)
+
+
+class MeasuresWatcher(QObject):
+    """
+    Watch the measures tree (and its sub folders such as ref) and keep the catalog in sync.
+    Only the folders reported as changed are rescanned; signals carry paths relative to the root.
+    Args:
+        root (str): measures folder to watch
+        catalog (MeasurementCatalog, optional): catalog to update. Defaults to the shared one
+    """
+    files_added = Signal(list)
+    files_modified = Signal(list)
+    files_removed = Signal(list)
+
+    scan_started = Signal()
+    scan_entries = Signal(list)      # entries already indexed, streamed at scan start
+    scan_progress = Signal(int, int) # parsed files, files to parse
+    scan_finished = Signal(bool)     # completed (False when cancelled)
+
+
+    def __init__(self, root: str = MEASURES_PATH, catalog: Optional[MeasurementCatalog] = None, parent=None):
+        super().__init__(parent)
+        self.root = os.path.normpath(root)
+        self.catalog = catalog or get_catalog(self.root)
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+
+        # coalesce the burst of notifications sent while a file is written
+        self._pending: Set[str] = set()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(DEBOUNCE_MS)
+        self._timer.timeout.connect(self._flush)
+
+        self._scan_worker: Optional[CatalogScanWorker] = None
+        self._scan_workers: Set[CatalogScanWorker] = set()
+        # running background job (scan or flush), the catalog is refreshed by one job at a time
+        self._job: Optional[QRunnable] = None
+
+        self._watch_tree(self.root)
+
+
+    def scan(self):
+        """
+        Refresh the whole catalog in the background. Listeners first receive the indexed
+        entries (scan_entries), then file events for what changed on disk.
+        """
+        self.cancel_scan()
+        worker = CatalogScanWorker(self.catalog)
+        worker.signals.entries_loaded.connect(self.scan_entries)
+        worker.signals.chunk_indexed.connect(self._emit_changes)
+        worker.signals.progress.connect(self.scan_progress)
+        worker.signals.finished.connect(lambda completed: self._on_scan_finished(worker, completed))
+        # cancelled workers stay referenced until they return
+        self._scan_workers.add(worker)
+        self._scan_worker = worker
+        self.scan_started.emit()
+        self._start_next()
+
+
+    def cancel_scan(self):
+        worker = self._scan_worker
+        if worker is None:
+            return
+        worker.cancel()
+        if not worker.started:
+            # still queued behind a flush: never started, finish it now
+            self._on_scan_finished(worker, False)
+
+
+    def is_scanning(self) -> bool:
+        return self._scan_worker is not None
+
+
+    def _on_scan_finished(self, worker: CatalogScanWorker, completed: bool):
+        self._scan_workers.discard(worker)
+        worker.signals.deleteLater()
+        if worker is self._job:
+            self._job = None
+        if worker is self._scan_worker:
+            self._scan_worker = None
+            self.scan_finished.emit(completed)
+        self._start_next()
+
+
+    def _watch_tree(self, directory: str):
+        """
+        Add directory and its sub folders to the watcher
+        """
+        directories = [directory]
+        for current, dirs, _ in os.walk(directory):
+            directories.extend(os.path.join(current, d) for d in dirs)
+        watched = set(self._watcher.directories())
+        new = [d for d in directories if d not in watched]
+        if new:
+            self._watcher.addPaths(new)
+
+
+    def _on_directory_changed(self, directory: str):
+        self._pending.add(os.path.normpath(directory))
+        self._timer.start()
+
+
+    def notify(self, path: str):
+        """
+        Report a file written by the application (e.g. export), for platforms
+        that do not signal in place modifications.
+        """
+        self._on_directory_changed(os.path.dirname(os.path.abspath(path)))
+
+
+    def _flush(self):
+        """
+        Rescan the changed folders in the background, one job at a time:
+        changes arriving during a scan or a flush wait for it to end.
+        """
+        if self._job is not None or not self._pending:
+            return
+        pending, self._pending = self._pending, set()
+        watched = set(self._watcher.directories())
+        gone = [d for d in pending if d in watched and not os.path.isdir(d)]
+        if gone:
+            self._watcher.removePaths(gone)
+            watched.difference_update(gone)
+        worker = CatalogFlushWorker(self.catalog, self.root, sorted(pending), watched)
+        worker.signals.done.connect(lambda changes, new_dirs: self._on_flush_done(worker, changes, new_dirs))
+        self._job = worker
+        QThreadPool.globalInstance().start(worker)
+
+
+    def _on_flush_done(self, worker: "CatalogFlushWorker", changes: CatalogChanges, new_dirs: List[str]):
+        worker.signals.deleteLater()
+        for directory in new_dirs:
+            self._watch_tree(directory)
+        self._emit_changes(changes)
+        self._job = None
+        self._start_next()
+
+
+    def _start_next(self):
+        """
+        Start the queued scan, else the pending folder changes
+        """
+        if self._job is not None:
+            return
+        if self._scan_worker is not None and not self._scan_worker.started:
+            self._scan_worker.started = True
+            self._job = self._scan_worker
+            QThreadPool.globalInstance().start(self._scan_worker)
+        else:
+            self._flush()
+
+
+    def _emit_changes(self, changes: CatalogChanges):
+        for rel_path in changes.updated + changes.removed:
+            MEASUREMENT_CACHE.invalidate(os.path.join(self.root, rel_path))
+
+        if changes.removed:
+            self.files_removed.emit(changes.removed)
+        if changes.updated:
+            self.files_modified.emit(changes.updated)
+        if changes.added:
+            self.files_added.emit(changes.added)
@@ -0,0 +1,139 @@
+# lib/reference_index.py
+
+import os
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from constants import MEASURES_PATH
+from lib.catalog import MeasurementCatalog, get_catalog
+
+CHANNELS = ("V", "R", "G", "B", "C", "M", "Y")
+NUM_VALUES = 21
+MIN_STEPS = 4  # known steps needed to compare a channel
+
+
+class ReferenceMatch(NamedTuple):
+    rel_path: str         # path relative to the measures folder
+    name: str
+    distance: float       # mean squared distance of the normalized curves of the shared channels
+    channels: List[str]   # compared channels
+
+
+def _normalize(values: np.ndarray) -> np.ndarray:
+    """
+    Curves shifted to start at 0 (base + fog removed) and scaled to unit length along the last
+    axis: curves of the same stock match whatever their exposure level. NaN stays NaN.
+    """
+    shifted = values - np.fmin.reduce(values, axis=-1, keepdims=True)
+    norm = np.sqrt(np.nansum(shifted * shifted, axis=-1, keepdims=True))
+    normalized = np.divide(shifted, norm, out=np.zeros_like(shifted), where=norm > 0)
+    return np.where(np.isnan(values), np.nan, normalized)
+
+
+class ReferenceIndex:
+    """
+    Nearest-neighbour index over the reference library (measures/ref).
+    Every reference channel is stored as a normalized 21 step vector, a query compares
+    the channels it shares with all references at once.
+    Args:
+        catalog (MeasurementCatalog, optional): source of the curves. Defaults to the shared one
+        folder (str): reference folder, relative to the catalog root
+    """
+    def __init__(self, catalog: Optional[MeasurementCatalog] = None, folder: str = "ref"):
+        self.catalog = catalog or get_catalog()
+        self.folder = folder
+        self._built = False
+        self.paths: List[str] = []
+        self.names: List[str] = []
+        self._set_values(np.empty((0, len(CHANNELS), NUM_VALUES)))
+
+    def _set_values(self, values: np.ndarray):
+        self.values = values                                 # (references, channels, steps), NaN if missing
+        self.present = ~np.isnan(values[:, :, 0])            # (references, channels)
+        self.vectors = np.nan_to_num(_normalize(values))     # missing channels are zero vectors
+        self.sq_norms = np.einsum("ncs,ncs->nc", self.vectors, self.vectors)
+
+    def invalidate(self):
+        """ Rebuild the index at the next query """
+        self._built = False
+
+    def build(self):
+        entries = [e for e in self.catalog.entries(with_values=True, folder=self.folder) if not e.error]
+        values = np.full((len(entries), len(CHANNELS), NUM_VALUES), np.nan)
+        for row, entry in enumerate(entries):
+            for channel, curve in entry.values.items():
+                channel = channel.upper()
+                if channel in CHANNELS and channel in entry.curve_channels:
+                    values[row, CHANNELS.index(channel)] = curve
+        self.paths = [e.rel_path for e in entries]
+        self.names = [e.name or os.path.splitext(os.path.basename(e.rel_path))[0] for e in entries]
+        self._set_values(values)
+        self._built = True
+
+    def __len__(self):
+        if not self._built:
+            self.build()
+        return len(self.paths)
+
+    def nearest(self, curves: Dict[str, Sequence[Optional[float]]], k: int = 3) -> List[ReferenceMatch]:
+        """
+        References closest to measured curves
+        Args:
+            curves (dict[str, list]): density values per channel, None for the steps not measured yet
+            k (int): number of references to return
+        Returns:
+            list[ReferenceMatch]: closest first
+        """
+        if not self._built:
+            self.build()
+        query = np.full((len(CHANNELS), NUM_VALUES), np.nan)
+        for channel, values in curves.items():
+            channel = channel.upper()
+            if channel in CHANNELS and len(values) == NUM_VALUES:
+                query[CHANNELS.index(channel)] = [np.nan if v is None else v for v in values]
+        # channels with too few measured steps are not compared
+        known = ~np.isnan(query)
+        channels = np.flatnonzero(known.sum(axis=1) >= MIN_STEPS)
+        if not len(channels) or not self.paths:
+            return []
+        query, known = query[channels], known[channels]
+
+        if known.all():
+            # |v - q|² = |v|² + |q|² - 2 v.q over the precomputed vectors
+            q = _normalize(query)
+            squared = self.sq_norms[:, channels] + np.einsum("cs,cs->c", q, q) \
+                - 2 * np.einsum("ncs,cs->nc", self.vectors[:, channels], q)
+            squared = np.maximum(squared, 0.0)
+        else:
+            # partial curves: normalize the references on the measured steps only
+            vectors = np.nan_to_num(_normalize(np.where(known, self.values[:, channels], np.nan)))
+            diff = vectors - np.nan_to_num(_normalize(np.where(known, query, np.nan)))
+            squared = np.einsum("ncs,ncs->nc", diff, diff)
+
+        shared = self.present[:, channels]
+        count = shared.sum(axis=1)
+        total = np.where(shared, squared, 0.0).sum(axis=1)
+        distance = np.where(count > 0, total / np.maximum(count, 1), np.inf)
+
+        k = min(k, len(distance))
+        best = np.argpartition(distance, k - 1)[:k]
+        best = best[np.argsort(distance[best], kind="stable")]
+        return [
+            ReferenceMatch(self.paths[i], self.names[i], float(distance[i]),
+                           [CHANNELS[c] for c, ok in zip(channels.tolist(), shared[i].tolist()) if ok])
+            for i in best.tolist() if np.isfinite(distance[i])
+        ]
+
+
+_INDEXES: Dict[str, ReferenceIndex] = {}
+
+
+def get_reference_index(root: str = MEASURES_PATH) -> ReferenceIndex:
+    """
+    Shared reference index of a measures folder
+    """
+    root = os.path.normpath(root)
+    if root not in _INDEXES:
+        _INDEXES[root] = ReferenceIndex(get_catalog(root))
+    return _INDEXES[root]
@@ -0,0 +1,331 @@
+# lib/report.py
+
+import argparse
+import glob
+import io
+import os
+import struct
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+from constants import COLOR_SET
+from lib.gamma import GAMMA_CACHE, GammaAnalyzer
+from lib.summaries import SummaryParams, summarize_curve
+from model.measurement_set import MeasurementSet, load_measurement_file
+from utils.parallel import make_executor
+from utils.plot_utils import draw_curve_graph
+
+PAGE_SIZE = (8.27, 11.69)  # A4 portrait, inches
+DPI = 100
+PNG_COMPRESS_LEVEL = 1     # fast encoding, the pages are mostly white
+
+
+class ReportOptions(NamedTuple):
+    """
+    Report settings, sent to every worker process
+    """
+    reference: Optional[str] = None  # reference measurement file, for delta-d and gamma deviations
+    params: SummaryParams = SummaryParams()
+    dpi: int = DPI
+
+
+class ReportPage(NamedTuple):
+    """
+    Rendered report of one measurement file
+    """
+    path: str
+    png: Optional[bytes] = None  # RGB page image, None if the file could not be read
+    error: Optional[str] = None
+
+
+# per process: the reference is loaded once for all the pages a worker renders
+_REFERENCES: Dict[str, Optional[MeasurementSet]] = {}
+_ANALYZER = GammaAnalyzer(cache=GAMMA_CACHE)
+
+
+def _reference(path: Optional[str]) -> Optional[MeasurementSet]:
+    if not path:
+        return None
+    if path not in _REFERENCES:
+        _REFERENCES[path] = load_measurement_file(Path(path))
+    return _REFERENCES[path]
+
+
+def _color_mode(measurement: MeasurementSet) -> str:
+    return 'vcmy' if any(ch.lower() in "cmy" for ch in measurement.curves) else 'vrgb'
+
+
+def _gamma_rows(measurement: MeasurementSet, reference: Optional[MeasurementSet], params: SummaryParams) -> List[List[str]]:
+    """ gamma table rows: channel, gamma, Dmin, Dmax, reference gamma, deviation """
+    def gamma(values) -> Optional[float]:
+        try:
+            return summarize_curve(values.tolist(), params, _ANALYZER).gamma
+        except (ValueError, ArithmeticError, IndexError) as e:
+            print(f"Report gamma error : {e}")
+            return None
+
+    fmt = lambda v: "-" if v is None else f"{v:.2f}"
+    rows = []
+    for channel, curve in measurement.curves.items():
+        g = gamma(curve.values)
+        ref_curve = reference.curves.get(channel) if reference else None
+        g_ref = gamma(ref_curve.values) if ref_curve is not None else None
+        delta = g - g_ref if g is not None and g_ref is not None else None
+        rows.append([channel, fmt(g), fmt(float(curve.values.min())), fmt(float(curve.values.max())),
+                     fmt(g_ref), "-" if delta is None else f"{delta:+.2f}"])
+    return rows
+
+
+def build_report_figure(measurement: MeasurementSet, reference: Optional[MeasurementSet] = None,
+                        params: SummaryParams = SummaryParams(), dpi: int = DPI) -> Figure:
+    """
+    Report page of a measurement: density curves, delta-d against the reference and gamma table.
+    The figure is not attached to any GUI backend.
+    """
+    figure = Figure(figsize=PAGE_SIZE, dpi=dpi)
+    FigureCanvasAgg(figure)
+    grid = figure.add_gridspec(3, 1, height_ratios=[5, 4, 1.6], left=0.1, right=0.95, top=0.9, bottom=0.03, hspace=0.3)
+    ax_sensito = figure.add_subplot(grid[0])
+    ax_deltad = figure.add_subplot(grid[1])
+    ax_table = figure.add_subplot(grid[2])
+
+    name = measurement.name or os.path.splitext(os.path.basename(str(measurement.path)))[0]
+    figure.suptitle(name, fontsize=14, x=0.1, y=0.975, ha="left")
+    subtitle = f"{os.path.basename(str(measurement.path))} - {measurement.date:%Y-%m-%d %H:%M}"
+    if reference is not None:
+        subtitle += f" - réf {os.path.basename(str(reference.path))}"
+    figure.text(0.1, 0.94, subtitle, fontsize=9, color="#555")
+
+    color_set = COLOR_SET[_color_mode(measurement)]
+    sensito, deltad = {}, {}
+    for channel, curve in measurement.curves.items():
+        color = color_set.get_color_name(channel)
+        sensito[f"Meas {channel}"] = {"y": curve.values.tolist(), "color": color}
+        ref_curve = reference.curves.get(channel) if reference else None
+        if ref_curve is not None:
+            sensito[f"Ref {channel}"] = {"y": ref_curve.values.tolist(), "color": color, "linestyle": "--"}
+            deltad[f"Δ {channel}"] = {"y": abs(curve.values - ref_curve.values).tolist(), "color": color}
+
+    draw_curve_graph(ax_sensito, None, sensito, title="Density curves", xlabel="Measurement", ylabel="Density")
+    ax_sensito.axvline(x=11, color="black", linestyle="--", linewidth=1.0, alpha=0.2)
+    draw_curve_graph(ax_deltad, None, deltad, title="Delta Curves", xlabel="Measurement", ylabel="Δ Density (meas - ref)")
+
+    ax_table.axis("off")
+    table = ax_table.table(
+        cellText=_gamma_rows(measurement, reference, params),
+        colLabels=["Canal", "Gamma", "Dmin", "Dmax", "Gamma réf", "Δ gamma"],
+        loc="upper center", cellLoc="center",
+    )
+    table.scale(1, 1.4)
+    ax_table.set_title(f"Gamma (step {params.step_value:.2f})")
+    return figure
+
+
+def render_report_page(path: str, options: ReportOptions = ReportOptions()) -> ReportPage:
+    """
+    Render the report of a measurement file to a PNG page. Runs in the worker processes.
+    A file that can not be rendered gives a page with its error, the other pages go on.
+    """
+    try:
+        return _render_page(path, options)
+    except Exception as e:
+        return ReportPage(path, error=str(e) or type(e).__name__)
+
+
+def _render_page(path: str, options: ReportOptions) -> ReportPage:
+    measurement = load_measurement_file(Path(path))
+    if measurement is None:
+        return ReportPage(path, error="fichier illisible")
+    figure = build_report_figure(measurement, _reference(options.reference), options.params, options.dpi)
+    figure.canvas.draw()
+    # RGB, so that the PDF can embed the PNG data as it is
+    image = Image.frombuffer("RGBA", figure.canvas.get_width_height(), figure.canvas.buffer_rgba()).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return ReportPage(path, buffer.getvalue())
+
+
+def _png_data(png: bytes) -> Tuple[int, int, bytes]:
+    """
+    Size and compressed pixel data of an 8 bit RGB non interlaced PNG
+    Raises:
+        ValueError: other PNG formats
+    """
+    if png[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError("not a PNG image")
+    width, height, depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", png[16:29])
+    if (depth, color_type, interlace) != (8, 2, 0):
+        raise ValueError("PNG must be 8 bit RGB, not interlaced")
+    chunks, pos = [], 8
+    while pos < len(png):
+        length, kind = struct.unpack(">I4s", png[pos:pos + 8])
+        if kind == b"IDAT":
+            chunks.append(png[pos + 8:pos + 8 + length])
+        pos += length + 12
+    return width, height, b"".join(chunks)
+
+
+class ImagePdfWriter:
+    """
+    Minimal PDF writer, one full page image per page. PNG data is a zlib stream with
+    PNG row filters, which PDF reads as is (FlateDecode, predictor 15): pages are
+    written without decoding or compressing the images again.
+    Args:
+        path (str): PDF file to write
+        dpi (int): resolution of the page images
+    """
+    def __init__(self, path: str, dpi: int = DPI):
+        self.dpi = dpi
+        self._file = open(path, "wb")
+        self._offsets: Dict[int, int] = {}
+        self._pages: List[int] = []
+        self._next_id = 3  # 1: catalog, 2: page tree
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _object(self, obj_id: int, body: bytes, stream: Optional[bytes] = None):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % obj_id + body)
+        if stream is not None:
+            self._file.write(b"\nstream\n" + stream + b"\nendstream")
+        self._file.write(b"\nendobj\n")
+
+    def add_png_page(self, png: bytes):
+        width, height, data = _png_data(png)
+        image_id, content_id, page_id = self._next_id, self._next_id + 1, self._next_id + 2
+        self._next_id += 3
+        page_w, page_h = width * 72 / self.dpi, height * 72 / self.dpi
+
+        self._object(image_id, (
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB "
+            b"/BitsPerComponent 8 /Filter /FlateDecode "
+            b"/DecodeParms << /Predictor 15 /Colors 3 /BitsPerComponent 8 /Columns %d >> /Length %d >>"
+        ) % (width, height, width, len(data)), data)
+        content = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (page_w, page_h)
+        self._object(content_id, b"<< /Length %d >>" % len(content), content)
+        self._object(page_id, (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] "
+            b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+        ) % (page_w, page_h, image_id, content_id))
+        self._pages.append(page_id)
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self._pages)
+        self._object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._pages)))
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self._file.tell()
+        self._file.write(b"xref\n0 %d\n0000000000 65535 f \n" % self._next_id)
+        for obj_id in range(1, self._next_id):
+            self._file.write(b"%010d 00000 n \n" % self._offsets[obj_id])
+        self._file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self._next_id, xref))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def expand_paths(patterns: Sequence[str]) -> List[str]:
+    """
+    Measurement files of a list of paths and glob patterns (** allowed), sorted, without duplicates
+    """
+    paths = []
+    for pattern in patterns:
+        paths += glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]
+    return sorted({os.path.normpath(p) for p in paths if os.path.isfile(p)})
+
+
+def render_reports(paths: Sequence[str], options: ReportOptions = ReportOptions(),
+                   max_workers: Optional[int] = None, executor: Optional[Executor] = None) -> Iterator[ReportPage]:
+    """
+    Render reports in worker processes. Where no process pool can be started (outside the
+    main thread), the pages are rendered one by one: matplotlib does not draw from several threads.
+    Args:
+        paths (list[str]): measurement files
+        options (ReportOptions): report settings
+        max_workers (int, optional): number of processes. Defaults to the number of cores
+        executor (Executor, optional): process pool to use, left open, e.g. created by the main thread
+    Yields:
+        ReportPage: pages in input order, as soon as they are rendered
+    """
+    paths = list(paths)
+    owned = executor is None
+    if owned:
+        executor = make_executor(len(paths), max_workers, use_processes=True)
+        if executor is not None and not isinstance(executor, ProcessPoolExecutor):
+            executor.shutdown()
+            executor = None
+    if executor is None:
+        yield from (render_report_page(path, options) for path in paths)
+        return
+    try:
+        workers = getattr(executor, "_max_workers", None) or os.cpu_count() or 1
+        chunksize = max(1, len(paths) // (workers * 4))
+        yield from executor.map(render_report_page, paths, [options] * len(paths), chunksize=chunksize)
+    finally:
+        if owned:
+            executor.shutdown(cancel_futures=True)
+
+
+def write_pdf_report(paths: Sequence[str], output: str, options: ReportOptions = ReportOptions(),
+                     png_dir: Optional[str] = None, max_workers: Optional[int] = None,
+                     executor: Optional[Executor] = None) -> List[ReportPage]:
+    """
+    Multi-page PDF report, one page per measurement file
+    Args:
+        paths (list[str]): measurement files
+        output (str): PDF file to write
+        options (ReportOptions): report settings
+        png_dir (str, optional): also write every page as <measurement>.png in this folder
+        max_workers (int, optional): number of processes
+        executor (Executor, optional): process pool to use, see render_reports
+    Returns:
+        list[ReportPage]: rendered pages, with the errors of the files left out
+    """
+    if png_dir:
+        os.makedirs(png_dir, exist_ok=True)
+    pages = []
+    with ImagePdfWriter(output, options.dpi) as pdf:
+        for page in render_reports(paths, options, max_workers, executor):
+            pages.append(page)
+            if page.png is None:
+                print(f"Report error {page.path} : {page.error}")
+                continue
+            if png_dir:
+                name = os.path.splitext(os.path.basename(page.path))[0]
+                with open(os.path.join(png_dir, f"{name}.png"), "wb") as f:
+                    f.write(page.png)
+            pdf.add_png_page(page.png)
+    return pages
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Rapports sensito PDF des fichiers de mesure")
+    parser.add_argument("files", nargs="+", help="fichiers de mesure ou motifs glob (ex. 'measures/**/*.json')")
+    parser.add_argument("-o", "--output", default="report.pdf", help="fichier PDF à écrire")
+    parser.add_argument("--ref", help="fichier de référence (delta-d et écarts de gamma)")
+    parser.add_argument("--png-dir", help="écrire aussi chaque page en PNG dans ce dossier")
+    parser.add_argument("--step", type=float, default=SummaryParams().step_value, help="step value du gamma")
+    parser.add_argument("--dpi", type=int, default=DPI)
+    parser.add_argument("-j", "--workers", type=int, help="nombre de processus (défaut : nombre de coeurs)")
+    args = parser.parse_args(argv)
+
+    paths = expand_paths(args.files)
+    options = ReportOptions(reference=args.ref, params=SummaryParams(step_value=args.step), dpi=args.dpi)
+    start = time.perf_counter()
+    pages = write_pdf_report(paths, args.output, options, args.png_dir, args.workers)
+    elapsed = time.perf_counter() - start
+    done = sum(page.png is not None for page in pages)
+    rate = done / elapsed * 60 if elapsed > 0 else 0.0
+    print(f"{done}/{len(paths)} rapports -> {args.output} en {elapsed:.1f} s ({rate:.0f} rapports/min)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# lib/spc.py
+
+import math
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from lib.gamma import GAMMA_CACHE, GammaAnalyzer
+from lib.history_analyzer import HistoryAnalyzer
+from lib.summaries import SummaryParams, summarize_curve
+from model.measurement_set import MeasurementSet
+
+BASE_METRICS = ("gamma", "d_min", "d_max")
+
+
+def step_metric(step: int) -> str:
+    """ Metric name of a density step, 1-based like the UI """
+    return f"step {step}"
+
+
+class SpcSettings(NamedTuple):
+    """
+    Control chart parameters, limits are expressed in rolling sigmas
+    """
+    window: int = 20          # measurements used for the rolling mean/sigma
+    min_points: int = 10      # no alarm before this many previous measurements
+    limit: float = 3.0        # Shewhart limits, in sigmas
+    ewma_lambda: float = 0.2  # EWMA smoothing
+    cusum_k: float = 0.5      # CUSUM allowance, in sigmas
+    cusum_h: float = 4.0      # CUSUM decision interval, in sigmas
+
+
+@dataclass
+class SpcPoint:
+    """
+    One measurement on a control chart. Values are deviations from the reference,
+    limits are None until enough measurements are known.
+    """
+    date: Optional[datetime]
+    value: float
+    mean: Optional[float] = None
+    sigma: Optional[float] = None
+    ucl: Optional[float] = None
+    lcl: Optional[float] = None
+    ewma: float = 0.0
+    ewma_ucl: Optional[float] = None
+    ewma_lcl: Optional[float] = None
+    cusum_pos: float = 0.0
+    cusum_neg: float = 0.0
+    alarms: List[str] = field(default_factory=list)  # "limit", "ewma", "cusum+", "cusum-"
+
+
+class SpcAlarm(NamedTuple):
+    metric: str
+    channel: str
+    rule: str
+    point: SpcPoint
+    path: Optional[str] = None
+
+    def __str__(self):
+        date = self.point.date.strftime("%Y-%m-%d %H:%M") if self.point.date else "-"
+        name = f" {self.path}" if self.path else ""
+        return f"{date} {self.metric} {self.channel} : {self.rule} ({self.point.value:+.3f}){name}"
+
+
+class ControlChart:
+    """
+    Streaming control chart of deviations from a target.
+    Shewhart limits are centered on the rolling mean, EWMA and CUSUM on the target (0).
+    The rolling mean/sigma are kept as running sums over the last window values, so adding
+    a measurement costs O(1). A new value is judged against the limits of the previous ones.
+    Args:
+        settings (SpcSettings): chart parameters
+    """
+    def __init__(self, settings: SpcSettings = SpcSettings()):
+        self.settings = settings
+        self.points: List[SpcPoint] = []
+        self._window: deque = deque()
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._ewma = 0.0
+        self._cusum_pos = 0.0
+        self._cusum_neg = 0.0
+
+    def _rolling(self) -> Tuple[Optional[float], Optional[float]]:
+        n = len(self._window)
+        if n < max(2, min(self.settings.min_points, self.settings.window)):
+            return None, None
+        mean = self._sum / n
+        variance = max(0.0, (self._sum_sq - self._sum * mean) / (n - 1))
+        return mean, math.sqrt(variance)
+
+    def add(self, value: float, date: Optional[datetime] = None) -> SpcPoint:
+        """
+        Add a deviation to the chart
+        Returns:
+            SpcPoint: the new point, with the alarms it raised
+        """
+        s = self.settings
+        point = SpcPoint(date=date, value=value)
+        point.mean, point.sigma = self._rolling()
+
+        self._ewma = s.ewma_lambda * value + (1 - s.ewma_lambda) * self._ewma
+        point.ewma = self._ewma
+
+        if point.sigma:
+            sigma = point.sigma
+            # Shewhart limits follow the process, EWMA and CUSUM its drift from the reference
+            point.ucl, point.lcl = point.mean + s.limit * sigma, point.mean - s.limit * sigma
+            ewma_limit = s.limit * sigma * math.sqrt(s.ewma_lambda / (2 - s.ewma_lambda))
+            point.ewma_ucl, point.ewma_lcl = ewma_limit, -ewma_limit
+
+            self._cusum_pos = max(0.0, self._cusum_pos + value - s.cusum_k * sigma)
+            self._cusum_neg = max(0.0, self._cusum_neg - value - s.cusum_k * sigma)
+            point.cusum_pos, point.cusum_neg = self._cusum_pos, self._cusum_neg
+
+            if not point.lcl <= value <= point.ucl:
+                point.alarms.append("limit")
+            if not point.ewma_lcl <= point.ewma <= point.ewma_ucl:
+                point.alarms.append("ewma")
+            # the sums restart once a shift is signalled
+            if self._cusum_pos > s.cusum_h * sigma:
+                point.alarms.append("cusum+")
+                self._cusum_pos = 0.0
+            if self._cusum_neg > s.cusum_h * sigma:
+                point.alarms.append("cusum-")
+                self._cusum_neg = 0.0
+
+        self._window.append(value)
+        self._sum += value
+        self._sum_sq += value * value
+        if len(self._window) > s.window:
+            old = self._window.popleft()
+            self._sum -= old
+            self._sum_sq -= old * old
+
+        self.points.append(point)
+        return point
+
+
+class SpcMonitor:
+    """
+    Control charts of gamma, Dmin, Dmax and chosen density steps, per channel,
+    relative to a reference measurement.
+    Args:
+        reference (MeasurementSet): reference the deviations are computed from
+        steps (iterable[int]): density steps (1-based) to chart besides gamma, Dmin and Dmax
+        settings (SpcSettings): chart parameters
+        params (SummaryParams): gamma analysis parameters
+    """
+    def __init__(self, reference: MeasurementSet, steps: Iterable[int] = (),
+                 settings: SpcSettings = SpcSettings(), params: SummaryParams = SummaryParams()):
+        self.reference = reference
+        self.steps = list(steps)
+        self.settings = settings
+        self.params = params
+        self.charts: Dict[Tuple[str, str], ControlChart] = {}
+        self.alarms: List[SpcAlarm] = []
+        self._analyzer = GammaAnalyzer(cache=GAMMA_CACHE)
+        self.targets: Dict[Tuple[str, str], float] = {}
+        for channel, curve in reference.curves.items():
+            self.targets.update(self._metrics(channel, curve.values.tolist()))
+
+    @property
+    def metrics(self) -> List[str]:
+        return list(BASE_METRICS) + [step_metric(step) for step in self.steps]
+
+    def _metrics(self, channel: str, values: List[float]) -> Dict[Tuple[str, str], float]:
+        result = {(step_metric(step), channel): values[step - 1] for step in self.steps if 0 < step <= len(values)}
+        try:
+            reading = summarize_curve(values, self.params, self._analyzer)
+        except (ValueError, ArithmeticError, IndexError) as e:
+            print(f"SPC gamma error {channel} : {e}")
+            reading = None
+        if reading is not None:
+            result[("gamma", channel)] = reading.gamma
+        result[("d_min", channel)] = min(values)
+        result[("d_max", channel)] = max(values)
+        return result
+
+    def _add_value(self, metric: str, channel: str, value: Optional[float],
+                   date: Optional[datetime], path: Optional[str]) -> List[SpcAlarm]:
+        key = (metric, channel)
+        if value is None or key not in self.targets:
+            return []
+        chart = self.charts.get(key)
+        if chart is None:
+            chart = self.charts[key] = ControlChart(self.settings)
+        point = chart.add(value - self.targets[key], date)
+        return [SpcAlarm(metric, channel, rule, point, path) for rule in point.alarms]
+
+    def add(self, measurement: MeasurementSet) -> List[SpcAlarm]:
+        """
+        Add a new measurement to the charts of its channels
+        Returns:
+            list[SpcAlarm]: alarms raised by the measurement
+        """
+        alarms = []
+        path = str(measurement.path) if measurement.path else None
+        for channel, curve in measurement.curves.items():
+            for (metric, _), value in self._metrics(channel, curve.values.tolist()).items():
+                alarms += self._add_value(metric, channel, value, measurement.date, path)
+        self.alarms += alarms
+        return alarms
+
+    @classmethod
+    def from_analyzer(cls, analyzer: HistoryAnalyzer, steps: Iterable[int] = (),
+                      settings: SpcSettings = SpcSettings()) -> "SpcMonitor":
+        """
+        Monitor relative to the analyzer reference, fed with its measurements in date order.
+        The history is read from the analyzer evolutions, analyzed in batch.
+        """
+        monitor = cls(analyzer.reference, steps, settings, analyzer.params)
+        series = {
+            "gamma": analyzer.get_gamma_evolution(),
+            "d_min": analyzer.get_dmin_evolution(),
+            "d_max": analyzer.get_dmax_evolution(),
+        }
+        for step in monitor.steps:
+            series[step_metric(step)] = analyzer.get_step_evolution(step)
+
+        for i, m in enumerate(analyzer.measurements):
+            path = str(m.path) if m.path else None
+            for metric, evolution in series.items():
+                for channel, values in evolution.items():
+                    monitor.alarms += monitor._add_value(metric, channel, values[i], m.date, path)
+        return monitor
@@ -0,0 +1,65 @@
+# lib/summaries.py
+
+from typing import Dict, List, NamedTuple, Optional
+
+from lib.gamma import GammaAnalyzer, GammaReading, HIGH_PCT, LOW_PCT, MIN_DIFF, NUM_STEPS, STEP_VALUE
+
+
+class SummaryParams(NamedTuple):
+    """
+    Gamma analysis parameters a summary was computed with
+    """
+    step_value: float = STEP_VALUE
+    low_pct: float = LOW_PCT
+    high_pct: float = HIGH_PCT
+    min_diff: float = MIN_DIFF
+    num_steps: int = NUM_STEPS
+
+    @property
+    def key(self) -> str:
+        return ";".join(repr(v) for v in self)
+
+
+# summaries computed when a file is indexed, one per step value of the UI
+SUMMARY_PARAMS: List[SummaryParams] = [SummaryParams(step_value=0.15), SummaryParams(step_value=0.20)]
+
+
+def summarize_curve(values: List[float], params: SummaryParams = SummaryParams(),
+                    analyzer: Optional[GammaAnalyzer] = None) -> GammaReading:
+    """
+    Gamma, Dmin, Dmax and ranges of a density curve
+    Args:
+        values (list[float]): density values
+        params (SummaryParams): analysis parameters
+        analyzer (GammaAnalyzer, optional): analyzer to use
+    Returns:
+        GammaReading
+    """
+    analyzer = analyzer or GammaAnalyzer()
+    return analyzer.get_gamma_from_values(
+        values, step_value=params.step_value, low_pct=params.low_pct,
+        high_pct=params.high_pct, min_diff=params.min_diff, num_steps=params.num_steps
+    )
+
+
+def summarize_curves(curves: Dict[str, List[float]],
+                     params_list: List[SummaryParams] = SUMMARY_PARAMS) -> Dict[str, Dict[str, GammaReading]]:
+    """
+    Summaries of several curves for several parameter sets.
+    Curves the gamma analysis fails on are left out.
+    Args:
+        curves (dict[str, list[float]]): density values per channel
+        params_list (list[SummaryParams]): parameter sets
+    Returns:
+        dict[str, dict[str, GammaReading]]: readings per params key, then per channel
+    """
+    analyzer = GammaAnalyzer()
+    summaries: Dict[str, Dict[str, GammaReading]] = {}
+    for params in params_list:
+        readings = summaries.setdefault(params.key, {})
+        for channel, values in curves.items():
+            try:
+                readings[channel] = summarize_curve(values, params, analyzer)
+            except (ValueError, ArithmeticError, IndexError) as e:
+                print(f"Summary error {channel} : {e}")
+    return summaries
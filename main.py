@@ -1,5 +1,6 @@
 import sys
 import os
+import multiprocessing
 
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import QApplication
@@ -52,6 +53,9 @@ def create_single_instance_server(main_window):
 
 
 def main():
+    # worker processes of the bulk loaders in the frozen executable
+    multiprocessing.freeze_support()
+
     if is_another_instance_running():
         print("App is already running.")
         sys.exit(0)
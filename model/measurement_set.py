@@ -1,17 +1,60 @@
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional, Sequence, Union
 import json
+import os
+import threading
+
+import numpy as np
+
+from utils.cache import CacheInfo
+from utils.parallel import parallel_map
 
 
-@dataclass
 class ChannelCurve:
-    channel: str  # "R", "G", "B", etc.
-    values: List[float]  # 21 points de densité
+    """
+    Density curve of one channel, stored as a NumPy array: an owned float64 array
+    (lossless for json values) or a view into a shared cube (see pack_measurements).
+    Args:
+        channel (str): "R", "G", "B", etc.
+        values: 21 points de densité
+    """
+    __slots__ = ("channel", "_values")
 
+    def __init__(self, channel: str, values: Union[Sequence[float], np.ndarray]):
+        self.channel = channel
+        self.values = values
 
-@dataclass
+    @property
+    def values(self) -> np.ndarray:
+        return self._values
+
+    @values.setter
+    def values(self, values: Union[Sequence[float], np.ndarray]):
+        if isinstance(values, np.ndarray):
+            # keep views (archive, shared cube) as they are
+            self._values = values
+            return
+        try:
+            self._values = np.array(values, dtype=np.float64)
+        except TypeError as e:
+            raise ValueError(f"invalid density values for {self.channel}: {e}") from e
+
+    def __len__(self):
+        return len(self._values)
+
+    def __eq__(self, other):
+        if not isinstance(other, ChannelCurve):
+            return NotImplemented
+        return self.channel == other.channel and np.array_equal(self._values, other._values)
+
+    def __repr__(self):
+        return f"ChannelCurve(channel={self.channel!r}, values={self._values.tolist()!r})"
+
+
+@dataclass(slots=True)
 class MeasurementSet:
     path: Path
     date: datetime  # date
@@ -21,35 +64,228 @@ class MeasurementSet:
     json_date: Optional[str] = None  # date
 
 
+@dataclass
+class LoadResult:
+    """
+    Outcome of loading one measurement file
+    """
+    path: Path
+    measurement: Optional[MeasurementSet] = None
+    error: Optional[str] = None      # error message when the file could not be loaded
+
+    @property
+    def ok(self) -> bool:
+        return self.measurement is not None
+
+
+def read_measurement_file(path: Path) -> MeasurementSet:
+    """
+    Load a measurement file.
+    Raises:
+        OSError, ValueError: if the file can not be read or holds no 21 values curve
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    name = data.get("name")
+    color = data.get("color")
+    json_date = data.get("date")
+
+    values_dict = data.get("values", {})
+    curves = {}
+    for channel, values in values_dict.items():
+        if isinstance(values, list) and len(values) == 21:
+            curves[channel.upper()] = ChannelCurve(channel=channel.upper(), values=values)
+
+    if not curves:
+        raise ValueError(f"no curve found in: {values_dict.items()}")
+
+    stat = path.stat()
+    return MeasurementSet(
+        path=path,
+        name=name,
+        color=color,
+        json_date=json_date,
+        date=datetime.fromtimestamp(stat.st_mtime),
+        curves=curves
+    )
+
+
 def load_measurement_file(path: Path) -> Optional[MeasurementSet]:
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        name = data.get("name")
-        color = data.get("color")
-        json_date = data.get("date")
-
-        values_dict = data.get("values", {})
-        curves = {}
-        for channel, values in values_dict.items():
-            if isinstance(values, list) and len(values) == 21:
-                curves[channel.upper()] = ChannelCurve(channel=channel.upper(), values=values)
-
-        if not curves:
-            print(f"no curve found in: {values_dict.items()}")
-            return None
-
-        stat = path.stat()
-        return MeasurementSet(
-            path=path,
-            name=name,
-            color=color,
-            json_date=json_date,
-            date=datetime.fromtimestamp(stat.st_mtime),
-            curves=curves
-        )
-    except (json.JSONDecodeError, OSError, ValueError) as e:
+        return read_measurement_file(path)
+    except (json.JSONDecodeError, OSError, ValueError, AttributeError) as e:
         print(f"Erreur lors du chargement de {path} : {e}")
         return None
 
+
+def _load_result(path: Path) -> LoadResult:
+    try:
+        return LoadResult(path=path, measurement=read_measurement_file(path))
+    except (json.JSONDecodeError, OSError, ValueError, AttributeError) as e:
+        return LoadResult(path=path, error=str(e) or type(e).__name__)
+
+
+def load_measurement_files(
+    paths: Iterable[Union[str, Path]],
+    max_workers: Optional[int] = None,
+    use_processes: Optional[bool] = None,
+) -> List[LoadResult]:
+    """
+    Load many measurement files in parallel.
+    Args:
+        paths: files to load
+        max_workers (int, optional): pool size. Defaults to the number of cores
+        use_processes (bool, optional): force a process or thread pool. Defaults to
+            processes for large batches, where json parsing is CPU bound
+    Returns:
+        list[LoadResult]: one result per path, in input order
+    """
+    return parallel_map(_load_result, [Path(p) for p in paths], max_workers=max_workers, use_processes=use_processes)
+
+
+def measurement_cube(
+    measurements: List[MeasurementSet],
+    channels: Optional[List[str]] = None,
+    dtype=np.float64,
+) -> tuple[np.ndarray, List[str]]:
+    """
+    Copy the curves of measurements into one (N, channels, 21) cube, NaN for missing channels.
+    Args:
+        measurements (list[MeasurementSet]): measurements to copy
+        channels (list[str], optional): channel order. Defaults to the channels found, in first seen order
+        dtype: cube dtype, float32 halves the cube size but rounds the values
+    Returns:
+        tuple: (cube, channels)
+    """
+    if channels is None:
+        channels = list(dict.fromkeys(ch for m in measurements for ch in m.curves))
+    index = {ch: i for i, ch in enumerate(channels)}
+    cube = np.full((len(measurements), len(channels), 21), np.nan, dtype=dtype)
+    for row, m in enumerate(measurements):
+        for ch, curve in m.curves.items():
+            if ch in index:
+                cube[row, index[ch]] = curve.values
+    return cube, channels
+
+
+def pack_measurements(
+    measurements: List[MeasurementSet],
+    channels: Optional[List[str]] = None,
+    dtype=np.float64,
+) -> tuple[np.ndarray, List[str]]:
+    """
+    Build the measurement_cube of measurements and rebind every curve to a view of its row:
+    all values then share a single allocation.
+    Returns:
+        tuple: (cube, channels)
+    """
+    cube, channels = measurement_cube(measurements, channels, dtype)
+    index = {ch: i for i, ch in enumerate(channels)}
+    for row, m in enumerate(measurements):
+        for ch, curve in m.curves.items():
+            if ch in index:
+                curve.values = cube[row, index[ch]]
+    return cube, channels
+
+
+class MeasurementCache:
+    """
+    Bounded LRU cache of loaded measurement files, keyed by path.
+    Entries are validated against the file mtime/size so edited files are reloaded.
+    Args:
+        maxsize (int): maximum number of cached files
+    """
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[str, tuple[int, int, Optional[MeasurementSet]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: Union[str, Path]) -> Optional[MeasurementSet]:
+        """
+        Cached equivalent of load_measurement_file
+        """
+        key = os.path.normpath(str(path))
+        try:
+            stat = os.stat(key)
+        except OSError:
+            self.invalidate(key)
+            return load_measurement_file(Path(key))
+
+        with self._lock:
+            cached = self._items.get(key)
+            if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                self._items.move_to_end(key)
+                self.hits += 1
+                return cached[2]
+            self.misses += 1
+
+        measurement = load_measurement_file(Path(key))
+        self._store(key, (stat.st_mtime_ns, stat.st_size), measurement)
+        return measurement
+
+    def _store(self, key: str, stat: tuple[int, int], measurement: Optional[MeasurementSet]):
+        with self._lock:
+            self._items[key] = (*stat, measurement)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def get_many(self, paths: Iterable[Union[str, Path]]) -> List[Optional[MeasurementSet]]:
+        """
+        Cached load of many files, misses are loaded in parallel
+        """
+        keys = [os.path.normpath(str(p)) for p in paths]
+        results: Dict[str, Optional[MeasurementSet]] = {}
+        stats = {}
+        with self._lock:
+            for key in keys:
+                try:
+                    stat = os.stat(key)
+                except OSError:
+                    continue
+                stats[key] = (stat.st_mtime_ns, stat.st_size)
+                cached = self._items.get(key)
+                if cached and cached[:2] == stats[key]:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    results[key] = cached[2]
+
+        missing = [key for key in dict.fromkeys(keys) if key not in results]
+        with self._lock:
+            self.misses += len(missing)
+        for result in load_measurement_files(missing):
+            key = str(result.path)
+            if result.error:
+                print(f"Erreur lors du chargement de {key} : {result.error}")
+            results[key] = result.measurement
+            if key in stats:
+                self._store(key, stats[key], result.measurement)
+        return [results.get(key) for key in keys]
+
+    def invalidate(self, path: Union[str, Path, None] = None):
+        """
+        Drop a path from the cache, or everything when no path is given
+        """
+        with self._lock:
+            if path is None:
+                self._items.clear()
+            else:
+                self._items.pop(os.path.normpath(str(path)), None)
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._items))
+
+
+# shared between all widgets
+MEASUREMENT_CACHE = MeasurementCache()
+
+
+def get_measurement(path: Union[str, Path]) -> Optional[MeasurementSet]:
+    """
+    Load a measurement file through the shared cache
+    """
+    return MEASUREMENT_CACHE.get(path)
@@ -0,0 +1,53 @@
+# tests/conftest.py
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# densities of a sample measurement (measures/5213_v1_20250601.json)
+SAMPLE_CURVES = {
+    "r": [0.17, 0.2, 0.17, 0.17, 0.18, 0.24, 0.28, 0.38, 0.47, 0.58, 0.69, 0.77, 0.88, 0.96, 1.07, 1.19, 1.25, 1.32, 1.38, 1.43, 1.48],
+    "g": [0.54, 0.57, 0.57, 0.56, 0.57, 0.59, 0.67, 0.76, 0.9, 0.99, 1.1, 1.21, 1.33, 1.4, 1.53, 1.66, 1.75, 1.84, 1.95, 2.01, 2.04],
+    "b": [0.96, 0.99, 1.0, 0.98, 1.02, 1.04, 1.11, 1.23, 1.32, 1.41, 1.51, 1.63, 1.73, 1.84, 1.96, 2.07, 2.15, 2.23, 2.29, 2.36, 2.38],
+}
+
+
+@pytest.fixture
+def measures_dir(tmp_path):
+    """ empty measures folder with its ref sub folder """
+    (tmp_path / "ref").mkdir()
+    return tmp_path
+
+
+@pytest.fixture
+def write_measurement():
+    """
+    Write a measurement file, returns its path.
+    values default to SAMPLE_CURVES, shift is added to every density
+    """
+    def write(path, values=None, name=None, date="2025-06-01", shift=0.0, mtime=None):
+        values = values if values is not None else SAMPLE_CURVES
+        document = {
+            "name": name or os.path.splitext(os.path.basename(str(path)))[0],
+            "color": "vrgb",
+            "date": date,
+            "values": {ch: [round(v + shift, 2) for v in curve] for ch, curve in values.items()},
+        }
+        os.makedirs(os.path.dirname(str(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(document, f)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return str(path)
+    return write
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """ Qt application for the models and signals """
+    from PySide6.QtCore import QCoreApplication
+    return QCoreApplication.instance() or QCoreApplication([])
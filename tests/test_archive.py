@@ -0,0 +1,63 @@
+# tests/test_archive.py
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from lib.archive import CUBE_FILE, MeasurementArchive, archive_to_json, json_to_archive
+
+
+def test_json_round_trip(tmp_path, measures_dir, write_measurement):
+    paths = [
+        write_measurement(measures_dir / "a.json", mtime=1_700_000_000),
+        write_measurement(measures_dir / "ref" / "r.json", values={"v": list(np.round(np.linspace(0.05, 2.5, 21), 2))}),
+    ]
+    archive = json_to_archive(paths, str(tmp_path / "archive"), root=str(measures_dir))
+    assert len(archive) == 2
+    assert isinstance(archive.cube, np.memmap) and archive.cube.dtype == np.float32
+
+    written = archive_to_json(str(tmp_path / "archive"), str(tmp_path / "out"))
+    assert [os.path.relpath(p, tmp_path / "out") for p in written] == ["a.json", os.path.join("ref", "r.json")]
+    for original, restored in zip(paths, written):
+        with open(original, encoding="utf-8") as f, open(restored, encoding="utf-8") as g:
+            assert json.load(f) == json.load(g)
+        assert os.stat(original).st_mtime_ns == os.stat(restored).st_mtime_ns
+
+
+def test_measurement_sets_are_views(tmp_path, measures_dir, write_measurement):
+    path = write_measurement(measures_dir / "a.json")
+    archive = json_to_archive([path], str(tmp_path / "archive"), root=str(measures_dir))
+
+    m = archive.measurement_set(0, root=str(measures_dir))
+    assert list(m.curves) == ["R", "G", "B"]
+    assert np.shares_memory(m.curves["R"].values, archive.cube)
+    assert np.isnan(archive.cube[0, archive.channels.index("V")]).all()
+
+
+def test_lossy_values_refused(tmp_path):
+    archive = MeasurementArchive.create(str(tmp_path / "archive"))
+    doc = {"name": "x", "values": {"r": [0.123456789] * 21}}
+    with pytest.raises(ValueError):
+        archive.append([("x.json", doc, 0)])
+    with pytest.raises(ValueError):
+        archive.append([("x.json", {"values": {"r": [0.1] * 20}}, 0)])
+    with pytest.raises(ValueError):
+        archive.append([("x.json", {"values": {"r": [0.1] * 21}, "extra": 1}, 0)])
+    assert len(MeasurementArchive(str(tmp_path / "archive"))) == 0
+
+
+def test_interrupted_append_is_ignored(tmp_path, measures_dir, write_measurement):
+    directory = str(tmp_path / "archive")
+    json_to_archive([write_measurement(measures_dir / "a.json")], directory, root=str(measures_dir))
+    # rows written after the header count, as left by a crash before the header commit
+    with open(os.path.join(directory, CUBE_FILE), "ab") as f:
+        f.write(b"\0" * 7 * 21 * 4)
+
+    archive = MeasurementArchive(directory)
+    assert len(archive) == 1
+    archive.append([("b.json", {"name": "b", "values": {"g": [0.5] * 21}}, 0)])
+    archive = MeasurementArchive(directory)
+    assert archive.paths == ["a.json", "b.json"]
+    assert archive.document(1) == {"name": "b", "values": {"g": [0.5] * 21}}
@@ -0,0 +1,83 @@
+# tests/test_catalog.py
+
+import os
+
+from lib.catalog import MeasurementCatalog
+
+
+def make_catalog(root):
+    return MeasurementCatalog(str(root), db_path=os.path.join(str(root), ".catalog.sqlite3"))
+
+
+def test_refresh_reports_added_updated_removed(measures_dir, write_measurement):
+    write_measurement(measures_dir / "a.json")
+    write_measurement(measures_dir / "ref" / "r.json")
+    catalog = make_catalog(measures_dir)
+
+    changes = catalog.refresh()
+    assert sorted(changes.added) == ["a.json", os.path.join("ref", "r.json")]
+    assert not changes.updated and not changes.removed
+    # nothing changed on disk: nothing parsed again
+    assert not catalog.refresh()
+
+    write_measurement(measures_dir / "a.json", shift=0.1, mtime=os.stat(measures_dir / "a.json").st_mtime + 10)
+    write_measurement(measures_dir / "b.json")
+    os.remove(measures_dir / "ref" / "r.json")
+    changes = catalog.refresh()
+    assert changes.added == ["b.json"]
+    assert changes.updated == ["a.json"]
+    assert changes.removed == [os.path.join("ref", "r.json")]
+    assert [e.rel_path for e in catalog.entries()] == ["a.json", "b.json"]
+
+
+def test_folder_refresh_leaves_other_folders(measures_dir, write_measurement):
+    write_measurement(measures_dir / "a.json")
+    catalog = make_catalog(measures_dir)
+    catalog.refresh()
+
+    write_measurement(measures_dir / "b.json")
+    write_measurement(measures_dir / "ref" / "r.json")
+    changes = catalog.refresh("ref", recursive=False)
+    assert changes.added == [os.path.join("ref", "r.json")]
+    assert catalog.get("b.json") is None
+
+
+def test_entries_persist_across_instances(measures_dir, write_measurement):
+    write_measurement(measures_dir / "a.json", name="film")
+    make_catalog(measures_dir).refresh()
+
+    catalog = make_catalog(measures_dir)
+    assert not catalog.refresh()
+    entry = catalog.get("a.json")
+    assert entry.name == "film"
+    assert entry.curve_channels == ["R", "G", "B"]
+
+
+def test_broken_file_kept_until_modified(measures_dir, write_measurement):
+    path = measures_dir / "broken.json"
+    path.write_text("{not json")
+    catalog = make_catalog(measures_dir)
+
+    assert catalog.refresh().added == ["broken.json"]
+    assert catalog.get("broken.json").error
+    assert not catalog.refresh()
+
+    write_measurement(path, mtime=os.stat(path).st_mtime + 10)
+    assert catalog.refresh().updated == ["broken.json"]
+    assert not catalog.get("broken.json").error
+
+
+def test_summaries_dropped_when_file_changes(measures_dir, write_measurement):
+    path = write_measurement(measures_dir / "a.json")
+    catalog = make_catalog(measures_dir)
+    catalog.refresh()
+
+    summaries = catalog.get_summaries([path])
+    assert set(summaries[path]) == {"R", "G", "B"}
+    assert summaries[path]["R"].d_min == 0.17
+
+    # modified but not refreshed yet: the stored summaries are stale
+    write_measurement(path, shift=0.1, mtime=os.stat(path).st_mtime + 10)
+    assert catalog.get_summaries([path]) == {}
+    catalog.refresh()
+    assert catalog.get_summaries([path])[path]["R"].d_min == 0.27
@@ -0,0 +1,97 @@
+# tests/test_downsampling.py
+
+import math
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from lib.downsampling import bucket_series, choose_granularity, downsample, lttb
+
+
+def reference_lttb(x, y, threshold):
+    """ textbook LTTB, one point at a time """
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    kept, a = [0], 0
+    for i in range(threshold - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        next_lo, next_hi = hi, min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x[next_lo:next_hi]) / (next_hi - next_lo)
+        avg_y = sum(y[next_lo:next_hi]) / (next_hi - next_lo)
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    return kept + [n - 1]
+
+
+@pytest.mark.parametrize("n, threshold", [(10, 3), (100, 7), (1000, 64), (1001, 1000)])
+def test_lttb_matches_reference(n, threshold):
+    rng = random.Random(n)
+    x = sorted(rng.uniform(0, 1000) for _ in range(n))
+    y = [math.sin(v / 30) + rng.gauss(0, 0.2) for v in x]
+    indices = lttb(np.array(x), np.array(y), threshold)
+    assert indices.tolist() == reference_lttb(x, y, threshold)
+
+
+def test_lttb_keeps_peaks_and_bounds():
+    x = np.arange(500, dtype=float)
+    y = np.zeros(500)
+    y[123], y[321] = 5.0, -5.0
+    indices = lttb(x, y, 20)
+    assert len(indices) == 20 and indices[0] == 0 and indices[-1] == 499
+    assert np.all(np.diff(indices) > 0)
+    assert {123, 321} <= set(indices.tolist())
+    # nothing to decimate
+    assert lttb(x[:10], y[:10], 10).tolist() == list(range(10))
+    assert lttb(x, y, 2).tolist() == list(range(500))
+
+
+def test_bucket_series():
+    start = datetime(2025, 1, 30, 8)  # thursday
+    dates = [start + timedelta(hours=12 * i) for i in range(10)]
+    values = [float(i) for i in range(10)]
+    values[3] = None
+
+    days = bucket_series(dates, values, "day")
+    assert days.dates == [datetime(2025, 1, d) for d in (30, 31)] + [datetime(2025, 2, d) for d in (1, 2, 3)]
+    assert days.counts == [2, 1, 2, 2, 2]
+    assert days.values == [0.5, 2.0, 4.5, 6.5, 8.5]
+    assert days.low == [0.0, 2.0, 4.0, 6.0, 8.0] and days.high == [1.0, 2.0, 5.0, 7.0, 9.0]
+
+    weeks = bucket_series(dates, values, "week")
+    assert weeks.dates == [datetime(2025, 1, 27), datetime(2025, 2, 3)]
+    assert weeks.counts == [7, 2]
+
+    months = bucket_series(dates, values, "month")
+    assert months.dates == [datetime(2025, 1, 1), datetime(2025, 2, 1)]
+    assert months.values == pytest.approx([1.0, 6.5])
+    with pytest.raises(ValueError):
+        bucket_series(dates, values, "year")
+
+
+def test_downsample_bounds_points():
+    start = datetime(2024, 1, 1)
+    dates = [start + timedelta(hours=6 * i) for i in range(4 * 400)]  # 400 days
+    values = [None if i % 7 == 0 else math.sin(i / 50) for i in range(len(dates))]
+
+    assert choose_granularity(dates, 2000) == "measure"
+    assert choose_granularity(dates, 400) == "day"
+    assert choose_granularity(dates, 100) == "week"
+    assert choose_granularity(dates, 20) == "month"
+    assert choose_granularity(dates, 5) == "month"
+
+    for max_points in (2000, 400, 100, 20, 5):
+        series = downsample(dates, values, max_points)
+        assert 0 < len(series) <= max_points
+        assert series.dates == sorted(series.dates)
+    measured = downsample(dates, values, 2000)
+    assert len(measured) == sum(v is not None for v in values)
+    # months decimated with LTTB keep their band
+    coarse = downsample(dates, values, 5)
+    assert coarse.low is not None and all(lo <= v <= hi for lo, v, hi in zip(coarse.low, coarse.values, coarse.high))
@@ -0,0 +1,115 @@
+# tests/test_drift.py
+
+import os
+import time
+from pathlib import Path
+
+import pytest
+from PySide6.QtCore import QObject, Signal
+
+from conftest import SAMPLE_CURVES
+from lib.drift import DriftDetector, DriftTolerances, ReferenceProfile
+from model.measurement_set import read_measurement_file
+
+
+class FakeWatcher(QObject):
+    scan_started = Signal()
+    files_added = Signal(list)
+    files_modified = Signal(list)
+
+    def __init__(self):
+        super().__init__()
+        self.scanning = False
+
+    def is_scanning(self):
+        return self.scanning
+
+
+@pytest.fixture
+def reference(measures_dir, write_measurement):
+    return write_measurement(measures_dir / "ref" / "r.json")
+
+
+@pytest.fixture
+def detector(qapp, measures_dir, reference):
+    detector = DriftDetector(root=str(measures_dir), watcher=FakeWatcher())
+    detector.set_reference(reference)
+    alerts = []
+    detector.drift_detected.connect(alerts.append)
+    detector.alerts = alerts
+    return detector
+
+
+def test_step_and_gamma_bands(reference):
+    profile = ReferenceProfile(read_measurement_file(Path(reference)))
+    r, g = SAMPLE_CURVES["r"], SAMPLE_CURVES["g"]
+    # absolute band on low densities, relative one on high densities
+    assert profile.check_step("R", 0, r[0] + 0.04).ok
+    assert profile.check_step("R", 0, r[0] - 0.06).steps_out == [1]
+    assert profile.check_step("G", 20, g[20] + 0.09).ok
+    assert profile.check_step("G", 20, g[20] + 0.12).steps_out == [21]
+    assert profile.check_step("V", 0, 0.0) is None
+
+    results = {res.channel: res for res in profile.check_curves({"R": r, "G": [v + 0.08 for v in g], "V": r})}
+    assert set(results) == {"R", "G"}
+    assert results["R"].ok and results["R"].gamma == pytest.approx(results["R"].gamma_ref)
+    assert results["G"].steps_out == list(range(1, 16))
+    assert results["G"].max_deviation == pytest.approx(0.08)
+
+    # one tolerance per step, and a gamma band
+    tolerances = DriftTolerances(step_abs=[0.01] * 20 + [0.5], step_rel=0.0, gamma_abs=0.01)
+    profile = ReferenceProfile(read_measurement_file(Path(reference)), tolerances)
+    assert profile.check_step("R", 19, r[19] + 0.02).steps_out == [20]
+    assert profile.check_step("R", 20, r[20] + 0.4).ok
+    steeper = [v + 0.01 * i for i, v in enumerate(r)]
+    result = profile.check_curves({"R": steeper})[0]
+    assert result.gamma_out and result.gamma > result.gamma_ref
+
+
+def test_serial_steps_reported_once(detector):
+    r = SAMPLE_CURVES["r"]
+    detector.check_step({"r": r[0]}, 0)
+    assert detector.check_step({"r": r[1] + 0.2}, 1)[0].result.steps_out == [2]
+    assert detector.check_step({"r": r[1] + 0.3}, 1) == []  # measured again
+    for step in range(2, 20):
+        detector.check_step({"r": r[step]}, step)
+    # the whole curve check does not report step 2 again
+    assert detector.check_step({"r": r[20]}, 20) == []
+    assert len(detector.alerts) == 1
+
+    # a new curve starts at step 0
+    detector.check_step({"r": r[0]}, 0)
+    assert len(detector.check_step({"r": r[1] + 0.2}, 1)) == 1
+    with open(detector.log_path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+
+
+def test_scan_reports_only_new_files(detector, measures_dir, write_measurement):
+    watcher = detector.watcher
+    old = write_measurement(measures_dir / "old.json", shift=0.2, mtime=time.time() - 3600)
+    watcher.scanning = True
+    watcher.scan_started.emit()
+    new = write_measurement(measures_dir / "new.json", shift=0.2)
+    ok = write_measurement(measures_dir / "ok.json")
+    checked = []
+    detector.measurement_checked.connect(lambda source, good: checked.append((os.path.basename(source), good)))
+
+    watcher.files_added.emit(["old.json", "new.json", "ok.json", os.path.join("ref", "r.json")])
+    assert checked == [("new.json", False), ("ok.json", True)]
+
+    # outside a scan every reported file is checked
+    watcher.scanning = False
+    checked.clear()
+    watcher.files_modified.emit([os.path.basename(old)])
+    assert checked == [("old.json", False)]
+    assert {a.result.channel for a in detector.alerts} == {"R", "G", "B"}
+    assert all(os.path.basename(a.source) in ("old.json", "new.json") for a in detector.alerts)
+
+
+def test_reference_reloaded_when_modified(detector, measures_dir, reference, write_measurement):
+    write_measurement(measures_dir / "m.json", shift=0.2)
+    write_measurement(reference, shift=0.2, mtime=time.time() + 10)
+    detector.watcher.files_modified.emit([os.path.join("ref", "r.json"), "m.json"])
+    assert detector.profile.values[0, 0] == pytest.approx(SAMPLE_CURVES["r"][0] + 0.2)
+    # the measurement is checked against the new reference
+    assert detector.alerts == []
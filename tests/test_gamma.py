@@ -0,0 +1,116 @@
+# tests/test_gamma.py
+
+import random
+
+import numpy as np
+import pytest
+
+from conftest import SAMPLE_CURVES
+from lib.gamma import GammaAnalyzer, GammaCache, IncrementalGamma
+
+
+def random_curves(count, steps=21, seed=1):
+    rng = random.Random(seed)
+    curves = []
+    for _ in range(count):
+        curve = [round(rng.uniform(0.05, 0.3), 2)]
+        for _ in range(steps - 1):
+            # mostly increasing, with flat and decreasing steps
+            curve.append(round(curve[-1] + rng.choice([0.0, 0.0, rng.uniform(-0.05, 0.3)]), 2))
+        curves.append(curve)
+    return curves
+
+
+@pytest.mark.parametrize("step_value", [0.15, 0.2])
+def test_batch_matches_scalar(step_value):
+    analyzer = GammaAnalyzer()
+    # the last curve only rises at its last step: its gamma range overflows
+    curves = random_curves(500) + [list(SAMPLE_CURVES["r"]), [0.5] * 21, [0.1] * 20 + [1.0]]
+    batch = analyzer.get_gamma_batch(curves, step_value=step_value)
+    assert np.isnan(batch.gamma[-1])
+
+    assert len(batch) == len(curves)
+    for i, curve in enumerate(curves):
+        try:
+            expected = analyzer.get_gamma_from_values(curve, step_value=step_value)
+        except IndexError:
+            assert np.isnan(batch.gamma[i])
+            continue
+        assert batch.reading(i) == expected
+
+
+def test_batch_parameters_and_lengths():
+    analyzer = GammaAnalyzer()
+    curves = random_curves(50, steps=11, seed=2)
+    batch = analyzer.get_gamma_batch(curves, low_pct=0.1, high_pct=0.3, num_steps=3)
+    for i, curve in enumerate(curves):
+        try:
+            expected = analyzer.get_gamma_from_values(curve, low_pct=0.1, high_pct=0.3, num_steps=3)
+        except IndexError:
+            continue
+        assert batch.reading(i) == expected
+
+    with pytest.raises(ValueError):
+        analyzer.get_gamma_batch([[0.1, 0.2, 0.3]])
+    assert len(analyzer.get_gamma_batch(np.empty((0, 21)))) == 0
+
+
+def test_cache_keyed_on_values_and_params():
+    cache = GammaCache(maxsize=2)
+    analyzer = GammaAnalyzer(cache=cache)
+    curve = list(SAMPLE_CURVES["g"])
+
+    first = analyzer.get_gamma_from_values(curve)
+    assert analyzer.get_gamma_from_values(list(curve)) is first
+    assert analyzer.get_gamma_from_values(curve, step_value=0.2) is not first
+    edited = curve[:5] + [curve[5] + 0.01] + curve[6:]
+    assert analyzer.get_gamma_from_values(edited) == GammaAnalyzer().get_gamma_from_values(edited)
+    assert cache.cache_info() == (1, 3, 2, 2)
+
+    # first was evicted by the last two readings
+    assert analyzer.get_gamma_from_values(curve) is not first
+    cache.clear()
+    assert cache.cache_info().currsize == 0
+
+
+def test_cached_errors_are_not_stored():
+    analyzer = GammaAnalyzer(cache=GammaCache())
+    with pytest.raises(ValueError):
+        analyzer.get_gamma_from_values([0.1, 0.2])
+    assert analyzer.cache.cache_info().currsize == 0
+
+
+def test_incremental_matches_full_analysis():
+    rng = random.Random(4)
+    state = IncrementalGamma()
+    analyzer = GammaAnalyzer()
+    for curve in random_curves(20, seed=5):
+        # acquisition: steps arrive one by one, some are measured again
+        values = [None] * 21
+        for step in range(21):
+            values[step] = curve[step]
+            if step and rng.random() < 0.3:
+                redo = rng.randrange(step)
+                values[redo] = round(values[redo] + 0.02, 2)
+            known = [v for v in values if v is not None]
+            if len(known) < 4:
+                assert state.update(values) is None
+                continue
+            try:
+                expected = analyzer.get_gamma_from_values(known)
+            except IndexError:
+                # same failure as the full analysis when the range overflows the curve
+                with pytest.raises(IndexError):
+                    state.update(values)
+                continue
+            assert state.update(values) == expected
+    assert state.partial_updates > state.full_updates
+
+
+def test_incremental_curve_data():
+    data = {f"meas_{ch}": list(curve) for ch, curve in SAMPLE_CURVES.items()}
+    data["meas_b"][7] = None
+    states = {ch: IncrementalGamma() for ch in SAMPLE_CURVES}
+    analyzer = GammaAnalyzer()
+    assert analyzer.get_gamma_from_curve_data(data, list(SAMPLE_CURVES), states=states) == \
+        analyzer.get_gamma_from_curve_data(data, list(SAMPLE_CURVES))
@@ -0,0 +1,112 @@
+# tests/test_history_analyzer.py
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from lib.archive import json_to_archive
+from lib.history_analyzer import HistoryAnalyzer
+from model.measurement_set import read_measurement_file
+
+
+@pytest.fixture
+def history(measures_dir, write_measurement):
+    """ reference and 6 measurements, one day apart, the third one without blue """
+    reference = read_measurement_file(Path(write_measurement(measures_dir / "ref" / "r.json")))
+    paths = []
+    for i in range(6):
+        values = None if i != 2 else {"r": [0.2 + 0.1 * k for k in range(21)], "g": [0.5 + 0.08 * k for k in range(21)]}
+        paths.append(write_measurement(measures_dir / f"m{i}.json", values=values, shift=0.01 * i,
+                                       mtime=1_700_000_000 + 86400 * i))
+    return reference, paths
+
+
+def load(paths):
+    return [read_measurement_file(Path(p)) for p in paths]
+
+
+def state(analyzer):
+    return {
+        "dates": analyzer.get_dates(),
+        "channels": analyzer.channels,
+        "average": {ch: analyzer.get_average_curve(ch) for ch in analyzer.channels},
+        "std": {ch: analyzer.get_std_curve(ch, ddof=1) for ch in analyzer.channels},
+        "min": {ch: analyzer.get_min_curve(ch) for ch in analyzer.channels},
+        "max": {ch: analyzer.get_max_curve(ch) for ch in analyzer.channels},
+        "gamma": analyzer.get_gamma_evolution(),
+        "dmin": analyzer.get_dmin_evolution(),
+        "dmax": analyzer.get_dmax_evolution(),
+    }
+
+
+def assert_same(a, b):
+    assert a.keys() == b.keys()
+    for key in a:
+        if isinstance(a[key], dict):
+            assert a[key].keys() == b[key].keys(), key
+            for ch in a[key]:
+                assert a[key][ch] == pytest.approx(b[key][ch], nan_ok=True), (key, ch)
+        else:
+            assert a[key] == b[key], key
+
+
+def test_append_matches_full_analysis(history):
+    reference, paths = history
+    measurements = load(paths)
+    full = HistoryAnalyzer(reference, measurements)
+
+    # blue is missing from the start, readings are cached before appending
+    analyzer = HistoryAnalyzer(reference, measurements[2:3])
+    analyzer.get_gamma_evolution()
+    for m in measurements[3:] + measurements[:2]:  # the last two are older, inserted at their place
+        analyzer.append(m)
+    assert_same(state(analyzer), state(full))
+    assert analyzer.get_gamma_evolution()["B"][2] is None
+
+
+def test_evolutions_are_copies(history):
+    reference, paths = history
+    analyzer = HistoryAnalyzer(reference, load(paths[:4]))
+    gammas = analyzer.get_gamma_evolution()
+    readings = analyzer.get_channel_readings("R")
+    dates, dmin = analyzer.get_dates(), analyzer.get_dmin_evolution()
+
+    gammas["R"].clear()
+    readings.append(None)
+    dates.pop()
+    dmin["G"][0] = -1.0
+    analyzer.append(load(paths[4:5])[0])
+
+    assert len(analyzer.get_gamma_evolution()["R"]) == 5
+    assert len(analyzer.get_channel_readings("R")) == 5
+    assert len(analyzer.get_dates()) == 5
+    assert analyzer.get_dmin_evolution()["G"][0] != -1.0
+    assert len(gammas["R"]) == 0 and len(readings) == 5
+
+
+def test_from_archive_uses_archive_cube(tmp_path, measures_dir, history):
+    reference, paths = history
+    archive = json_to_archive(paths, str(tmp_path / "archive"), root=str(measures_dir))
+    from_json = HistoryAnalyzer(reference, load(paths))
+
+    analyzer = HistoryAnalyzer.from_archive(reference, archive)
+    assert np.shares_memory(analyzer.cube, archive.cube)
+    assert analyzer.cube.dtype == np.float32
+    assert analyzer.channels == from_json.channels
+    assert [d.timestamp() for d in analyzer.get_dates()] == [d.timestamp() for d in from_json.get_dates()]
+    for ch in analyzer.channels:
+        # float32 storage, float64 aggregates
+        assert analyzer.get_average_curve(ch) == pytest.approx(from_json.get_average_curve(ch), abs=1e-6)
+        assert analyzer.get_max_curve(ch) == pytest.approx(from_json.get_max_curve(ch), abs=1e-6)
+
+    # rows out of date order are sorted, selecting them copies
+    subset = HistoryAnalyzer.from_archive(reference, archive, rows=[4, 1, 3])
+    assert not np.shares_memory(subset.cube, archive.cube)
+    assert [m.name for m in subset.measurements] == ["m1", "m3", "m4"]
+
+    # appending never writes into the archive
+    before = np.array(archive.cube)
+    analyzer.append(load(paths[:1])[0])
+    assert len(analyzer.get_dates()) == 7
+    assert np.array_equal(np.asarray(archive.cube), before, equal_nan=True)
@@ -0,0 +1,52 @@
+# tests/test_history_index.py
+
+import random
+from datetime import date
+
+from lib.history_index import DateIndex, NgramIndex, parse_date, period_range
+
+
+def test_ngram_search_matches_substring_scan():
+    rng = random.Random(3)
+    texts = {i: "".join(rng.choice("ab-_12 ") for _ in range(rng.randint(0, 12))) for i in range(300)}
+    index = NgramIndex(texts.get)
+    index.rebuild(texts.items())
+    for i in range(0, 300, 3):
+        index.remove(i)
+        del texts[i]
+    for i in [i for i in range(1, 300, 7) if i in texts]:
+        texts[i] = "relabelled " + texts[i]
+        index.add(i, texts[i])
+
+    for query in ("", "a", "b-", "12a", "ab_1", "label", "zz"):
+        assert index.search(query) == {i for i, t in texts.items() if query in t}, query
+
+
+def test_ngram_rebuild_threshold():
+    index = NgramIndex(lambda i: "x")
+    index.add(1, "x")
+    for _ in range(1001):
+        index.add(1, "x")
+    assert index.needs_rebuild
+
+
+def test_date_range():
+    index = DateIndex()
+    index.add(1, date(2025, 1, 31))
+    index.add(2, date(2025, 2, 1))
+    index.add(3, date(2025, 2, 28))
+    index.add(4, None)
+    index.add(1, date(2025, 3, 1))  # moved
+    assert index.range(date(2025, 2, 1), date(2025, 2, 28)) == [2, 3]
+    assert index.range(date(2025, 1, 1), date(2025, 12, 31)) == [2, 3, 1]
+    index.remove(2)
+    assert len(index) == 2
+
+
+def test_periods():
+    today = date(2024, 12, 15)
+    assert period_range("Ce mois-ci", today) == (date(2024, 12, 1), date(2024, 12, 31))
+    assert period_range("Cette année", today) == (date(2024, 1, 1), date(2024, 12, 31))
+    assert period_range("Aujourd’hui", today) == (today, today)
+    assert period_range("Toutes dates", today) is None
+    assert parse_date("2025-02-30") is None and parse_date("2025-02-28") == date(2025, 2, 28)
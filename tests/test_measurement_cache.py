@@ -0,0 +1,67 @@
+# tests/test_measurement_cache.py
+
+import os
+
+from model.measurement_set import MeasurementCache
+
+
+def test_hit_until_file_changes(measures_dir, write_measurement):
+    path = write_measurement(measures_dir / "a.json")
+    cache = MeasurementCache()
+
+    first = cache.get(path)
+    assert cache.get(path) is first
+    assert cache.cache_info()[:2] == (1, 1)
+
+    # same size, new mtime
+    write_measurement(path, shift=0.01, mtime=os.stat(path).st_mtime + 10)
+    reloaded = cache.get(path)
+    assert reloaded is not first
+    assert reloaded.curves["R"].values[0] == 0.18
+
+
+def test_size_change_with_same_mtime_reloads(measures_dir, write_measurement):
+    path = write_measurement(measures_dir / "a.json", mtime=1_700_000_000)
+    cache = MeasurementCache()
+    first = cache.get(path)
+
+    write_measurement(path, name="a much longer name", mtime=1_700_000_000)
+    assert cache.get(path).name == "a much longer name"
+    assert cache.get(path) is not first
+
+
+def test_lru_eviction(measures_dir, write_measurement):
+    paths = [write_measurement(measures_dir / f"{i}.json") for i in range(3)]
+    cache = MeasurementCache(maxsize=2)
+    cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])  # 1 is now the least recently used
+    cache.get(paths[2])
+
+    assert cache.cache_info().currsize == 2
+    misses = cache.cache_info().misses
+    cache.get(paths[0])
+    assert cache.cache_info().misses == misses
+    cache.get(paths[1])
+    assert cache.cache_info().misses == misses + 1
+
+
+def test_get_many_keeps_order_and_missing_files(measures_dir, write_measurement):
+    a = write_measurement(measures_dir / "a.json", name="a")
+    b = write_measurement(measures_dir / "b.json", name="b")
+    cache = MeasurementCache()
+    cache.get(b)
+
+    result = cache.get_many([a, str(measures_dir / "missing.json"), b])
+    assert [m.name if m else None for m in result] == ["a", None, "b"]
+    assert cache.cache_info().hits == 1
+
+
+def test_removed_file_is_dropped(measures_dir, write_measurement):
+    path = write_measurement(measures_dir / "a.json")
+    cache = MeasurementCache()
+    cache.get(path)
+    os.remove(path)
+
+    assert cache.get(path) is None
+    assert cache.cache_info().currsize == 0
@@ -0,0 +1,128 @@
+# tests/test_measures_model.py
+
+import os
+from datetime import date
+
+import pytest
+
+from constants import MEASURES_PATH
+from lib.catalog import CatalogEntry
+from ui.measures_model import MeasuresFilterProxy, MeasuresModel
+
+
+def make_entry(rel_path, name=None, json_date="2025-06-01", channels=("R", "G", "B"), error=None):
+    folder = os.path.dirname(rel_path) or "."
+    return CatalogEntry(root=MEASURES_PATH, rel_path=rel_path, folder=folder, mtime_ns=0, size=0,
+                        name=name, json_date=json_date, curve_channels=list(channels), error=error)
+
+
+def path(rel_path):
+    return os.path.join(MEASURES_PATH, rel_path)
+
+
+def tree(model):
+    """ (folder label, [file labels]) in display order """
+    result = []
+    for row in range(model.rowCount()):
+        folder = model.index(row, 0)
+        result.append((folder.data(), [model.index(i, 0, folder).data() for i in range(model.rowCount(folder))]))
+    return result
+
+
+@pytest.fixture
+def model(qapp):
+    model = MeasuresModel()
+    model.add_entries([
+        make_entry("b.json", "film b"),
+        make_entry("a.json", "film a", "2025-07-14"),
+        make_entry(os.path.join("ref", "r.json"), "ref", channels=("V",)),
+    ])
+    return model
+
+
+def test_folders_and_sorted_files(model):
+    assert tree(model) == [
+        ("measures", ["film a [R, G, B] - 2025-07-14", "film b [R, G, B] - 2025-06-01"]),
+        ("ref", ["ref [V] - 2025-06-01"]),
+    ]
+
+
+def test_update_and_remove(model):
+    model.set_checked(path("a.json"))
+    assert model.add_entries([make_entry("a.json", "renamed")]) is True  # checked file modified
+    assert model.add_entries([make_entry("c.json", "film c")]) is False
+    assert tree(model)[0][1] == ["renamed [R, G, B] - 2025-06-01", "film b [R, G, B] - 2025-06-01",
+                                 "film c [R, G, B] - 2025-06-01"]
+
+    # broken or curveless files are removed, and their folder once empty
+    assert model.add_entries([make_entry(os.path.join("ref", "r.json"), error="bad json")]) is False
+    assert [folder for folder, _ in tree(model)] == ["measures"]
+    assert model.remove_paths([path("a.json")]) is True
+    assert model.checked_paths() == []
+
+
+def test_checked_paths_and_folders(model):
+    changes = []
+    model.checked_changed.connect(lambda: changes.append(True))
+    model.set_checked(path("b.json"))
+    model.set_checked(path(os.path.join("ref", "r.json")))
+    assert model.checked_paths() == [path("b.json"), path(os.path.join("ref", "r.json"))]
+    assert model.checked_folders() == {".", "ref"}
+    assert len(changes) == 2
+
+    # files joining the current analysis do not trigger a reload
+    model.check_paths([path("a.json")])
+    assert model.is_checked(path("a.json")) and len(changes) == 2
+
+
+def test_freed_slots_are_reused(model):
+    slot = model.slot_for_path(path("a.json"))
+    model.remove_paths([path("a.json")])
+    model.add_entries([make_entry("z.json", "film z")])
+    assert model.slot_for_path(path("z.json")) == slot
+    assert model.slot_label(slot) == "film z [R, G, B] - 2025-06-01"
+    assert model.matching_slots("film a") == set()
+    assert model.matching_slots("", (date(2025, 6, 1), date(2025, 6, 30))) == {
+        model.slot_for_path(path("b.json")), slot, model.slot_for_path(path(os.path.join("ref", "r.json")))}
+
+
+def visible(proxy):
+    return sorted(
+        proxy.index(i, 0, proxy.index(row, 0)).data()
+        for row in range(proxy.rowCount())
+        for i in range(proxy.rowCount(proxy.index(row, 0)))
+    )
+
+
+@pytest.fixture
+def proxy(model):
+    proxy = MeasuresFilterProxy()
+    proxy.setSourceModel(model)
+    return proxy
+
+
+def test_filter_text_and_dates(model, proxy):
+    proxy.set_date_filter("FILM")
+    assert visible(proxy) == ["film a [R, G, B] - 2025-07-14", "film b [R, G, B] - 2025-06-01"]
+    proxy.set_date_filter("film", (date(2025, 7, 1), date(2025, 7, 31)))
+    assert visible(proxy) == ["film a [R, G, B] - 2025-07-14"]
+    assert proxy.rowCount() == 1  # ref folder hidden with its files
+    proxy.set_date_filter("")
+    assert len(visible(proxy)) == 3
+
+
+def test_filter_follows_changed_slots(model, proxy):
+    proxy.set_date_filter("film a")
+    # relabelled after the filter was computed
+    model.add_entries([make_entry("a.json", "other")])
+    assert visible(proxy) == []
+
+    # removed, then its slot reused by a file that does not match
+    proxy.set_date_filter("film b")
+    model.remove_paths([path("b.json")])
+    model.add_entries([make_entry("c.json", "film c")])
+    assert visible(proxy) == []
+
+    # added after the filter and matching
+    model.add_entries([make_entry("d.json", "film b bis")])
+    assert visible(proxy) == ["film b bis [R, G, B] - 2025-06-01"]
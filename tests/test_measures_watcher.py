@@ -0,0 +1,77 @@
+# tests/test_measures_watcher.py
+
+import os
+import shutil
+import time
+
+import pytest
+
+from lib.catalog import MeasurementCatalog
+from lib.measures_watcher import MeasuresWatcher
+
+
+def wait(app, condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        app.processEvents()
+        time.sleep(0.01)
+    app.processEvents()
+    return condition()
+
+
+@pytest.fixture
+def watcher(qapp, measures_dir):
+    catalog = MeasurementCatalog(str(measures_dir), db_path=os.path.join(str(measures_dir), ".catalog.sqlite3"))
+    watcher = MeasuresWatcher(str(measures_dir), catalog)
+    events = {"added": [], "removed": [], "finished": []}
+    watcher.files_added.connect(events["added"].extend)
+    watcher.files_removed.connect(events["removed"].extend)
+    watcher.scan_finished.connect(events["finished"].append)
+    yield watcher, events
+    wait(qapp, lambda: watcher._job is None)
+    catalog.close()
+
+
+def test_changes_during_scan_reported_once(qapp, measures_dir, write_measurement, watcher):
+    watcher, events = watcher
+    for i in range(5):
+        write_measurement(measures_dir / f"{i}.json")
+
+    watcher.scan()
+    # written while the scan runs: queued behind it, not refreshed concurrently
+    write_measurement(measures_dir / "new.json")
+    write_measurement(measures_dir / "sub" / "x.json")
+    assert watcher.is_scanning()
+    assert wait(qapp, lambda: events["finished"] and "new.json" in events["added"]
+                and os.path.join("sub", "x.json") in events["added"])
+    wait(qapp, lambda: watcher._job is None)
+
+    assert events["finished"] == [True]
+    assert len(events["added"]) == len(set(events["added"])) == 7
+    assert str(measures_dir / "sub") in watcher._watcher.directories()
+
+
+def test_folder_changes_after_scan(qapp, measures_dir, write_measurement, watcher):
+    watcher, events = watcher
+    write_measurement(measures_dir / "sub" / "a.json")
+    watcher.scan()
+    assert wait(qapp, lambda: events["finished"])
+
+    write_measurement(measures_dir / "deep" / "er" / "b.json")
+    assert wait(qapp, lambda: os.path.join("deep", "er", "b.json") in events["added"])
+    assert str(measures_dir / "deep" / "er") in watcher._watcher.directories()
+
+    shutil.rmtree(measures_dir / "sub")
+    assert wait(qapp, lambda: events["removed"] == [os.path.join("sub", "a.json")])
+    assert str(measures_dir / "sub") not in watcher._watcher.directories()
+
+
+def test_cancel_scan(qapp, measures_dir, write_measurement, watcher):
+    watcher, events = watcher
+    write_measurement(measures_dir / "a.json")
+    watcher.scan()
+    watcher.cancel_scan()
+    assert wait(qapp, lambda: not watcher.is_scanning())
+    # a new scan after a cancel starts once the cancelled one returned
+    watcher.scan()
+    assert wait(qapp, lambda: events["finished"] and events["finished"][-1] is True)
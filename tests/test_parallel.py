@@ -0,0 +1,44 @@
+# tests/test_parallel.py
+
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from model.measurement_set import load_measurement_files
+from utils.parallel import PROCESS_THRESHOLD, make_executor, parallel_map
+
+
+def test_executor_choice():
+    assert make_executor(1, max_workers=4) is None
+    assert make_executor(100, max_workers=1) is None
+
+    executor = make_executor(10, max_workers=2)
+    assert isinstance(executor, ThreadPoolExecutor)
+    executor.shutdown()
+
+    executor = make_executor(PROCESS_THRESHOLD, max_workers=2)
+    assert isinstance(executor, ProcessPoolExecutor)
+    assert executor._mp_context.get_start_method() == "spawn"
+    executor.shutdown()
+
+
+def test_no_process_pool_outside_main_thread():
+    executors = []
+    thread = threading.Thread(target=lambda: executors.append(make_executor(10, max_workers=2, use_processes=True)))
+    thread.start()
+    thread.join()
+    assert isinstance(executors[0], ThreadPoolExecutor)
+    executors[0].shutdown()
+
+
+def test_parallel_map_keeps_order():
+    assert parallel_map(pow, range(50), [2] * 50, max_workers=4, use_processes=False) == [i * i for i in range(50)]
+    assert parallel_map(pow, [], []) == []
+
+
+def test_load_measurement_files(measures_dir, write_measurement):
+    paths = [write_measurement(measures_dir / f"{i}.json", name=str(i)) for i in range(4)]
+    (measures_dir / "broken.json").write_text("[")
+    results = load_measurement_files(paths + [str(measures_dir / "broken.json")], max_workers=2, use_processes=False)
+
+    assert [r.measurement.name for r in results[:4]] == ["0", "1", "2", "3"]
+    assert results[4].measurement is None and results[4].error
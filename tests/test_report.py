@@ -0,0 +1,68 @@
+# tests/test_report.py
+
+import threading
+from pathlib import Path
+
+from conftest import SAMPLE_CURVES
+from lib import report
+from lib.report import render_report_page, render_reports, write_pdf_report
+from model.measurement_set import read_measurement_file
+from utils.parallel import make_executor
+
+# rises in its last steps only: the gamma range runs past the curve
+OVERFLOW = [0.1] * 17 + [0.5, 1.0, 2.0, 3.0]
+
+
+def test_overflowing_gamma_range(measures_dir, write_measurement):
+    path = write_measurement(measures_dir / "a.json", values={"r": OVERFLOW, "g": SAMPLE_CURVES["g"]})
+    rows = report._gamma_rows(read_measurement_file(Path(path)), None, report.SummaryParams())
+    assert [row[0] for row in rows] == ["R", "G"]
+    assert rows[0][1] == "-" and rows[1][1] != "-"
+    assert render_report_page(path).png is not None
+
+
+def test_failed_page_does_not_stop_report(tmp_path, measures_dir, write_measurement, monkeypatch):
+    paths = [write_measurement(measures_dir / f"{name}.json") for name in ("a", "b", "c")]
+    (measures_dir / "broken.json").write_text("[")
+    build = report.build_report_figure
+
+    def build_report_figure(measurement, *args):
+        if measurement.name == "b":
+            raise RuntimeError("draw failed")
+        return build(measurement, *args)
+
+    monkeypatch.setattr(report, "build_report_figure", build_report_figure)
+    pages = write_pdf_report(paths + [str(measures_dir / "broken.json")], str(tmp_path / "r.pdf"), max_workers=1)
+    assert [p.png is not None for p in pages] == [True, False, True, False]
+    assert pages[1].error == "draw failed"
+    assert (tmp_path / "r.pdf").read_bytes().count(b"/Type /Page ") == 2
+
+
+def test_serial_rendering_outside_main_thread(measures_dir, write_measurement, monkeypatch):
+    paths = [write_measurement(measures_dir / f"{i}.json") for i in range(4)]
+    threads = set()
+    render = report._render_page
+
+    def render_page(path, options):
+        threads.add(threading.get_ident())
+        return render(path, options)
+
+    monkeypatch.setattr(report, "_render_page", render_page)
+    pages, worker = [], []
+    thread = threading.Thread(target=lambda: (worker.append(threading.get_ident()),
+                                              pages.extend(render_reports(paths, max_workers=4))))
+    thread.start()
+    thread.join()
+    assert threads == set(worker)
+    assert all(p.png for p in pages)
+
+
+def test_pool_from_main_thread(tmp_path, measures_dir, write_measurement):
+    paths = [write_measurement(measures_dir / f"{i}.json") for i in range(3)]
+    executor = make_executor(len(paths), max_workers=2, use_processes=True)
+    pages = []
+    thread = threading.Thread(target=lambda: pages.extend(write_pdf_report(paths, str(tmp_path / "r.pdf"), executor=executor)))
+    thread.start()
+    thread.join()
+    executor.shutdown()
+    assert [p.path for p in pages] == paths and all(p.png for p in pages)
@@ -0,0 +1,89 @@
+# tests/test_spc.py
+
+import math
+import random
+import statistics
+from pathlib import Path
+
+import pytest
+
+from lib.history_analyzer import HistoryAnalyzer
+from lib.spc import ControlChart, SpcMonitor, SpcSettings, step_metric
+from model.measurement_set import read_measurement_file
+
+
+def test_limits_follow_rolling_window():
+    rng = random.Random(1)
+    settings = SpcSettings(window=8, min_points=5)
+    chart = ControlChart(settings)
+    values = [rng.gauss(0.0, 0.01) for _ in range(40)]
+    for i, value in enumerate(values):
+        point = chart.add(value)
+        previous = values[max(0, i - settings.window):i]
+        if len(previous) < settings.min_points:
+            assert point.ucl is None and point.alarms == []
+            continue
+        mean, sigma = statistics.mean(previous), statistics.stdev(previous)
+        assert point.mean == pytest.approx(mean)
+        assert point.sigma == pytest.approx(sigma)
+        assert point.ucl == pytest.approx(mean + 3 * sigma)
+        assert point.lcl == pytest.approx(mean - 3 * sigma)
+        ewma_limit = 3 * sigma * math.sqrt(0.2 / 1.8)
+        assert point.ewma_ucl == pytest.approx(ewma_limit)
+        assert point.ewma_lcl == pytest.approx(-ewma_limit)
+
+
+def test_shift_and_drift_alarms():
+    # in control: zero mean, bounded
+    noise = [0.01 * math.sin(2.3 * i) for i in range(30)]
+
+    chart = ControlChart()
+    assert not any(chart.add(v).alarms for v in noise)
+    assert "limit" in chart.add(0.2).alarms
+
+    # a shift of less than one sigma is caught by the CUSUM
+    chart = ControlChart()
+    for v in noise:
+        chart.add(v)
+    drift = [chart.add(v + 0.008) for v in noise]
+    assert any("cusum+" in p.alarms for p in drift)
+    assert not any("cusum-" in p.alarms for p in drift)
+
+
+def test_monitor_from_analyzer_matches_streaming(measures_dir, write_measurement):
+    reference = read_measurement_file(Path(write_measurement(measures_dir / "ref" / "r.json")))
+    rng = random.Random(3)
+    measurements = []
+    for i in range(14):
+        shift = 0.2 if i == 13 else round(rng.uniform(-0.02, 0.02), 2)
+        path = write_measurement(measures_dir / f"m{i:02}.json", shift=shift, mtime=1_700_000_000 + 3600 * i)
+        measurements.append(read_measurement_file(Path(path)))
+
+    streaming = SpcMonitor(reference, steps=[1, 21])
+    for m in measurements:
+        streaming.add(m)
+    batch = SpcMonitor.from_analyzer(HistoryAnalyzer(reference, measurements), steps=[1, 21])
+
+    assert streaming.metrics == ["gamma", "d_min", "d_max", step_metric(1), step_metric(21)]
+    assert batch.charts.keys() == streaming.charts.keys()
+    for key, chart in streaming.charts.items():
+        assert [p.value for p in batch.charts[key].points] == pytest.approx([p.value for p in chart.points]), key
+    assert sorted(map(str, batch.alarms)) == sorted(map(str, streaming.alarms))
+    # the shifted last measurement is out of the Dmin limits of every channel
+    assert {(a.metric, a.channel) for a in streaming.alarms if a.rule == "limit"} >= {("d_min", ch) for ch in "RGB"}
+    assert all(a.path.endswith("m13.json") for a in streaming.alarms if a.rule == "limit")
+
+
+def test_monitor_skips_gamma_it_can_not_compute(measures_dir, write_measurement):
+    # rises in its last steps only: the gamma range runs past the curve
+    overflow = {"r": [0.1] * 17 + [0.5, 1.0, 2.0, 3.0]}
+    reference = read_measurement_file(Path(write_measurement(measures_dir / "ref" / "r.json")))
+    monitor = SpcMonitor(reference)
+    monitor.add(read_measurement_file(Path(write_measurement(measures_dir / "a.json", values=overflow))))
+    assert ("gamma", "R") not in monitor.charts
+    assert ("d_max", "R") in monitor.charts
+
+    monitor = SpcMonitor(read_measurement_file(Path(write_measurement(measures_dir / "ref" / "o.json", values=overflow))))
+    assert ("gamma", "R") not in monitor.targets and ("d_min", "R") in monitor.targets
+    monitor.add(reference)
+    assert ("gamma", "R") not in monitor.charts
@@ -0,0 +1,52 @@
+# tests/test_summaries.py
+
+import os
+
+from conftest import SAMPLE_CURVES
+from lib.catalog import MeasurementCatalog
+from lib.gamma import GammaAnalyzer
+from lib.summaries import SUMMARY_PARAMS, SummaryParams, summarize_curve, summarize_curves
+
+
+def test_summary_matches_analyzer():
+    for params in SUMMARY_PARAMS:
+        reading = summarize_curve(SAMPLE_CURVES["g"], params)
+        expected = GammaAnalyzer().get_gamma_from_values(SAMPLE_CURVES["g"], step_value=params.step_value)
+        assert reading == expected
+        assert (reading.d_min, reading.d_max) == (0.54, 2.04)
+
+
+def test_summaries_per_params():
+    summaries = summarize_curves({"R": SAMPLE_CURVES["r"], "B": SAMPLE_CURVES["b"]})
+    assert set(summaries) == {p.key for p in SUMMARY_PARAMS}
+    low, high = (summaries[p.key]["R"].gamma for p in SUMMARY_PARAMS)
+    assert low != high
+    assert SummaryParams(step_value=0.15).key != SummaryParams(step_value=0.2).key
+
+
+def test_catalog_serves_stored_summaries(measures_dir, write_measurement):
+    path = write_measurement(measures_dir / "a.json")
+    catalog = MeasurementCatalog(str(measures_dir), db_path=os.path.join(str(measures_dir), ".catalog.sqlite3"))
+    catalog.refresh()
+
+    for params in SUMMARY_PARAMS:
+        stored = catalog.get_summaries([path], params)[path]
+        assert stored["B"] == summarize_curve(SAMPLE_CURVES["b"], params)
+    # parameters never summarized at indexing time
+    assert catalog.get_summaries([path], SummaryParams(step_value=0.3)) == {}
+
+
+def test_overflowing_gamma_range_is_left_out(measures_dir, write_measurement):
+    # rises in its last steps only: the gamma range runs past the curve
+    overflow = [0.1] * 17 + [0.5, 1.0, 2.0, 3.0]
+    summaries = summarize_curves({"R": overflow, "G": SAMPLE_CURVES["g"]})
+    assert all(set(readings) == {"G"} for readings in summaries.values())
+
+    write_measurement(measures_dir / "a.json", values={"r": overflow, "g": SAMPLE_CURVES["g"]})
+    write_measurement(measures_dir / "b.json")
+    catalog = MeasurementCatalog(str(measures_dir), db_path=os.path.join(str(measures_dir), ".catalog.sqlite3"))
+    changes = catalog.refresh()
+    assert sorted(changes.added) == ["a.json", "b.json"]
+    stored = catalog.get_summaries([str(measures_dir / "a.json")], SUMMARY_PARAMS[0])
+    assert set(stored[str(measures_dir / "a.json")]) == {"G"}
+    assert catalog.get_many(["a.json"])[0].error is None
@@ -1,15 +1,15 @@
 # ui/curve_ui.py
 
 import os
-import json
 from datetime import datetime
 import math
 
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QComboBox, QCheckBox, QRadioButton, QSizePolicy, QTextEdit, QFrame, 
-    QButtonGroup, QHBoxLayout, QPushButton, QLineEdit, QFileDialog, QInputDialog, QSplitter, QTabWidget
+    QButtonGroup, QHBoxLayout, QPushButton, QLineEdit, QFileDialog, QInputDialog, QSplitter, QTabWidget,
+    QStackedWidget
 )
-from PySide6.QtCore import Qt, QEvent
+from PySide6.QtCore import Qt, QEvent, QThreadPool, QTimer, Signal
 from PySide6.QtGui import QStandardItemModel
 
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
@@ -20,21 +20,35 @@ from matplotlib.backends.backend_qt import NavigationToolbar2QT as NavigationToo
 import numpy as np
 
 from lib.curves import CurveManager
-from utils.plot_utils import ColorChannelSet, draw_curve_graph
+from utils.plot_utils import ColorChannelSet, CurvePlotter
 from lib.communications import DensitometerReader
-from lib.gamma import GammaAnalyzer, GammaReading, Range
+from lib.gamma import GAMMA_CACHE, GammaAnalyzer, GammaReading, IncrementalGamma, Range
+from lib.catalog import CatalogChanges, get_catalog
+from lib.measures_watcher import CatalogScanWorker
+from lib.reference_index import get_reference_index
+from ui.live_plot import LiveCurvePlot
 from constants import MEASURES_PATH, COLOR_SET
 
+FRAME_MS = 16  # data changes within a frame are rendered once
+
+# file selectors extra data roles
+SELECTOR_SORT_ROLE = Qt.ItemDataRole.UserRole + 1
+SELECTOR_FOLDER_ROLE = Qt.ItemDataRole.UserRole + 2
+SELECTOR_REBUILD_THRESHOLD = 200
+
 
 class CurveWidget(QWidget):
     """
     CurveWidget class manage curves tabp, inputs and graph
     Args:
         reader (DensitometerReader): DensitometerReader
+        watcher (MeasuresWatcher): keeps file selectors up to date
         parent
 
     """
-    def __init__(self, reader:DensitometerReader, tabs=None, parent=None):
+    step_received = Signal(dict, int)  # densities per channel, step index, as received from the densitometer
+
+    def __init__(self, reader:DensitometerReader, tabs=None, watcher=None, parent=None):
         """
         Init
         """
@@ -47,9 +61,19 @@ class CurveWidget(QWidget):
         self.reader = reader
         self.connect_signals()
         self.tabs = tabs
+        self.watcher = watcher
+
+        # parts to render at the next frame: "sensito", "deltad", "stats"
+        self._dirty = set()
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.setInterval(FRAME_MS)
+        self._frame_timer.timeout.connect(self._render_frame)
 
         self.manager = CurveManager()
         self.manager.data_updated.connect(self.update_plot)
+        # measured curves are analyzed incrementally, as they are filled step by step
+        self.gamma_states = {k: IncrementalGamma() for k in self.inputs_color_map}
 
         self.layout_main = QSplitter(Qt.Horizontal)  # type: ignore
         main_layout = QVBoxLayout(self)
@@ -72,6 +96,17 @@ class CurveWidget(QWidget):
                 for i, field in enumerate(fields):
                     field.installEventFilter(self)
 
+        self._scan_worker = None
+        if watcher is not None:
+            watcher.files_added.connect(self.on_files_changed)
+            watcher.files_modified.connect(self.on_files_changed)
+            watcher.files_removed.connect(self.on_files_removed)
+        else:
+            # no watcher: the selectors show the indexed files, the catalog is refreshed in the background
+            self._scan_worker = CatalogScanWorker(get_catalog(MEASURES_PATH))
+            self._scan_worker.signals.chunk_indexed.connect(self.on_catalog_changes)
+            QThreadPool.globalInstance().start(self._scan_worker)
+
 
     def _setup_plot(self):
         """
@@ -103,11 +138,30 @@ class CurveWidget(QWidget):
         deltad_graph_widget.setMinimumWidth(800)
         deltad_graph_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
 
+        # live view painted with QPainter, matplotlib canvases built on demand (zoom, export)
+        self.sensito_live = LiveCurvePlot(title="Density curves", xlabel="Measurement", ylabel="Density", vlines=(11,))
+        self.deltad_live = LiveCurvePlot(title="Delta Curves", xlabel="Measurement", ylabel="Δ Density (meas - ref)")
+        self.sensito_stack = QStackedWidget()
+        self.sensito_stack.addWidget(self.sensito_live)
+        sensito_graph_layout.addWidget(self.sensito_stack)
+        self.deltad_stack = QStackedWidget()
+        self.deltad_stack.addWidget(self.deltad_live)
+        deltad_graph_layout.addWidget(self.deltad_stack)
+        self.sensito_plotter = None
+        self.deltad_plotter = None
+
+        self.detailed_view_checkbox = QCheckBox("Vue détaillée (matplotlib : zoom, export)")
+        self.detailed_view_checkbox.toggled.connect(self.set_detailed_view)
+        plot_layout.addWidget(self.detailed_view_checkbox)
+
         self.plot_tabs = QTabWidget()
         self.plot_tabs.setTabPosition(QTabWidget.West)  # type: ignore
 
         self.plot_tabs.addTab(sensito_graph_widget, "Sensito")
         self.plot_tabs.addTab(deltad_graph_widget, "delta-d")
+        # a hidden graph stays stale until its page is shown
+        self.plot_pages = {"sensito": sensito_graph_widget, "deltad": deltad_graph_widget}
+        self.plot_tabs.currentChanged.connect(self._schedule_frame)
 
         plot_layout.addWidget(self.plot_tabs)
 
@@ -172,16 +226,25 @@ class CurveWidget(QWidget):
             background-color: #f2f2f2;
         """)
         self.step_selector.setSizePolicy(QSizePolicy.Policy.Maximum, QSizePolicy.Policy.Preferred)
-        self.step_selector.currentIndexChanged.connect(self.update_stats)
+        self.step_selector.currentIndexChanged.connect(lambda _: self.mark_dirty("stats"))
 
         step_layout.addWidget(step_title)
         step_layout.addWidget(self.step_selector)
         self.stats_layout.addLayout(step_layout)
 
 
+        self.layout_main.addWidget(plot_widget)
+        self.layout_main.addWidget(self.right_widget)
+
+
+    def _setup_matplotlib(self):
+        """
+        Init the matplotlib graphs of the detailed view
+        """
         # sensito curves
         self.sensito_canvas = FigureCanvas(Figure(figsize=(6, 4)))
         self.sensito_canvas.setMinimumWidth(800)
+        sensito_graph_layout = QVBoxLayout()
         sensito_graph_layout.addWidget(self.sensito_canvas)
         # tool bar
         self.sensito_toolbar = NavigationToolbar(self.sensito_canvas, self)
@@ -193,13 +256,22 @@ class CurveWidget(QWidget):
             top=0.99,
             bottom=0.07
         )
+        self.sensito_plotter = CurvePlotter(
+            ax=self.ax_sensito,
+            canvas=self.sensito_canvas,
+            title="Density curves",
+            xlabel="Measurement",
+            ylabel="Density",
+            vlines=(11,),
+        )
 
         # delta-d curves
         self.deltad_canvas = FigureCanvas(Figure(figsize=(6, 4)))
         self.deltad_canvas.setMinimumWidth(800)
+        deltad_graph_layout = QVBoxLayout()
         deltad_graph_layout.addWidget(self.deltad_canvas)
         # tool bar
-        self.deltad_toolbar = NavigationToolbar(self.sensito_canvas, self)
+        self.deltad_toolbar = NavigationToolbar(self.deltad_canvas, self)
         deltad_graph_layout.addWidget(self.deltad_toolbar)
         self.ax_deltad = self.deltad_canvas.figure.add_subplot(111)
         self.deltad_canvas.figure.subplots_adjust(
@@ -208,9 +280,29 @@ class CurveWidget(QWidget):
             top=0.99,
             bottom=0.07
         )
+        self.deltad_plotter = CurvePlotter(
+            ax=self.ax_deltad,
+            canvas=self.deltad_canvas,
+            title="Delta Curves",
+            xlabel="Measurement",
+            ylabel="Δ Density (meas - ref)",
+        )
+
+        for stack, layout in ((self.sensito_stack, sensito_graph_layout), (self.deltad_stack, deltad_graph_layout)):
+            container = QWidget()
+            container.setLayout(layout)
+            stack.addWidget(container)
 
-        self.layout_main.addWidget(plot_widget)
-        self.layout_main.addWidget(self.right_widget)
+
+    def set_detailed_view(self, detailed: bool):
+        """
+        Show the matplotlib graphs (zoom, export) instead of the live view
+        """
+        if detailed and self.sensito_plotter is None:
+            self._setup_matplotlib()
+        for stack in (self.sensito_stack, self.deltad_stack):
+            stack.setCurrentIndex(1 if detailed else 0)
+        self.mark_dirty("sensito", "deltad")
 
 
     def _setup_controls(self):
@@ -275,6 +367,13 @@ class CurveWidget(QWidget):
         )
         # self.import_ref_selector.setMaximumWidth(200)
         ref_column.addWidget(self.import_ref_selector)
+        # référence de la bibliothèque la plus proche des mesures en cours
+        self.suggested_ref = None
+        self.ref_suggestion_btn = QPushButton()
+        self.ref_suggestion_btn.setToolTip("Référence la plus proche des mesures, cliquer pour la charger")
+        self.ref_suggestion_btn.setVisible(False)
+        self.ref_suggestion_btn.clicked.connect(self.load_suggested_ref)
+        ref_column.addWidget(self.ref_suggestion_btn)
         self._add_input_grid(self.ref_inputs, ref_column)
 
         # saved measures selector
@@ -414,11 +513,71 @@ class CurveWidget(QWidget):
 
     def update_plot(self, data=None):
         """
-        Update graphs
+        Update graphs and stats at the next frame
+        """
+        self.mark_dirty("sensito", "deltad", "stats")
+
+
+    def mark_dirty(self, *parts: str):
         """
-        self.draw_sensito_graph()
-        self.draw_deltad_graph()
-        self.update_stats()
+        Schedule the render of graphs ("sensito", "deltad") or stats ("stats"). Any number of
+        changes within a frame are rendered once.
+        """
+        self._dirty.update(parts)
+        self._schedule_frame()
+
+
+    def _schedule_frame(self, *args):
+        if self._dirty and not self._frame_timer.isActive():
+            self._frame_timer.start()
+
+
+    def _render_frame(self):
+        """
+        Render the dirty parts: stats, and the graph of the visible plot page
+        """
+        if "stats" in self._dirty:
+            self._dirty.discard("stats")
+            self.update_stats()
+            self.update_ref_suggestion()
+
+        if not self.isVisible():
+            return
+        current = self.plot_tabs.currentWidget()
+        for part, draw in (("sensito", self.draw_sensito_graph), ("deltad", self.draw_deltad_graph)):
+            if part in self._dirty and self.plot_pages[part] is current:
+                self._dirty.discard(part)
+                draw()
+
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._schedule_frame()
+
+
+    def update_ref_suggestion(self):
+        """
+        Suggest the library reference closest to the measured curves
+        """
+        mode = 'vcmy' if self.radio_vcmy.isChecked() else 'vrgb'
+        abcd_to_channel = self.color_set[mode].abcd_to_channel
+        curves = {
+            abcd_to_channel[key.split("_")[1]]: values
+            for key, values in self.manager.data.items() if key.startswith("meas_")
+        }
+        matches = get_reference_index(MEASURES_PATH).nearest(curves, k=1)
+        self.suggested_ref = matches[0].rel_path if matches else None
+        if matches and self.import_ref_selector.currentData() != self.suggested_ref:
+            self.ref_suggestion_btn.setText(f"Suggestion : {matches[0].name}")
+            self.ref_suggestion_btn.setVisible(True)
+        else:
+            self.ref_suggestion_btn.setVisible(False)
+
+
+    def load_suggested_ref(self):
+        index = self.import_ref_selector.findData(self.suggested_ref)
+        if index >= 0:
+            self.import_ref_selector.setCurrentIndex(index)
 
 
     def draw_sensito_graph(self):
@@ -451,22 +610,15 @@ class CurveWidget(QWidget):
                 "linestyle": linestyle,
             }
 
-        draw_curve_graph(
-            ax=self.ax_sensito,
-            canvas=self.sensito_canvas,
-            curves=curves,
-            title="Density curves",
-            xlabel="Measurement",
-            ylabel="Density",
-        )
-        
-        self.ax_sensito.axvline(x=11, color="black", linestyle="--", linewidth=1.0, alpha=0.2)
-        self.sensito_canvas.draw()
+        if self.detailed_view_checkbox.isChecked():
+            self.sensito_plotter.update(curves)
+        else:
+            self.sensito_live.set_curves(curves)
 
             
     def draw_deltad_graph(self):
         """
-        Update delta-d plot (meas - ref) for each visible channel using draw_curve_graph.
+        Update delta-d plot (meas - ref) for each visible channel.
         """
         curves = {}
 
@@ -499,14 +651,10 @@ class CurveWidget(QWidget):
                     "linestyle": "-",
                 }
 
-        draw_curve_graph(
-            ax=self.ax_deltad,
-            canvas=self.deltad_canvas,
-            curves=curves,
-            title="Delta Curves",
-            xlabel="Measurement",
-            ylabel="Δ Density (meas - ref)"
-        )
+        if self.detailed_view_checkbox.isChecked():
+            self.deltad_plotter.update(curves)
+        else:
+            self.deltad_live.set_curves(curves)
 
 
     def update_stats(self):
@@ -526,14 +674,15 @@ class CurveWidget(QWidget):
                 label.setText("--")
             return
 
-        GA = GammaAnalyzer()
+        GA = GammaAnalyzer(cache=GAMMA_CACHE)
         try:
             step_value = float(self.step_selector.currentText()) if hasattr(self, "step_selector") else 0.15
 
             results = GA.get_gamma_from_curve_data(
                 self.manager.data,
                 visible_channels,
-                step_value=step_value
+                step_value=step_value,
+                states=self.gamma_states
             )
         except Exception:
             for label in self.stat_labels.values():
@@ -586,65 +735,168 @@ class CurveWidget(QWidget):
         selector.addItem("importer")
 
         abs_base = os.path.join(os.path.dirname(__file__), path)
-        channel_order = ['v', 'r', 'g', 'b', 'c', 'm', 'y']
         entries_by_folder = {}
 
-        for root, _, files in os.walk(abs_base):
-            rel_folder = os.path.relpath(root, abs_base)
-            entries = []
-
-            for fname in sorted(files):
-                if not fname.endswith(".json"):
-                    continue
-
-                full_path = os.path.join(root, fname)
-
-                try:
-                    with open(full_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    
-                    name = data.get("name", os.path.splitext(fname)[0])
-                    values = data.get("values", {})
-                    date_str = data.get("date", "?")
-                    try:
-                        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-                    except ValueError:
-                        date_obj = datetime.min
-
-                    # we only take used color channels
-                    used_channels = list(values.keys())  # ex: ['b']
-                    channel_order = ['v', 'r', 'g', 'b', 'c', 'm', 'y']
-                    channel_str = ",".join(k.upper() for k in channel_order if k in used_channels)
-
-                    label = f"{name} - {channel_str} - {date_str}"
-
-                    rel_path = os.path.relpath(full_path, abs_base)
-                    entries.append((date_obj, label, rel_path))
-
-                except Exception as e:
-                    print(f"Reading error {fname} : {e}")
-                    continue
+        for entry in get_catalog(abs_base).entries():
+            if entry.error:
+                continue
+            sort_key, label = self._selector_label(entry)
+            entries_by_folder.setdefault(entry.folder, []).append((sort_key, label, entry.rel_path))
 
-            if entries:
-                # sort by date
-                entries.sort(key=lambda t: t[0], reverse=True)
-                entries_by_folder[rel_folder] = entries
+        for entries in entries_by_folder.values():
+            # sort by date
+            entries.sort(key=lambda t: t[0][0])
 
         # sort by folder
         for folder in sorted(entries_by_folder, key=lambda f: (f != ".", f.lower())):
             if folder != ".":
-                selector.addItem(f"⎯⎯⎯ {folder.upper()}")
-                idx = selector.count() - 1
-                model = selector.model()
-                if isinstance(model, QStandardItemModel):
-                    model.item(idx).setEnabled(False)
+                self._selector_add_header(selector, selector.count(), folder)
 
-            for _, label, rel_path in entries_by_folder[folder]:
-                selector.addItem(label, userData=rel_path)
+            for sort_key, label, rel_path in entries_by_folder[folder]:
+                self._selector_add_entry(selector, selector.count(), folder, sort_key, label, rel_path)
 
         selector.blockSignals(False)
 
 
+    def _selector_label(self, entry) -> tuple[tuple[int, str], str]:
+        """
+        Build a file selector label and its sort key (newest date first, then file name)
+        Args:
+            entry (CatalogEntry): catalog entry of the file
+        """
+        channel_order = ['v', 'r', 'g', 'b', 'c', 'm', 'y']
+        name = entry.name or os.path.splitext(os.path.basename(entry.rel_path))[0]
+        date_str = entry.json_date or "?"
+        try:
+            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+        except ValueError:
+            date_obj = datetime.min
+
+        # we only take used color channels
+        channel_str = ",".join(k.upper() for k in channel_order if k in entry.channels)
+
+        label = f"{name} - {channel_str} - {date_str}"
+        return (-date_obj.toordinal(), os.path.basename(entry.rel_path)), label
+
+
+    def _selector_add_header(self, selector: QComboBox, index: int, folder: str):
+        selector.insertItem(index, f"⎯⎯⎯ {folder.upper()}")
+        selector.setItemData(index, folder, SELECTOR_FOLDER_ROLE)
+        model = selector.model()
+        if isinstance(model, QStandardItemModel):
+            model.item(index).setEnabled(False)
+
+
+    def _selector_add_entry(self, selector: QComboBox, index: int, folder: str, sort_key, label: str, rel_path: str):
+        selector.insertItem(index, label, userData=rel_path)
+        selector.setItemData(index, sort_key, SELECTOR_SORT_ROLE)
+        selector.setItemData(index, folder, SELECTOR_FOLDER_ROLE)
+
+
+    def _selector_insert(self, selector: QComboBox, entry):
+        """
+        Insert a catalog entry at its sorted position, creating the folder header if needed
+        """
+        sort_key, label = self._selector_label(entry)
+        folder_key = (entry.folder != ".", entry.folder.lower())
+        section_found = entry.folder == "."
+
+        index = 1
+        while index < selector.count():
+            item_folder = selector.itemData(index, SELECTOR_FOLDER_ROLE)
+            item_key = (item_folder != ".", item_folder.lower())
+            if item_key > folder_key:
+                break
+            if item_key == folder_key:
+                section_found = True
+                item_sort_key = selector.itemData(index, SELECTOR_SORT_ROLE)
+                if item_sort_key is not None and tuple(item_sort_key) > sort_key:
+                    break
+            index += 1
+
+        if not section_found:
+            self._selector_add_header(selector, index, entry.folder)
+            index += 1
+        self._selector_add_entry(selector, index, entry.folder, sort_key, label, entry.rel_path)
+
+
+    def _selector_remove(self, selector: QComboBox, rel_path: str):
+        """
+        Remove a file from a selector, and its folder header once empty
+        """
+        index = selector.findData(rel_path)
+        if index < 0:
+            return
+        folder = selector.itemData(index, SELECTOR_FOLDER_ROLE)
+        selector.removeItem(index)
+
+        header = index - 1
+        is_own_header = (
+            selector.itemData(header, SELECTOR_SORT_ROLE) is None
+            and selector.itemData(header, SELECTOR_FOLDER_ROLE) == folder
+        )
+        section_empty = index >= selector.count() or selector.itemData(index, SELECTOR_FOLDER_ROLE) != folder
+        if is_own_header and section_empty:
+            selector.removeItem(header)
+
+
+    def on_catalog_changes(self, changes: CatalogChanges):
+        """
+        Update file selectors with a chunk of the background catalog refresh
+        """
+        if changes.removed:
+            self.on_files_removed(changes.removed)
+        if changes.added or changes.updated:
+            self.on_files_changed(changes.added + changes.updated)
+
+
+    def on_files_changed(self, rel_paths: list[str]):
+        """
+        Update file selectors with files added or modified on disk
+        """
+        if any(os.path.dirname(p) == "ref" for p in rel_paths):
+            get_reference_index(MEASURES_PATH).invalidate()
+        if len(rel_paths) > SELECTOR_REBUILD_THRESHOLD:
+            # large batches (initial indexing): a rebuild is cheaper than sorted inserts
+            for selector in (self.import_ref_selector, self.import_meas_selector):
+                current = selector.currentData()
+                self.populate_file_selector(selector, MEASURES_PATH)
+                if current is not None:
+                    selector.blockSignals(True)
+                    selector.setCurrentIndex(max(0, selector.findData(current)))
+                    selector.blockSignals(False)
+            return
+
+        entries = {entry.rel_path: entry for entry in get_catalog(MEASURES_PATH).get_many(rel_paths)}
+        for selector in (self.import_ref_selector, self.import_meas_selector):
+            current = selector.currentData()
+            selector.blockSignals(True)
+            for rel_path in rel_paths:
+                self._selector_remove(selector, rel_path)
+                entry = entries.get(os.path.normpath(rel_path))
+                if entry is not None and not entry.error:
+                    self._selector_insert(selector, entry)
+            if current is not None:
+                selector.setCurrentIndex(max(0, selector.findData(current)))
+            selector.blockSignals(False)
+
+
+    def on_files_removed(self, rel_paths: list[str]):
+        """
+        Remove files deleted from disk from the file selectors
+        """
+        if any(os.path.dirname(p) == "ref" for p in rel_paths):
+            get_reference_index(MEASURES_PATH).invalidate()
+        for selector in (self.import_ref_selector, self.import_meas_selector):
+            current = selector.currentData()
+            selector.blockSignals(True)
+            for rel_path in rel_paths:
+                self._selector_remove(selector, rel_path)
+            if current is not None:
+                selector.setCurrentIndex(max(0, selector.findData(current)))
+            selector.blockSignals(False)
+
+
     def import_selected_file(self, inputs, file, toclear, path=""):
         self.clear_inputs(toclear, False)
 
@@ -719,6 +971,9 @@ class CurveWidget(QWidget):
             self.manager.export_to_file(fname)
         except Exception as e:
             print("Erreur sauvegarde JSON:", e)
+            return
+        if self.watcher is not None:
+            self.watcher.notify(fname)
 
 
     def eventFilter(self, obj, event):
@@ -736,18 +991,26 @@ class CurveWidget(QWidget):
         mode = 'vcmy' if self.radio_vcmy.isChecked() else 'vrgb'
         channel_map = self.color_set[mode].channel_to_abcd
 
+        # only the received step changes: no need to re-read every field
+        self.manager.blockSignals(True)
         for k, val in values.items():
             if k not in channel_map:
                 continue
             abcd = channel_map[k]
             if abcd in self.meas_inputs and 0 <= self.selected_index < 21:
-                self.meas_inputs[abcd][self.selected_index].setText(f"{val:.2f}")
+                text = f"{val:.2f}"
+                self.meas_inputs[abcd][self.selected_index].setText(text)
+                self.manager.set_value("meas", abcd, self.selected_index, float(text))
+        self.manager.blockSignals(False)
+
+        if 0 <= self.selected_index < 21:
+            self.step_received.emit({k: float(f"{val:.2f}") for k, val in values.items() if k in channel_map}, self.selected_index)
 
         if self.selected_index < 20:
             self.selected_index += 1
         self._highlight_selected_row()
 
-        self.update_from_fields()
+        self.update_plot()
 
 
     def _highlight_selected_row(self):
@@ -1,17 +1,121 @@
 import matplotlib.pyplot as plt
 from PySide6.QtWidgets import QWidget, QVBoxLayout
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
+
+from utils.cache import CacheInfo
+from utils.plot_utils import draw_curve_graph
+
+RENDER_CACHE_SIZE = 16  # rendered figures kept per canvas, a few MB each
+
+
+class RenderCache:
+    """
+    Bounded LRU cache of rendered figures (Agg buffer regions), keyed by what was plotted
+    and the canvas size in pixels
+    Args:
+        maxsize (int): maximum number of cached renders
+    """
+    def __init__(self, maxsize: int = RENDER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[tuple, object]" = OrderedDict()
+
+    def get(self, key: tuple):
+        region = self._items.get(key)
+        if region is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return region
+
+    def put(self, key: tuple, region):
+        self._items[key] = region
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._items))
+
+
+class CachedCanvas(FigureCanvas):
+    """
+    Canvas keeping its renders in a RenderCache. A plot already rendered at the current size
+    is blitted from the cache; its artists are only built if the figure is redrawn later (resize).
+    Args:
+        figure (Figure): figure to show
+        maxsize (int): maximum number of cached renders
+    """
+    def __init__(self, figure, maxsize: int = RENDER_CACHE_SIZE):
+        super().__init__(figure)
+        self.render_cache = RenderCache(maxsize)
+        self._pending_build: Optional[Callable[[], None]] = None
+
+    def draw_plot(self, key: Optional[tuple], build: Callable[[], None]) -> bool:
+        """
+        Show a plot
+        Args:
+            key (tuple, optional): identifies the plotted data, None to render without caching
+            build (callable): sets up the artists of the plot
+        Returns:
+            bool: served from the cache
+        """
+        self._pending_build = None
+        if key is None:
+            build()
+            self.draw()
+            return False
+
+        bbox = self.figure.bbox
+        key = key + (tuple(int(v) for v in bbox.size),)
+        region = self.render_cache.get(key)
+        if region is None:
+            build()
+            self.draw()
+            self.render_cache.put(key, self.copy_from_bbox(bbox))
+            return False
+        self._pending_build = build
+        self.restore_region(region)
+        self.blit(bbox)
+        return True
+
+    def draw(self):
+        if self._pending_build is not None:
+            build, self._pending_build = self._pending_build, None
+            build()
+        super().draw()
+
 
 class HistoryGammaPlot(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         layout = QVBoxLayout(self)
-        self.canvas = FigureCanvas(plt.Figure())
+        self.canvas = CachedCanvas(plt.Figure())
         layout.addWidget(self.canvas)
         self.ax = self.canvas.figure.add_subplot(111)
 
+    def draw_curves(self, key: Optional[tuple], curves: dict, **graph_kwargs) -> bool:
+        """
+        draw_curve_graph through the render cache: a plot already rendered at this canvas size
+        is blitted from the cache instead of being rendered again.
+        Args:
+            key (tuple, optional): identifies the plotted data (reference, selection, plot kind).
+                None to render without caching
+            curves (dict): curves, see draw_curve_graph
+            graph_kwargs: other draw_curve_graph arguments
+        Returns:
+            bool: served from the cache
+        """
+        return self.canvas.draw_plot(key, lambda: draw_curve_graph(self.ax, None, curves, **graph_kwargs))
+
     def plot(self,
              dates: List[datetime],
              gamma_values: Dict[str, List[float]],
@@ -0,0 +1,124 @@
+import matplotlib.pyplot as plt
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QComboBox, QSpinBox, QLabel, QListWidget, QSplitter
+from PySide6.QtCore import Qt, Signal
+from typing import List, Optional
+
+from lib.spc import ControlChart, SpcAlarm, SpcMonitor
+from ui.history_gamma_plot import CachedCanvas
+
+
+class HistorySpcPlot(QWidget):
+    """
+    Control chart of one metric/channel of an SpcMonitor, and the list of its alarms
+    """
+    step_changed = Signal(int)  # density step to chart, 0 for none
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.monitor: Optional[SpcMonitor] = None
+        self.data_key: Optional[tuple] = None  # identifies the monitor data, for the render cache
+
+        self.metric_selector = QComboBox()
+        self.channel_selector = QComboBox()
+        self.step_selector = QSpinBox()
+        self.step_selector.setRange(0, 21)
+        self.step_selector.setSpecialValueText("aucun")
+        self.step_selector.setToolTip("Palier de densité suivi en plus du gamma, Dmin et Dmax")
+
+        selectors = QHBoxLayout()
+        selectors.addWidget(QLabel("Mesure"))
+        selectors.addWidget(self.metric_selector)
+        selectors.addWidget(QLabel("Canal"))
+        selectors.addWidget(self.channel_selector)
+        selectors.addWidget(QLabel("Palier"))
+        selectors.addWidget(self.step_selector)
+        selectors.addStretch()
+
+        self.canvas = CachedCanvas(plt.Figure())
+        self.ax = self.canvas.figure.add_subplot(111)
+        self.alarm_list = QListWidget()
+
+        splitter = QSplitter(Qt.Vertical)
+        splitter.addWidget(self.canvas)
+        splitter.addWidget(self.alarm_list)
+        splitter.setStretchFactor(0, 3)
+        splitter.setStretchFactor(1, 1)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(selectors)
+        layout.addWidget(splitter)
+
+        self.metric_selector.currentIndexChanged.connect(self.plot)
+        self.channel_selector.currentIndexChanged.connect(self.plot)
+        self.step_selector.valueChanged.connect(self.step_changed)
+
+    def steps(self) -> List[int]:
+        step = self.step_selector.value()
+        return [step] if step else []
+
+    def set_monitor(self, monitor: Optional[SpcMonitor], data_key: Optional[tuple] = None):
+        """
+        Show the charts of a monitor
+        Args:
+            monitor (SpcMonitor, optional): charts to show
+            data_key (tuple, optional): identifies the monitored data (reference, measurements):
+                charts already rendered for the same key are served from the render cache
+        """
+        self.monitor = monitor
+        self.data_key = data_key
+        metric, channel = self.metric_selector.currentText(), self.channel_selector.currentText()
+        for selector, items, current in (
+            (self.metric_selector, monitor.metrics if monitor else [], metric),
+            (self.channel_selector, sorted({ch for _, ch in monitor.charts}) if monitor else [], channel),
+        ):
+            selector.blockSignals(True)
+            selector.clear()
+            selector.addItems(items)
+            if current in items:
+                selector.setCurrentText(current)
+            selector.blockSignals(False)
+
+        self.alarm_list.clear()
+        if monitor:
+            self.alarm_list.addItems([str(alarm) for alarm in monitor.alarms])
+        self.plot()
+
+    def add_alarms(self, alarms: List[SpcAlarm]):
+        """
+        Show alarms raised by new measurements
+        """
+        self.alarm_list.addItems([str(alarm) for alarm in alarms])
+        self.alarm_list.scrollToBottom()
+        # the charts now hold measurements the key does not describe
+        self.data_key = None
+        self.plot()
+
+    def plot(self):
+        key = (self.metric_selector.currentText(), self.channel_selector.currentText())
+        chart = self.monitor.charts.get(key) if self.monitor else None
+        if chart is None or not chart.points:
+            self.canvas.draw_plot(("empty",), self.ax.clear)
+            return
+        self.canvas.draw_plot(self.data_key + key if self.data_key else None, lambda: self._build_chart(chart, key))
+
+    def _build_chart(self, chart: ControlChart, key: tuple):
+        self.ax.clear()
+        points = chart.points
+        x = list(range(1, len(points) + 1))
+        limit = lambda values: [float("nan") if v is None else v for v in values]
+        self.ax.plot(x, [p.value for p in points], marker=".", color="black", label="Écart à la réf.")
+        self.ax.plot(x, [p.ewma for p in points], color="tab:blue", label="EWMA")
+        self.ax.plot(x, limit([p.ucl for p in points]), linestyle="--", color="red", label="Limites")
+        self.ax.plot(x, limit([p.lcl for p in points]), linestyle="--", color="red")
+        self.ax.plot(x, limit([p.ewma_ucl for p in points]), linestyle=":", color="tab:blue", label="Limites EWMA")
+        self.ax.plot(x, limit([p.ewma_lcl for p in points]), linestyle=":", color="tab:blue")
+        self.ax.axhline(0.0, color="grey", linewidth=0.8)
+
+        alarms = [(i, p.value) for i, p in zip(x, points) if p.alarms]
+        if alarms:
+            self.ax.scatter(*zip(*alarms), color="red", zorder=3, label="Alarmes")
+
+        self.ax.set_title(f"Contrôle {key[0]} {key[1]}")
+        self.ax.set_xlabel("Mesure")
+        self.ax.grid(True, linestyle="--", linewidth=0.5, alpha=0.2)
+        self.ax.legend()
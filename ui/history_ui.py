@@ -2,20 +2,42 @@ import os
 from datetime import datetime
 from pathlib import Path
 from PySide6.QtWidgets import (
-    QWidget, QVBoxLayout, QTreeWidget, QTreeWidgetItem, QLineEdit,
-    QComboBox, QLabel, QSplitter, QTabWidget
+    QWidget, QVBoxLayout, QHBoxLayout, QTreeView, QLineEdit,
+    QComboBox, QLabel, QSplitter, QTabWidget, QProgressBar, QPushButton
 )
-from PySide6.QtCore import Qt, QDate
-from constants import MEASURES_PATH
-from model.measurement_set import load_measurement_file
+from PySide6.QtCore import Qt
+from constants import COLOR_SET, MEASURES_PATH
+from model.measurement_set import MEASUREMENT_CACHE, get_measurement
+from lib.catalog import get_catalog
+from lib.measures_watcher import MeasuresWatcher
+from lib.downsampling import choose_granularity, downsample
 from lib.history_analyzer import HistoryAnalyzer
-from lib.gamma import GammaAnalyzer
+from lib.spc import SpcMonitor
 from ui.history_gamma_plot import HistoryGammaPlot
-from utils.plot_utils import draw_curve_graph
+from ui.history_spc_plot import HistorySpcPlot
+from ui.measures_model import MeasuresFilterProxy, MeasuresModel
+
+MIN_PLOT_POINTS = 100
+STRING_AXIS_MAX_POINTS = 30  # below, one labelled tick per measurement
+GRANULARITIES = (("Auto", None), ("Mesures", "measure"), ("Jour", "day"), ("Semaine", "week"), ("Mois", "month"))
+
+
+def files_key(paths) -> int:
+    """
+    Hash of a set of files and of their mtime/size: changes when a file is added, removed or edited
+    """
+    stats = []
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+            stats.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            stats.append((path, None, None))
+    return hash(tuple(stats))
 
 
 class HistoryWidget(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, watcher=None, parent=None):
         super().__init__(parent)
 
         # Splitter horizontal : gauche (courbes), droite (fichiers)
@@ -27,6 +49,12 @@ class HistoryWidget(QWidget):
         self.tabs = QTabWidget()
         self.gamma_plot = HistoryGammaPlot()
         self.tabs.addTab(self.gamma_plot, "Gammas")
+        # cartes de contrôle, mises à jour à chaque nouvelle mesure
+        self.spc_plot = HistorySpcPlot()
+        self.tabs.addTab(self.spc_plot, "Contrôle")
+        self.analyzer = None
+        self.spc_monitor = None
+        self.plot_key = None  # (reference, selection) of the plotted data, for the render caches
         splitter.addWidget(self.tabs)
 
         # --- Sélection des fichiers ---
@@ -44,169 +72,271 @@ class HistoryWidget(QWidget):
         self.search_input.textChanged.connect(self.filter_files)
 
         self.date_filter = QComboBox()
-        self.date_filter.addItems(["Toutes dates", "Aujourd’hui", "Ce mois-ci", "Cette année"])
+        self.date_filter.addItems(MeasuresFilterProxy.PERIODS)
         self.date_filter.currentIndexChanged.connect(self.filter_files)
 
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabels(["Nom"])
-        self.tree.setColumnCount(1)
+        # regroupement des mesures sur les longues périodes
+        self.granularity_selector = QComboBox()
+        for label, granularity in GRANULARITIES:
+            self.granularity_selector.addItem(label, granularity)
+        self.granularity_selector.setToolTip("Regroupement des mesures (moyenne, bande min/max)")
+
+        # only the visible rows are created by the view
+        self.model = MeasuresModel(self)
+        self.proxy = MeasuresFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+        self.tree = QTreeView()
+        self.tree.setModel(self.proxy)
+        self.tree.setUniformRowHeights(True)
         self.tree.setRootIsDecorated(True)
+        self.proxy.rowsInserted.connect(self._expand_folders)
+        self.proxy.modelReset.connect(self.tree.expandAll)
+        self.proxy.layoutChanged.connect(self.tree.expandAll)
 
         right_layout.addWidget(QLabel("Filtres"))
         right_layout.addWidget(self.search_input)
         right_layout.addWidget(self.date_filter)
+        right_layout.addWidget(QLabel("Regroupement"))
+        right_layout.addWidget(self.granularity_selector)
+        # background indexing progress
+        self.scan_progress = QProgressBar()
+        self.scan_progress.setTextVisible(True)
+        self.scan_cancel_btn = QPushButton("Annuler")
+        self.scan_cancel_btn.setToolTip("Interrompre l'indexation des mesures")
+        scan_layout = QHBoxLayout()
+        scan_layout.addWidget(self.scan_progress)
+        scan_layout.addWidget(self.scan_cancel_btn)
+        self.scan_widget = QWidget()
+        self.scan_widget.setLayout(scan_layout)
+        self.scan_widget.setVisible(False)
+
         right_layout.addWidget(QLabel("Mesures disponibles"))
+        right_layout.addWidget(self.scan_widget)
         right_layout.addWidget(self.tree)
 
         splitter.addWidget(right_panel)
         splitter.setStretchFactor(0, 3)
         splitter.setStretchFactor(1, 1)
 
+        self.watcher = watcher if watcher is not None else MeasuresWatcher(parent=self)
+        self.watcher.files_added.connect(self.on_files_changed)
+        self.watcher.files_added.connect(self.on_files_added)
+        self.watcher.files_modified.connect(self.on_files_changed)
+        self.watcher.files_removed.connect(self.on_files_removed)
+        self.watcher.scan_entries.connect(self.add_entries)
+        self.watcher.scan_started.connect(self.on_scan_started)
+        self.watcher.scan_progress.connect(self.on_scan_progress)
+        self.watcher.scan_finished.connect(self.on_scan_finished)
+        self.scan_cancel_btn.clicked.connect(self.watcher.cancel_scan)
+
         self.load_files()
         self.load_reference_files()
 
         self.ref_selector.currentIndexChanged.connect(self.refresh_plot)
-        self.tree.itemChanged.connect(self.refresh_plot)
+        self.model.checked_changed.connect(self.refresh_plot)
+        self.spc_plot.step_changed.connect(self.update_spc)
+        self.granularity_selector.currentIndexChanged.connect(self.refresh_plot)
 
     def load_files(self):
-        self.tree.clear()
-        for root, dirs, files in os.walk(MEASURES_PATH):
-            folder_item = QTreeWidgetItem([os.path.basename(root)])
-            added = False
-            for fname in sorted(files):
-                if fname.endswith(".json"):
-                    fpath = os.path.join(root, fname)
-                    measurement = load_measurement_file(Path(fpath))
-                    if not measurement:
-                        continue
-                    name = measurement.name or Path(fpath).stem
-                    channels = ", ".join(measurement.curves.keys())
-                    date_str = measurement.json_date or measurement.date.strftime("%Y-%m-%d")
-                    label = f"{name} [{channels}] - {date_str}"
-                    item = QTreeWidgetItem([label])
-                    item.setData(0, Qt.UserRole, str(fpath))
-                    item.setCheckState(0, Qt.Unchecked)
-                    folder_item.addChild(item)
-                    added = True
-            if added:
-                self.tree.addTopLevelItem(folder_item)
-                folder_item.setExpanded(True)
+        """
+        Rebuild the file tree. Files are indexed in the background and
+        added to the tree by batches.
+        """
+        self.model.clear()
+        self.watcher.scan()
+
+    def on_scan_started(self):
+        self.scan_progress.setRange(0, 0)
+        self.scan_progress.setFormat("Indexation...")
+        self.scan_widget.setVisible(True)
+
+    def on_scan_progress(self, done, total):
+        self.scan_progress.setRange(0, total)
+        self.scan_progress.setValue(done)
+        self.scan_progress.setFormat("Indexation %v / %m")
+
+    def on_scan_finished(self, completed):
+        self.scan_widget.setVisible(False)
+
+    def add_entries(self, entries):
+        """
+        Insert or update the files of catalog entries
+        Returns:
+            bool: a checked file was modified or removed
+        """
+        return self.model.add_entries(entries)
+
+    def _expand_folders(self, parent, first, last):
+        if not parent.isValid():
+            for row in range(first, last + 1):
+                self.tree.expand(self.proxy.index(row, 0))
+
+    def on_files_changed(self, rel_paths):
+        """
+        Insert or update files added or modified on disk
+        """
+        needs_refresh = self.add_entries(get_catalog().get_many(rel_paths))
+
+        if any(os.path.dirname(p) == "ref" for p in rel_paths):
+            self.load_reference_files()
+        if needs_refresh:
+            self.refresh_plot()
+
+    def on_files_added(self, rel_paths):
+        """
+        New measurements of the monitored folders (holding checked files) join the selection:
+        they are appended to the analysis and to the control charts without reloading the
+        history, alarms are shown as soon as a file is saved.
+        """
+        if self.analyzer is None or self.watcher.is_scanning():
+            return
+        folders = self.model.checked_folders() - {"ref"}
+        paths = [os.path.join(MEASURES_PATH, p) for p in rel_paths if (os.path.dirname(p) or ".") in folders]
+        measures = sorted((m for m in MEASUREMENT_CACHE.get_many(paths) if m is not None), key=lambda m: m.date)
+        if not measures:
+            return
+
+        # checked without checked_changed, which would reload the whole history
+        self.model.check_paths([str(m.path) for m in measures])
+        in_order = measures[0].date >= self.analyzer.get_dates()[-1]
+        for m in measures:
+            self.analyzer.append(m)
+        self.plot_key = (self.plot_key[0], files_key(self.get_selected_files()))
+
+        if in_order:
+            alarms = []
+            for m in measures:
+                alarms += self.spc_monitor.add(m)
+            self.spc_plot.add_alarms(alarms)
+            for alarm in alarms:
+                print(f"Alarme SPC : {alarm}")
+        else:
+            # older measurements are inserted at their date, the charts are rebuilt
+            self.update_spc()
+        self.draw_gamma()
+
+    def update_spc(self):
+        """
+        Rebuild the control charts from the analyzed measurements
+        """
+        if self.analyzer is None:
+            return
+        self.spc_monitor = SpcMonitor.from_analyzer(self.analyzer, steps=self.spc_plot.steps())
+        self.spc_plot.set_monitor(self.spc_monitor, self.plot_key)
+
+    def on_files_removed(self, rel_paths):
+        """
+        Remove files deleted from disk
+        """
+        needs_refresh = self.model.remove_paths([os.path.join(MEASURES_PATH, p) for p in rel_paths])
+
+        if any(os.path.dirname(p) == "ref" for p in rel_paths):
+            self.load_reference_files()
+        if needs_refresh:
+            self.refresh_plot()
 
     def filter_files(self):
-        text = self.search_input.text().lower()
-        period = self.date_filter.currentText()
-        now = QDate.currentDate()
-
-        for i in range(self.tree.topLevelItemCount()):
-            folder_item = self.tree.topLevelItem(i)
-            visible = False
-            for j in range(folder_item.childCount()):
-                child = folder_item.child(j)
-                label = child.text(0).lower()
-                m = load_measurement_file(Path(child.data(0, Qt.UserRole)))
-                if not m:
-                    continue
-                json_date = m.json_date or m.date.strftime("%Y-%m-%d")
-                fdate = QDate.fromString(json_date, "yyyy-MM-dd")
-
-                match_text = text in label
-                match_date = True
-                if period == "Aujourd’hui":
-                    match_date = (fdate == now)
-                elif period == "Ce mois-ci":
-                    match_date = (fdate.month() == now.month() and fdate.year() == now.year())
-                elif period == "Cette année":
-                    match_date = (fdate.year() == now.year())
-
-                is_match = match_text and match_date
-                child.setHidden(not is_match)
-                visible = visible or is_match
-            folder_item.setHidden(not visible)
+        self.proxy.set_filter(self.search_input.text(), self.date_filter.currentText())
+        self.tree.expandAll()
 
     def get_selected_files(self):
-        selected = []
-        for i in range(self.tree.topLevelItemCount()):
-            folder_item = self.tree.topLevelItem(i)
-            for j in range(folder_item.childCount()):
-                child = folder_item.child(j)
-                if child.checkState(0) == Qt.Checked:
-                    selected.append(child.data(0, Qt.UserRole))
-        return selected
+        return self.model.checked_paths()
 
     def load_reference_files(self):
+        # keep the current reference selected when the list is reloaded
+        current = self.ref_selector.currentData()
+        self.ref_selector.blockSignals(True)
         self.ref_selector.clear()
         ref_path = os.path.join(MEASURES_PATH, "ref")
-        if not os.path.exists(ref_path):
-            return
+        if os.path.exists(ref_path):
+            for fname in sorted(os.listdir(ref_path)):
+                if fname.endswith(".json"):
+                    fpath = os.path.join(ref_path, fname)
+                    self.ref_selector.addItem(fname, fpath)
+        if current is not None:
+            self.ref_selector.setCurrentIndex(self.ref_selector.findData(current))
+        self.ref_selector.blockSignals(False)
 
-        for fname in sorted(os.listdir(ref_path)):
-            if fname.endswith(".json"):
-                fpath = os.path.join(ref_path, fname)
-                self.ref_selector.addItem(fname, fpath)
+        if current is not None and self.ref_selector.currentData() != current:
+            self.ref_selector.currentIndexChanged.emit(self.ref_selector.currentIndex())
 
     def get_reference_file(self):
         return self.ref_selector.currentData()
 
     def refresh_plot(self):
+        self.analyzer = self.spc_monitor = self.plot_key = None
+        self.spc_plot.set_monitor(None)
         ref_path = self.get_reference_file()
         if not ref_path:
             print("no ref path found")
             return
 
-        ref = load_measurement_file(Path(ref_path))
+        ref = get_measurement(ref_path)
         if not ref:
             print("no file found: ", ref_path)
             return
 
         selected_paths = self.get_selected_files()
-        measures = [load_measurement_file(Path(p)) for p in selected_paths]
+        measures = MEASUREMENT_CACHE.get_many(selected_paths)
         measures = [m for m in measures if m is not None]
         if not measures:
             print(f"no measures found in: {selected_paths}")
             return
 
-        analyzer = HistoryAnalyzer(ref, measures)
-        gamma_data = analyzer.get_gamma_evolution()
+        self.analyzer = HistoryAnalyzer(ref, measures, catalog=get_catalog())
+        # toggling back to a selection already shown is served from the render caches
+        self.plot_key = (files_key([ref_path]), files_key(selected_paths))
+        self.update_spc()
+        self.draw_gamma()
 
-        gamma_ref = {}
-        gamma_tool = GammaAnalyzer()
-        for ch, curve in ref.curves.items():
-            try:
-                reading = gamma_tool.get_gamma_from_values(curve.values)
-                gamma_ref[ch] = reading.gamma
-            except Exception as e:
-                print(f"error computing gamma for ref {ch}: {e}")
+    def draw_gamma(self):
+        """
+        Draw the gamma evolution of the analyzed measurements
+        """
+        analyzer = self.analyzer
+        gamma_data = analyzer.get_gamma_evolution()
+        gamma_ref = analyzer.get_reference_gamma()
 
-        dates = [m.date for m in measures]
+        dates = analyzer.get_dates()
+        # at most one point per pixel: long histories are grouped by day/week/month
+        max_points = max(MIN_PLOT_POINTS, self.gamma_plot.canvas.width())
+        granularity = self.granularity_selector.currentData() or choose_granularity(dates, max_points)
+        str_axis = granularity == "measure" and len(dates) <= STRING_AXIS_MAX_POINTS
         str_dates = [d.strftime("%Y-%m-%d") for d in dates]
 
         # Préparation des courbes pour draw_curve_graph
+        colors = {}
+        for channel_set in COLOR_SET.values():
+            for ch in channel_set.order:
+                colors.setdefault(ch.upper(), channel_set.get_color_name(ch))
         curves = {}
         for ch, values in gamma_data.items():
-            curves[ch] = {
-                "x": str_dates,
-                "y": values,
-                "color": {"R": "red", "G": "green", "B": "blue"}.get(ch, None),
-                "linestyle": "-"
-            }
+            if str_axis:
+                curves[ch] = {"x": str_dates, "y": values}
+            else:
+                series = downsample(dates, values, max_points, granularity)
+                curves[ch] = {"x": series.dates, "y": series.values}
+                if series.low is not None:
+                    curves[ch]["band"] = (series.low, series.high)
+            curves[ch].update({"color": colors.get(ch), "linestyle": "-"})
         for ch, val in gamma_ref.items():
+            x = str_dates if str_axis else [dates[0], dates[-1]]
             curves[f"Réf {ch}"] = {
-                "x": str_dates,
-                "y": [val] * len(str_dates),
-                "color": {"R": "red", "G": "green", "B": "blue"}.get(ch, None),
+                "x": x,
+                "y": [val] * len(x),
+                "color": colors.get(ch),
                 "linestyle": "--"
             }
 
-        draw_curve_graph(
-            ax=self.gamma_plot.ax,
-            canvas=self.gamma_plot.canvas,
-            curves=curves,
+        self.gamma_plot.draw_curves(
+            self.plot_key + ("gamma", granularity),
+            curves,
             title="Évolution des gammas",
             xlabel="Date",
             ylabel="Gamma",
             nb_x_ticks=len(str_dates)
         )
 
-        print("Measures:", len(measures))
-        print("Channels:", list(ref.curves.keys()))
-        print("Dates:", dates)
+        print("Measures:", len(analyzer.measurements))
+        print("Channels:", list(analyzer.reference.curves.keys()))
+        print("Dates:", dates[0], "-", dates[-1])
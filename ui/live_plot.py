@@ -0,0 +1,185 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+from PySide6.QtCore import QPointF, QRectF, Qt
+from PySide6.QtGui import QColor, QFontMetrics, QPainter, QPainterPath, QPen
+from PySide6.QtWidgets import QSizePolicy, QWidget
+
+from utils.plot_utils import y_axis_layout
+
+MARGINS = (62, 28, 16, 44)  # left, top, right, bottom (pixels)
+MARKER_RADIUS = 2.0
+CURVE_ALPHA = 0.8
+
+
+def axis_ticks(low: float, high: float, step: float) -> List[float]:
+    """ Multiples of step between low and high """
+    first = math.ceil(low / step - 1e-9)
+    last = math.floor(high / step + 1e-9)
+    return [k * step for k in range(first, last + 1)]
+
+
+class LiveCurvePlot(QWidget):
+    """
+    Native Qt version of draw_curve_graph for the numeric 21 step graphs updated during
+    acquisition: same curves dict, y limits and ticks (y_axis_layout) and guide lines, painted
+    with QPainter. Much lighter than a matplotlib canvas; matplotlib stays in use for the
+    detailed view and the export.
+    Args:
+        title (str): Plot title.
+        xlabel (str): X-axis label.
+        ylabel (str): Y-axis label.
+        show_legend (bool): Whether to show the legend.
+        nb_x_ticks (int): number of x-axis ticks.
+        allow_negative (bool): allow negative ticks
+        vlines (list[float]): x of the vertical guide lines
+    """
+    def __init__(self, title: str = "", xlabel: str = "X", ylabel: str = "Y", show_legend: bool = True,
+                 nb_x_ticks: int = 21, allow_negative: bool = False, vlines=(), parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.show_legend = show_legend
+        self.nb_x_ticks = nb_x_ticks
+        self.allow_negative = allow_negative
+        self.vlines = list(vlines)
+        self.curves: Dict[str, dict] = {}
+        self.layout_y: Optional[Tuple[float, float, float]] = None
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+
+    def set_curves(self, curves: dict):
+        """
+        Show curves, same format as draw_curve_graph: Dict[label] = {"y": [...], "x": [...], "color": "red", "linestyle": "-"}
+        """
+        self.curves = {label: data for label, data in curves.items()
+                       if any(y is not None for y in data.get("y", []))}
+        present = [y for data in self.curves.values() for y in data["y"] if y is not None]
+        self.layout_y = y_axis_layout(min(present), max(present), self.allow_negative) if present else None
+        self.update()
+
+    def _plot_rect(self) -> QRectF:
+        left, top, right, bottom = MARGINS
+        return QRectF(left, top, max(1, self.width() - left - right), max(1, self.height() - top - bottom))
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.fillRect(self.rect(), Qt.GlobalColor.white)
+        rect = self._plot_rect()
+        metrics = QFontMetrics(self.font())
+
+        low, high, step = self.layout_y or (0.0, 1.0, 0.1)
+        x_first, x_last = 1, max(2, self.nb_x_ticks)
+        to_x = lambda x: rect.left() + (x - x_first) / (x_last - x_first) * rect.width()
+        to_y = lambda y: rect.bottom() - (y - low) / (high - low) * rect.height()
+
+        # grid, ticks and tick labels
+        grid_pen = QPen(QColor(0, 0, 0, 50), 0.5, Qt.PenStyle.DashLine)
+        tick_pen = QPen(Qt.GlobalColor.black, 1.0)
+        minor_pen = QPen(QColor("#999"), 0.5)
+        for y in axis_ticks(low, high, step / 10):
+            painter.setPen(minor_pen)
+            painter.drawLine(QPointF(rect.left() - 3, to_y(y)), QPointF(rect.left(), to_y(y)))
+        for y in axis_ticks(low, high, step):
+            py = to_y(y)
+            painter.setPen(grid_pen)
+            painter.drawLine(QPointF(rect.left(), py), QPointF(rect.right(), py))
+            painter.setPen(tick_pen)
+            painter.drawLine(QPointF(rect.left() - 6, py), QPointF(rect.left(), py))
+            label = f"{y:.2f}"
+            painter.drawText(QPointF(rect.left() - 8 - metrics.horizontalAdvance(label), py + metrics.ascent() / 2 - 1), label)
+        for x in range(x_first, x_last + 1):
+            px = to_x(x)
+            painter.setPen(grid_pen)
+            painter.drawLine(QPointF(px, rect.top()), QPointF(px, rect.bottom()))
+            painter.setPen(tick_pen)
+            painter.drawLine(QPointF(px, rect.bottom()), QPointF(px, rect.bottom() + 6))
+            label = str(x)
+            painter.drawText(QPointF(px - metrics.horizontalAdvance(label) / 2, rect.bottom() + 8 + metrics.ascent()), label)
+
+        painter.setPen(QPen(QColor(0, 0, 0, 51), 1.0, Qt.PenStyle.DashLine))
+        for x in self.vlines:
+            painter.drawLine(QPointF(to_x(x), rect.top()), QPointF(to_x(x), rect.bottom()))
+
+        painter.setPen(tick_pen)
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.drawRect(rect)
+
+        # titles
+        painter.drawText(QRectF(rect.left(), 0, rect.width(), rect.top()), Qt.AlignmentFlag.AlignCenter, self.title)
+        painter.drawText(QRectF(rect.left(), self.height() - metrics.height() - 2, rect.width(), metrics.height()),
+                         Qt.AlignmentFlag.AlignCenter, self.xlabel)
+        painter.save()
+        painter.translate(metrics.height() / 2 + 2, rect.center().y())
+        painter.rotate(-90)
+        painter.drawText(QRectF(-rect.height() / 2, -metrics.height() / 2, rect.height(), metrics.height()),
+                         Qt.AlignmentFlag.AlignCenter, self.ylabel)
+        painter.restore()
+
+        if not self.curves:
+            painter.end()
+            return
+
+        # curves, None values leave a gap
+        painter.setClipRect(rect)
+        for data in self.curves.values():
+            y_vals = data["y"]
+            x_vals = data.get("x", [i + 1 for i in range(len(y_vals))])
+            color = QColor(data.get("color") or "black")
+            color.setAlphaF(CURVE_ALPHA)
+            pen = QPen(color, 1.5)
+            if data.get("linestyle", "-") == "--":
+                pen.setStyle(Qt.PenStyle.DashLine)
+            path = QPainterPath()
+            points = []
+            drawing = False
+            for x, y in zip(x_vals, y_vals):
+                if y is None:
+                    drawing = False
+                    continue
+                point = QPointF(to_x(x), to_y(y))
+                if drawing:
+                    path.lineTo(point)
+                else:
+                    path.moveTo(point)
+                drawing = True
+                points.append(point)
+            painter.setPen(pen)
+            painter.setBrush(Qt.BrushStyle.NoBrush)
+            painter.drawPath(path)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(color)
+            for point in points:
+                painter.drawEllipse(point, MARKER_RADIUS, MARKER_RADIUS)
+        painter.setClipping(False)
+
+        if self.show_legend:
+            self._paint_legend(painter, rect, metrics)
+        painter.end()
+
+    def _paint_legend(self, painter: QPainter, rect: QRectF, metrics: QFontMetrics):
+        labels = list(self.curves)
+        sample = 24
+        row = metrics.height() + 2
+        width = sample + 12 + max(metrics.horizontalAdvance(label) for label in labels)
+        box = QRectF(rect.left() + 8, rect.top() + 8, width, row * len(labels) + 6)
+        painter.setPen(QPen(QColor("#ccc"), 1.0))
+        painter.setBrush(QColor(255, 255, 255, 220))
+        painter.drawRoundedRect(box, 3, 3)
+        for i, (label, data) in enumerate(self.curves.items()):
+            y = box.top() + 3 + row * i + row / 2
+            color = QColor(data.get("color") or "black")
+            color.setAlphaF(CURVE_ALPHA)
+            pen = QPen(color, 1.5)
+            if data.get("linestyle", "-") == "--":
+                pen.setStyle(Qt.PenStyle.DashLine)
+            painter.setPen(pen)
+            painter.drawLine(QPointF(box.left() + 4, y), QPointF(box.left() + 4 + sample, y))
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(color)
+            painter.drawEllipse(QPointF(box.left() + 4 + sample / 2, y), MARKER_RADIUS, MARKER_RADIUS)
+            painter.setBrush(Qt.BrushStyle.NoBrush)
+            painter.setPen(Qt.GlobalColor.black)
+            painter.drawText(QPointF(box.left() + sample + 10, y + metrics.ascent() / 2 - 1), label)
@@ -4,7 +4,7 @@ import subprocess
 import warnings
 
 from PySide6.QtGui import QAction, QIcon
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QObject, QRunnable, QThreadPool, Signal
 from PySide6.QtWidgets import (
     QMainWindow, QTabWidget, QWidget, QVBoxLayout, QTabBar, QFileDialog,
 )
@@ -14,9 +14,44 @@ from ui.communications_ui import CommunicationWidget
 from ui.history_ui import HistoryWidget
 
 from lib.communications import DensitometerReader
+from lib.measures_watcher import MeasuresWatcher
+from lib.drift import DriftDetector
+from lib.report import ReportOptions, write_pdf_report
+from utils.parallel import make_executor
 from constants import MEASURES_PATH, ICON_PATH
 
 
+class ReportSignals(QObject):
+    finished = Signal(str, int, int)  # pdf path, pages written, files
+
+
+class ReportWorker(QRunnable):
+    """
+    Background PDF report of measurement files. The pages are rendered by the process pool
+    given by the main thread, and one by one in this thread without it.
+    The worker writes the PDF and shuts the pool down.
+    """
+    def __init__(self, paths: list[str], output: str, options: ReportOptions, executor=None):
+        super().__init__()
+        self.paths = paths
+        self.output = output
+        self.options = options
+        self.executor = executor
+        self.signals = ReportSignals()
+
+    def run(self):
+        done = 0
+        try:
+            pages = write_pdf_report(self.paths, self.output, self.options, executor=self.executor)
+            done = sum(page.png is not None for page in pages)
+        except Exception as e:
+            print(f"Report error : {e}")
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(cancel_futures=True)
+        self.signals.finished.emit(self.output, done, len(self.paths))
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -46,6 +81,10 @@ class MainWindow(QMainWindow):
         file_menu.addAction(open_meas_folder_action)
         open_meas_folder_action.setShortcut("Ctrl+alt+O")
         open_meas_folder_action.triggered.connect(lambda: self.open_folder(MEASURES_PATH))
+        # File > PDF report
+        report_action = QAction("Rapport PDF...", self)
+        file_menu.addAction(report_action)
+        report_action.triggered.connect(self.export_report)
         # File > Separator
         file_menu.addSeparator()
         # File > Quit
@@ -88,6 +127,10 @@ class MainWindow(QMainWindow):
         about_action.triggered.connect(self.show_about_dialog)
 
         self.reader = DensitometerReader()
+        self.watcher = MeasuresWatcher(parent=self)
+        # dérive des nouvelles mesures par rapport à la référence de l'historique
+        self.drift_detector = DriftDetector(watcher=self.watcher, parent=self)
+        self.drift_detector.drift_detected.connect(lambda alert: self.statusBar().showMessage(f"Dérive : {alert}", 15000))
         self.setWindowTitle("X-Rite 310 - Densitomètre")
         self.setMinimumSize(1200, 600)
 
@@ -108,8 +151,12 @@ class MainWindow(QMainWindow):
         self.tabs.tabBar().setTabButton(0, QTabBar.ButtonPosition.RightSide, None)
 
         #History tab
-        self.file_tab = HistoryWidget()
+        self.file_tab = HistoryWidget(watcher=self.watcher)
         self.tabs.addTab(self.file_tab, "Historic")
+        self.file_tab.ref_selector.currentIndexChanged.connect(
+            lambda: self.drift_detector.set_reference(self.file_tab.get_reference_file())
+        )
+        self.drift_detector.set_reference(self.file_tab.get_reference_file())
 
         # "+" tab at the end
         self.plus_tab = QWidget()
@@ -132,7 +179,8 @@ class MainWindow(QMainWindow):
 
 # Tab handlers
     def add_new_curve_tab(self, title="Sensito"):
-        widget = CurveWidget(reader=self.reader, tabs=self.tabs)
+        widget = CurveWidget(reader=self.reader, tabs=self.tabs, watcher=self.watcher)
+        widget.step_received.connect(self.drift_detector.check_step)
         self.curve_widgets.append(widget)
 
         index = self.tabs.count() - 1  # Insert before "+"
@@ -225,6 +273,31 @@ class MainWindow(QMainWindow):
 
         current_widget.export_meas_file()
 
+    def export_report(self):
+        """
+        PDF report of selected measurement files, against the reference of the history tab
+        """
+        paths, _ = QFileDialog.getOpenFileNames(self, "Fichiers du rapport", MEASURES_PATH, "Fichiers JSON (*.json)")
+        if not paths:
+            return
+        output, _ = QFileDialog.getSaveFileName(
+            self, "Enregistrer le rapport", os.path.join(MEASURES_PATH, "rapport.pdf"), "Fichiers PDF (*.pdf)"
+        )
+        if not output:
+            return
+        if not output.lower().endswith(".pdf"):
+            output += ".pdf"
+
+        # the process pool is created here, a worker thread can not start one
+        executor = make_executor(len(paths), use_processes=True)
+        worker = ReportWorker(paths, output, ReportOptions(reference=self.file_tab.get_reference_file()), executor)
+        worker.signals.finished.connect(
+            lambda path, done, total: self.statusBar().showMessage(f"Rapport : {done}/{total} pages -> {path}", 15000)
+        )
+        self._report_worker = worker
+        self.statusBar().showMessage(f"Rapport de {len(paths)} fichiers en cours...")
+        QThreadPool.globalInstance().start(worker)
+
     def clear_measures(self):
         current_widget = self.tabs.currentWidget()
         if not isinstance(current_widget, CurveWidget):
@@ -0,0 +1,471 @@
+# ui/measures_model.py
+
+import os
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from datetime import date
+from typing import Dict, List, Optional, Set, Tuple
+
+from PySide6.QtCore import QAbstractItemModel, QModelIndex, QSortFilterProxyModel, Qt, Signal
+
+from constants import MEASURES_PATH
+from lib.history_index import DateIndex, NgramIndex, parse_date, period_range
+
+PATH_ROLE = Qt.ItemDataRole.UserRole        # abs path of a file, relative folder of a folder
+DATE_ROLE = Qt.ItemDataRole.UserRole + 1    # "yyyy-MM-dd" date of a file
+
+# internalId of folder indexes; file indexes carry their folder id + 1
+_FOLDER_ID = 0
+
+
+class _Folder:
+    """
+    Children of a folder row: file slots sorted by file name
+    """
+    __slots__ = ("id", "folder", "label", "names", "slots")
+
+    def __init__(self, folder_id: int, folder: str):
+        self.id = folder_id
+        self.folder = folder
+        self.label = os.path.basename(os.path.normpath(os.path.join(MEASURES_PATH, folder)))
+        self.names: List[str] = []
+        self.slots: List[int] = []
+
+
+def _folder_key(folder: str) -> tuple:
+    return folder != ".", folder.lower()
+
+
+class MeasuresModel(QAbstractItemModel):
+    """
+    Two levels model (folders, then files) of the indexed measurement files.
+    File data lives in flat lists indexed by slot and check states in a bytearray,
+    so views only create what they display. Labels and dates are indexed for filtering.
+    """
+    checked_changed = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._folders: List[_Folder] = []          # display order
+        self._folder_by_name: Dict[str, _Folder] = {}
+        self._folder_by_id: Dict[int, _Folder] = {}
+        self._next_folder_id = 1
+
+        # per file slot
+        self._paths: List[Optional[str]] = []
+        self._labels: List[str] = []
+        self._dates: List[str] = []
+        self._folder_of: List[int] = []
+        self._checked = bytearray()
+        self._stamps: List[int] = []    # update counter value of the last slot change
+        self._free: List[int] = []
+        self._slot_by_path: Dict[str, int] = {}
+        self._clock = 0
+
+        self.date_index = DateIndex()
+        # built on the first text search, so scans do not pay for it
+        self.text_index = NgramIndex(self._search_text)
+        self._text_indexed = False
+
+
+    # --- QAbstractItemModel ---
+
+    def index(self, row, column=0, parent=QModelIndex()):
+        if column != 0 or row < 0:
+            return QModelIndex()
+        if not parent.isValid():
+            if row < len(self._folders):
+                return self.createIndex(row, 0, _FOLDER_ID)
+            return QModelIndex()
+        if parent.internalId() != _FOLDER_ID:
+            return QModelIndex()
+        folder = self._folders[parent.row()]
+        if row < len(folder.slots):
+            return self.createIndex(row, 0, folder.id + 1)
+        return QModelIndex()
+
+    def parent(self, index=QModelIndex()):
+        if not index.isValid() or index.internalId() == _FOLDER_ID:
+            return QModelIndex()
+        folder = self._folder_by_id[index.internalId() - 1]
+        return self.createIndex(self._folders.index(folder), 0, _FOLDER_ID)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self._folders)
+        if parent.internalId() == _FOLDER_ID:
+            return len(self._folders[parent.row()].slots)
+        return 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return "Nom"
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        if index.internalId() == _FOLDER_ID:
+            return Qt.ItemFlag.ItemIsEnabled
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsUserCheckable
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if index.internalId() == _FOLDER_ID:
+            folder = self._folders[index.row()]
+            if role == Qt.ItemDataRole.DisplayRole:
+                return folder.label
+            if role == PATH_ROLE:
+                return folder.folder
+            return None
+
+        slot = self.slot(index)
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._labels[slot]
+        if role == Qt.ItemDataRole.CheckStateRole:
+            return Qt.CheckState.Checked if self._checked[slot] else Qt.CheckState.Unchecked
+        if role == PATH_ROLE:
+            return self._paths[slot]
+        if role == DATE_ROLE:
+            return self._dates[slot]
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.CheckStateRole or not index.isValid() or index.internalId() == _FOLDER_ID:
+            return False
+        checked = Qt.CheckState(value) == Qt.CheckState.Checked
+        slot = self.slot(index)
+        if bool(self._checked[slot]) == checked:
+            return True
+        self._checked[slot] = checked
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+        self.checked_changed.emit()
+        return True
+
+
+    # --- slots ---
+
+    def slot(self, index: QModelIndex) -> int:
+        """
+        File slot of a file index
+        """
+        return self._folder_by_id[index.internalId() - 1].slots[index.row()]
+
+    def slot_count(self) -> int:
+        return len(self._paths)
+
+    def slot_label(self, slot: int) -> Optional[str]:
+        return self._labels[slot] if self._paths[slot] is not None else None
+
+    def slot_date(self, slot: int) -> Optional[str]:
+        return self._dates[slot] if self._paths[slot] is not None else None
+
+    def slot_stamp(self, slot: int) -> int:
+        return self._stamps[slot]
+
+    @property
+    def stamp(self) -> int:
+        """
+        Update counter, slots changed after a filter was computed have a greater stamp
+        """
+        return self._clock
+
+    def _search_text(self, slot: int) -> Optional[str]:
+        return self._labels[slot].lower() if self._paths[slot] is not None else None
+
+    def matching_slots(self, text: str = "", date_range: Optional[Tuple[date, date]] = None) -> Optional[Set[int]]:
+        """
+        Slots whose label contains text and whose date is in date_range, using the indexes
+        Returns:
+            set[int], or None when nothing is filtered
+        """
+        if not text and date_range is None:
+            return None
+        if text and not self._text_indexed:
+            self._rebuild_text_index()
+        matches = self.text_index.search(text) if text else None
+        if date_range is not None:
+            dated = self.date_index.range(*date_range)
+            matches = set(dated) if matches is None else matches.intersection(dated)
+        return matches
+
+    def _rebuild_text_index(self):
+        self.text_index.rebuild((slot, self._search_text(slot)) for slot in self._slot_by_path.values())
+        self._text_indexed = True
+
+    def slot_matches(self, slot: int, text: str = "", date_range: Optional[Tuple[date, date]] = None) -> bool:
+        """
+        Same test as matching_slots for a single slot, without the indexes
+        """
+        if text and text.lower() not in self._labels[slot].lower():
+            return False
+        if date_range is not None:
+            day = parse_date(self._dates[slot])
+            return day is not None and date_range[0] <= day <= date_range[1]
+        return True
+
+    def slot_for_path(self, path: str) -> Optional[int]:
+        return self._slot_by_path.get(path)
+
+    def is_checked(self, path: str) -> bool:
+        slot = self._slot_by_path.get(path)
+        return slot is not None and bool(self._checked[slot])
+
+    def set_checked(self, path: str, checked: bool = True):
+        slot = self._slot_by_path.get(path)
+        if slot is not None:
+            self.setData(self._slot_index(slot), Qt.CheckState.Checked if checked else Qt.CheckState.Unchecked,
+                         Qt.ItemDataRole.CheckStateRole)
+
+    def check_paths(self, paths: List[str]):
+        """
+        Check files without emitting checked_changed, for files added to the current analysis
+        """
+        for path in paths:
+            slot = self._slot_by_path.get(path)
+            if slot is not None and not self._checked[slot]:
+                self._checked[slot] = 1
+                index = self._slot_index(slot)
+                self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+
+    def _slot_index(self, slot: int) -> QModelIndex:
+        folder = self._folder_by_id[self._folder_of[slot]]
+        row = self._child_row(folder, slot)
+        return self.createIndex(row, 0, folder.id + 1)
+
+    def _child_row(self, folder: _Folder, slot: int) -> int:
+        name = os.path.basename(self._paths[slot])
+        start = bisect_left(folder.names, name)
+        return folder.slots.index(slot, start)
+
+    def checked_folders(self) -> Set[str]:
+        """
+        Relative folders holding checked files
+        """
+        return {folder.folder for folder in self._folders if any(self._checked[slot] for slot in folder.slots)}
+
+    def checked_paths(self) -> List[str]:
+        """
+        Paths of the checked files, in display order
+        """
+        if not self._checked.count(1):
+            return []
+        return [
+            self._paths[slot]
+            for folder in self._folders
+            for slot in folder.slots
+            if self._checked[slot]
+        ]
+
+
+    # --- updates ---
+
+    def clear(self):
+        self.beginResetModel()
+        self._folders.clear()
+        self._folder_by_name.clear()
+        self._folder_by_id.clear()
+        self._paths.clear()
+        self._labels.clear()
+        self._dates.clear()
+        self._folder_of.clear()
+        self._checked = bytearray()
+        self._stamps.clear()
+        self._free.clear()
+        self._slot_by_path.clear()
+        self.date_index.clear()
+        self.text_index.clear()
+        self._text_indexed = False
+        self.endResetModel()
+
+    def add_entries(self, entries) -> bool:
+        """
+        Insert or update files from catalog entries. Entries with errors or without
+        curves are removed. Runs of new files are inserted with a single notification.
+        Args:
+            entries (list[CatalogEntry]): catalog entries
+        Returns:
+            bool: a checked file was modified or removed
+        """
+        needs_refresh = False
+        new_by_folder: Dict[str, List] = {}
+        for entry in entries:
+            slot = self._slot_by_path.get(entry.path)
+            if entry.error or not entry.curve_channels:
+                if slot is not None:
+                    needs_refresh |= self._remove_path(entry.path)
+                continue
+            if slot is not None:
+                self._set_slot(slot, entry)
+                index = self._slot_index(slot)
+                self.dataChanged.emit(index, index)
+                needs_refresh |= bool(self._checked[slot])
+            else:
+                new_by_folder.setdefault(entry.folder, []).append(entry)
+
+        for folder_name, new_entries in new_by_folder.items():
+            folder = self._get_folder(folder_name)
+            new_entries.sort(key=lambda e: os.path.basename(e.rel_path))
+            start = 0
+            while start < len(new_entries):
+                # group the entries that go to the same position
+                position = bisect_right(folder.names, os.path.basename(new_entries[start].rel_path))
+                end = start + 1
+                while end < len(new_entries) and (
+                    position == len(folder.names)
+                    or os.path.basename(new_entries[end].rel_path) <= folder.names[position]
+                ):
+                    end += 1
+                self._insert_run(folder, position, new_entries[start:end])
+                start = end
+        return needs_refresh
+
+    def remove_paths(self, paths: List[str]) -> bool:
+        """
+        Remove files, and their folder once empty.
+        Returns:
+            bool: a removed file was checked
+        """
+        needs_refresh = False
+        for path in paths:
+            needs_refresh |= self._remove_path(path)
+        return needs_refresh
+
+    def _insert_run(self, folder: _Folder, position: int, entries):
+        parent = self.createIndex(self._folders.index(folder), 0, _FOLDER_ID)
+        self.beginInsertRows(parent, position, position + len(entries) - 1)
+        slots = [self._new_slot(entry, folder) for entry in entries]
+        folder.slots[position:position] = slots
+        folder.names[position:position] = [os.path.basename(e.rel_path) for e in entries]
+        self.endInsertRows()
+
+    def _new_slot(self, entry, folder: _Folder) -> int:
+        if self._free:
+            slot = self._free.pop()
+            self._checked[slot] = 0
+        else:
+            slot = len(self._paths)
+            self._paths.append(None)
+            self._labels.append("")
+            self._dates.append("")
+            self._folder_of.append(0)
+            self._checked.append(0)
+            self._stamps.append(0)
+        self._folder_of[slot] = folder.id
+        self._set_slot(slot, entry)
+        self._slot_by_path[entry.path] = slot
+        return slot
+
+    def _set_slot(self, slot: int, entry):
+        name = entry.name or Path(entry.rel_path).stem
+        channels = ", ".join(entry.curve_channels)
+        date_str = entry.json_date or entry.date.strftime("%Y-%m-%d")
+        self._paths[slot] = entry.path
+        self._labels[slot] = f"{name} [{channels}] - {date_str}"
+        self._dates[slot] = date_str
+        self._clock += 1
+        self._stamps[slot] = self._clock
+        self.date_index.add(slot, parse_date(date_str))
+        if self._text_indexed:
+            self.text_index.add(slot, self._labels[slot].lower())
+
+    def _get_folder(self, folder_name: str) -> _Folder:
+        """
+        Folder row, created at its sorted position when missing (root folder first)
+        """
+        folder = self._folder_by_name.get(folder_name)
+        if folder is not None:
+            return folder
+        folder = _Folder(self._next_folder_id, folder_name)
+        self._next_folder_id += 1
+        keys = [_folder_key(f.folder) for f in self._folders]
+        row = bisect_left(keys, _folder_key(folder_name))
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._folders.insert(row, folder)
+        self._folder_by_name[folder_name] = folder
+        self._folder_by_id[folder.id] = folder
+        self.endInsertRows()
+        return folder
+
+    def _remove_path(self, path: str) -> bool:
+        slot = self._slot_by_path.get(path)
+        if slot is None:
+            return False
+        folder = self._folder_by_id[self._folder_of[slot]]
+        folder_row = self._folders.index(folder)
+        row = self._child_row(folder, slot)
+
+        if len(folder.slots) == 1:
+            self.beginRemoveRows(QModelIndex(), folder_row, folder_row)
+            del self._folders[folder_row]
+            del self._folder_by_name[folder.folder]
+            del self._folder_by_id[folder.id]
+        else:
+            self.beginRemoveRows(self.createIndex(folder_row, 0, _FOLDER_ID), row, row)
+            del folder.slots[row]
+            del folder.names[row]
+
+        was_checked = bool(self._checked[slot])
+        del self._slot_by_path[path]
+        self._paths[slot] = None
+        self._labels[slot] = ""
+        self._dates[slot] = ""
+        self._checked[slot] = 0
+        self._free.append(slot)
+        self.date_index.remove(slot)
+        self.text_index.remove(slot)
+        if self._text_indexed and self.text_index.needs_rebuild:
+            self._rebuild_text_index()
+        self.endRemoveRows()
+        return was_checked
+
+
+class MeasuresFilterProxy(QSortFilterProxyModel):
+    """
+    Filter files of a MeasuresModel by text and date range; folders stay visible while
+    one of their files does. Matching files are looked up once per filter change in the
+    model indexes, rows then only test their slot.
+    """
+    PERIODS = ("Toutes dates", "Aujourd’hui", "Ce mois-ci", "Cette année")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setRecursiveFilteringEnabled(True)
+        self._text = ""
+        self._date_range: Optional[Tuple[date, date]] = None
+        self._accepted: Optional[Set[int]] = None
+        self._stamp = 0
+
+    def set_filter(self, text: str, period: str):
+        self.set_date_filter(text, period_range(period))
+
+    def set_date_filter(self, text: str, date_range: Optional[Tuple[date, date]] = None):
+        """
+        Args:
+            text (str): text the labels must contain
+            date_range (tuple[date, date], optional): first and last dates, both included
+        """
+        self.beginFilterChange()
+        self._text = text.lower()
+        self._date_range = date_range
+        model = self.sourceModel()
+        self._accepted = model.matching_slots(self._text, date_range)
+        self._stamp = model.stamp
+        self.endFilterChange(QSortFilterProxyModel.Direction.Rows)
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        model = self.sourceModel()
+        if not source_parent.isValid():
+            # folders are accepted through their files
+            return self._accepted is None
+        if self._accepted is None:
+            return True
+        slot = model.slot(model.index(source_row, 0, source_parent))
+        if model.slot_stamp(slot) > self._stamp:
+            # files added, changed or reusing a slot since the filter was computed
+            return model.slot_matches(slot, self._text, self._date_range)
+        return slot in self._accepted
@@ -0,0 +1,13 @@
+# utils/cache.py
+
+from typing import NamedTuple
+
+
+class CacheInfo(NamedTuple):
+    """
+    Statistics of the application caches, same fields as functools.lru_cache().cache_info()
+    """
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
@@ -0,0 +1,83 @@
+# utils/parallel.py
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# below this many items, starting worker processes costs more than it saves
+# (a spawned worker re-imports the application modules, ~0.3 s)
+PROCESS_THRESHOLD = 4096
+
+
+def make_executor(
+    count: int,
+    max_workers: Optional[int] = None,
+    use_processes: Optional[bool] = None,
+) -> Optional[Executor]:
+    """
+    Pool suited to map a function over count items.
+    Args:
+        count (int): number of items to process
+        max_workers (int, optional): pool size. Defaults to the number of cores
+        use_processes (bool, optional): use a process pool (CPU bound work such as json parsing).
+            Defaults to processes for large inputs, threads otherwise. Outside the main thread
+            (e.g. in a QThreadPool worker) a thread pool is always used
+    Returns:
+        Executor, or None when the work should run serially
+    """
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1 or count <= 1:
+        return None
+    if use_processes is None:
+        use_processes = count >= PROCESS_THRESHOLD
+    if use_processes and threading.current_thread() is not threading.main_thread():
+        # forking a multithreaded Qt process from a worker thread is unsafe
+        use_processes = False
+    if use_processes:
+        # spawn: fresh interpreters, no fork of the Qt threads and locks
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def parallel_map(
+    func: Callable[..., T],
+    *iterables: Iterable,
+    max_workers: Optional[int] = None,
+    use_processes: Optional[bool] = None,
+    executor: Optional[Executor] = None,
+) -> List[T]:
+    """
+    Map func over iterables with a thread or process pool, keeping the input order.
+    Args:
+        func (callable): function to apply, must be a module level function when using processes
+        iterables: argument iterables, as for map()
+        max_workers (int, optional): pool size. Defaults to the number of cores
+        use_processes (bool, optional): see make_executor
+        executor (Executor, optional): existing pool to use, left open
+    Returns:
+        list: results in input order
+    """
+    args = [list(it) for it in iterables]
+    count = min((len(a) for a in args), default=0)
+    if count == 0:
+        return []
+
+    if executor is not None:
+        return list(executor.map(func, *args, chunksize=_chunksize(executor, count)))
+
+    executor = make_executor(count, max_workers, use_processes)
+    if executor is None:
+        return list(map(func, *args))
+    with executor:
+        return list(executor.map(func, *args, chunksize=_chunksize(executor, count)))
+
+
+def _chunksize(executor: Executor, count: int) -> int:
+    if isinstance(executor, ProcessPoolExecutor):
+        workers = getattr(executor, "_max_workers", None) or os.cpu_count() or 1
+        return max(1, count // (workers * 4))
+    return 1
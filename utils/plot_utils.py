@@ -1,5 +1,8 @@
 # utils/utils.py
 
+from datetime import date
+
+from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
 from matplotlib.ticker import MaxNLocator, MultipleLocator, FormatStrFormatter
 
 class ColorChannelSet:
@@ -21,7 +24,7 @@ class ColorChannelSet:
 
     def get_color_name(self, channel: str) -> str:
         try:
-            lowchannel = str(channel.lower)
+            lowchannel = channel.lower()
             idx = self.order.index(lowchannel)
             return self.color_name[idx]
         except ValueError:
@@ -34,6 +37,47 @@ class ColorChannelSet:
         return self.abcd_to_channel.get(abcd) or ""
 
 
+def y_axis_layout(ymin: float, ymax: float, allow_negative: bool = False) -> tuple[float, float, float]:
+    """
+    Y limits and tick step of a density graph: the step follows the span of the values
+    and the limits are rounded to whole steps.
+    Returns:
+        tuple: (low limit, high limit, step)
+    """
+    y_span = ymax - ymin
+    if y_span <= 0.05:
+        step = 0.01
+    elif y_span <= 0.2:
+        step = 0.02
+    elif y_span <= 0.5:
+        step = 0.05
+    elif y_span <= 1:
+        step = 0.1
+    elif y_span <= 2:
+        step = 0.2
+    else:
+        step = round(y_span / 10, 1)
+
+    ymin_new = step * (ymin // step)
+    ymax_new = step * ((ymax // step) + 1)
+    maxlow = 0.0 if not allow_negative else float("-inf")
+    return max(maxlow, ymin_new), ymax_new, step
+
+
+def apply_y_axis(ax, layout: tuple[float, float, float]):
+    """
+    Set the y limits and ticks of a y_axis_layout
+    """
+    low, high, step = layout
+    ax.set_ylim(low, high)
+
+    ax.yaxis.set_major_locator(MultipleLocator(base=step))
+    ax.yaxis.set_major_formatter(FormatStrFormatter('%.2f'))
+    ax.yaxis.set_minor_locator(MultipleLocator(step / 10))
+    ax.tick_params(axis='y', which='minor', length=3, width=0.5, color='#999')
+    ax.tick_params(axis='y', which='major', length=6, width=1.0)
+
+
 def draw_curve_graph(
     ax,
     canvas,
@@ -50,8 +94,10 @@ def draw_curve_graph(
 
     Args:
         ax (matplotlib.axes.Axes): The axis to draw on.
-        canvas (FigureCanvas): The canvas to refresh.
+        canvas (FigureCanvas): The canvas to refresh, None to leave the drawing to the caller.
         curves (dict): Dict[label] = {"y": [...], "color": "red", "x": [...], "linestyle": "-"}.
+            x may be strings (one tick each), dates (date axis) or numbers. An optional
+            "band": (low, high) fills the area between two value lists.
         title (str): Plot title.
         xlabel (str): X-axis label.
         ylabel (str): Y-axis label.
@@ -67,6 +113,7 @@ def draw_curve_graph(
 
     global_ymin, global_ymax = float("inf"), float("-inf")
     x_is_string = False
+    x_is_date = False
     x_labels = None
 
     curve_count = 0
@@ -84,53 +131,182 @@ def draw_curve_graph(
             if x_labels is None:
                 x_labels = x_vals
             x_vals = list(range(len(x_vals)))
+        elif isinstance(x_vals[0], date):
+            x_is_date = True
+
+        # None values (missing channel) leave a gap in the curve
+        present = [y for y in y_vals if y is not None]
+        if not present:
+            continue
+        ax.plot(x_vals, [float("nan") if y is None else y for y in y_vals],
+                marker=".", label=label, color=color, linestyle=linestyle, alpha=0.8)
 
-        ax.plot(x_vals, y_vals, marker=".", label=label, color=color, linestyle=linestyle, alpha=0.8)
+        global_ymin = min(global_ymin, min(present))
+        global_ymax = max(global_ymax, max(present))
 
-        global_ymin = min(global_ymin, min(y_vals))
-        global_ymax = max(global_ymax, max(y_vals))
+        band = data.get("band")
+        if band:
+            low, high = band
+            ax.fill_between(x_vals, low, high, color=color, alpha=0.15, linewidth=0)
+            global_ymin = min(global_ymin, min(low))
+            global_ymax = max(global_ymax, max(high))
 
         curve_count += 1
     
     if curve_count == 0:
         print(f"No data to draw in graph titled: {title}")
-        canvas.draw()
+        if canvas is not None:
+            canvas.draw()
         return
 
     # Ajustement des limites Y et des ticks
-    y_span = global_ymax - global_ymin
-    if y_span <= 0.05:
-        step = 0.01
-    elif y_span <= 0.2:
-        step = 0.02
-    elif y_span <= 0.5:
-        step = 0.05
-    elif y_span <= 1:
-        step = 0.1
-    elif y_span <= 2:
-        step = 0.2
-    else:
-        step = round(y_span / 10, 1)
-
-    ymin_new = step * (global_ymin // step)
-    ymax_new = step * ((global_ymax // step) + 1)
-    maxlow = 0.0 if not allow_negative else float("-inf")
-
-    ax.set_ylim(max(maxlow, ymin_new), ymax_new)
-
-    ax.yaxis.set_major_locator(MultipleLocator(base=step))
-    ax.yaxis.set_major_formatter(FormatStrFormatter('%.2f'))
-    ax.yaxis.set_minor_locator(MultipleLocator(step / 10))
-    ax.tick_params(axis='y', which='minor', length=3, width=0.5, color='#999')
-    ax.tick_params(axis='y', which='major', length=6, width=1.0)
+    apply_y_axis(ax, y_axis_layout(global_ymin, global_ymax, allow_negative))
 
     if x_is_string and x_labels:
         ax.set_xticks(range(len(x_labels)))
         ax.set_xticklabels(x_labels, rotation=45)
+    elif x_is_date:
+        locator = AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
     else:
         ax.set_xlim(1, nb_x_ticks)
         ax.set_xticks(range(1, nb_x_ticks + 1))
 
     if show_legend:
         ax.legend()
-    canvas.draw()
\ No newline at end of file
+    if canvas is not None:
+        canvas.draw()
+
+
+class CurvePlotter:
+    """
+    Retained-mode draw_curve_graph for graphs updated live (numeric x only).
+    Each curve label keeps its Line2D, updated with set_data. The axes, ticks and legend
+    are only redrawn when the curves or the y layout change (the y span crosses a step);
+    otherwise the lines are blitted over a cached background of the axes.
+    Args:
+        ax (matplotlib.axes.Axes): The axis to draw on.
+        canvas (FigureCanvas): The canvas to refresh.
+        title (str): Plot title.
+        xlabel (str): X-axis label.
+        ylabel (str): Y-axis label.
+        show_legend (bool): Whether to show the legend.
+        nb_x_ticks (int): number of x-axis ticks.
+        allow_negative (bool): allow negative ticks
+        vlines (list[float]): x of the vertical guide lines
+    """
+    def __init__(self, ax, canvas, title: str = "", xlabel: str = "X", ylabel: str = "Y",
+                 show_legend: bool = True, nb_x_ticks: int = 21, allow_negative: bool = False, vlines=()):
+        self.ax = ax
+        self.canvas = canvas
+        self.title = title
+        self.show_legend = show_legend
+        self.allow_negative = allow_negative
+        self.lines = {}
+        self.full_draws = 0
+        self.blits = 0
+        self._layout = None
+        self._background = None
+        self._drawing = False
+
+        ax.clear()
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.grid(True, linestyle="--", linewidth=0.5, alpha=0.2)
+        ax.set_xlim(1, nb_x_ticks)
+        ax.set_xticks(range(1, nb_x_ticks + 1))
+        for x in vlines:
+            ax.axvline(x=x, color="black", linestyle="--", linewidth=1.0, alpha=0.2)
+
+        # any other redraw (resize, zoom, save) invalidates the background
+        canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _on_draw(self, event):
+        if not self._drawing:
+            self._background = None
+
+    def update(self, curves: dict):
+        """
+        Show curves, same format as draw_curve_graph: Dict[label] = {"y": [...], "x": [...], "color": "red", "linestyle": "-"}
+        """
+        # curves without any value are not drawn, as in draw_curve_graph
+        curves = {label: data for label, data in curves.items()
+                  if any(y is not None for y in data.get("y", []))}
+
+        changed = False
+        for label in [label for label in self.lines if label not in curves]:
+            self.lines.pop(label).remove()
+            changed = True
+
+        ymin, ymax = float("inf"), float("-inf")
+        for label, data in curves.items():
+            y_vals = data["y"]
+            x_vals = data.get("x", [i + 1 for i in range(len(y_vals))])
+            color = data.get("color", None)
+            linestyle = data.get("linestyle", "-")
+
+            present = [y for y in y_vals if y is not None]
+            ymin = min(ymin, min(present))
+            ymax = max(ymax, max(present))
+            y_vals = [float("nan") if y is None else y for y in y_vals]
+
+            line = self.lines.get(label)
+            if line is None:
+                line, = self.ax.plot(x_vals, y_vals, marker=".", label=label, color=color, linestyle=linestyle, alpha=0.8)
+                self.lines[label] = line
+                changed = True
+                continue
+            if line.get_linestyle() != linestyle or (color is not None and line.get_color() != color):
+                line.set_color(color)
+                line.set_linestyle(linestyle)
+                changed = True
+            line.set_data(x_vals, y_vals)
+
+        if not curves:
+            print(f"No data to draw in graph titled: {self.title}")
+        else:
+            layout = y_axis_layout(ymin, ymax, self.allow_negative)
+            if layout != self._layout:
+                apply_y_axis(self.ax, layout)
+                self._layout = layout
+                changed = True
+
+        if changed or self._background is None or not self.canvas.supports_blit:
+            self._full_draw()
+        else:
+            self._blit()
+
+    def _full_draw(self):
+        """
+        Draw the axes without the curves to keep them as background, then the curves on top
+        """
+        if self.show_legend:
+            if self.lines:
+                self.ax.legend()
+            elif self.ax.get_legend() is not None:
+                self.ax.get_legend().remove()
+        self.full_draws += 1
+        if not self.canvas.supports_blit:
+            self.canvas.draw()
+            return
+        for line in self.lines.values():
+            line.set_visible(False)
+        self._drawing = True
+        try:
+            self.canvas.draw()
+        finally:
+            self._drawing = False
+            for line in self.lines.values():
+                line.set_visible(True)
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._blit(restore=False)
+
+    def _blit(self, restore: bool = True):
+        if restore:
+            self.canvas.restore_region(self._background)
+            self.blits += 1
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+        self.canvas.blit(self.ax.bbox)